@@ -0,0 +1,179 @@
+"""Admission control for upload processing.
+
+Every upload is classified by kind (`ocr`, `pdf`, `tabular`, `json`,
+`text`) and must hold one of that kind's slots while it is processed, so a
+burst of scanned PDFs can occupy at most `limits["ocr"]` workers' worth of
+memory and CPU while JSON uploads keep flowing.
+
+When all slots of a kind are busy a request waits in that kind's queue, which
+is bounded. It is turned away at once, with a `Retry-After` estimated from
+recent job durations, when:
+
+- the queue is full, or it waited `max_wait` seconds: 503;
+- its user already has `per_user` jobs running or queued: 429.
+
+Freed slots go to the waiting user with the fewest jobs of that kind running
+(oldest request first among equals), so one user's batch cannot lock out
+everyone else.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+DEFAULT_LIMITS = {"ocr": 1, "pdf": 2, "tabular": 2, "json": 4, "text": 4}
+DEFAULT_QUEUE = 8
+DEFAULT_MAX_WAIT = 30.0
+DEFAULT_PER_USER = 4
+
+_SUFFIX_KINDS = {
+    ".pdf": "pdf",
+    ".json": "json",
+    ".csv": "tabular", ".xlsx": "tabular", ".xls": "tabular",
+    ".txt": "text", ".docx": "text",
+}
+_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".tiff", ".tif", ".bmp", ".gif", ".webp")
+
+
+def kind_for(filename: str) -> str:
+    """Admission kind of an upload, from its extension (unknown types count as `text`)."""
+    name = (filename or "").lower()
+    if name.endswith(_IMAGE_SUFFIXES):
+        return "ocr"
+    for suffix, kind in _SUFFIX_KINDS.items():
+        if name.endswith(suffix):
+            return kind
+    return "text"
+
+
+class AdmissionRejected(Exception):
+    """Raised by `AdmissionController.admit`; carries the HTTP status and `Retry-After` seconds."""
+
+    def __init__(self, status: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Ticket:
+    __slots__ = ("user", "seq")
+
+    def __init__(self, user: str, seq: int):
+        self.user = user
+        self.seq = seq
+
+
+class _KindState:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.running_by_user: Dict[str, int] = {}
+        self.waiting: List[_Ticket] = []
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "per_user": 0, "timeout": 0}
+        self.avg_seconds: Optional[float] = None  # EWMA of job duration, for Retry-After
+
+
+class AdmissionController:
+    """Per-kind concurrency limits with bounded, per-user-fair wait queues."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, queue: int = DEFAULT_QUEUE,
+                 max_wait: float = DEFAULT_MAX_WAIT, per_user: int = DEFAULT_PER_USER):
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.queue = queue
+        self.max_wait = max_wait
+        self.per_user = per_user
+        self._kinds = {kind: _KindState(max(1, int(n))) for kind, n in limits.items()}
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """`ADMISSION_LIMITS` (e.g. `ocr=1,pdf=2`), `ADMISSION_QUEUE`, `ADMISSION_MAX_WAIT`, `ADMISSION_PER_USER`."""
+        limits = {}
+        for item in os.environ.get("ADMISSION_LIMITS", "").split(","):
+            kind, sep, n = item.partition("=")
+            if sep and kind.strip():
+                limits[kind.strip()] = int(n)
+        return cls(
+            limits=limits,
+            queue=int(os.environ.get("ADMISSION_QUEUE", DEFAULT_QUEUE)),
+            max_wait=float(os.environ.get("ADMISSION_MAX_WAIT", DEFAULT_MAX_WAIT)),
+            per_user=int(os.environ.get("ADMISSION_PER_USER", DEFAULT_PER_USER)),
+        )
+
+    def _retry_after(self, state: _KindState) -> int:
+        """Seconds until a queued request would likely start: queued jobs times average duration, per slot."""
+        avg = state.avg_seconds if state.avg_seconds is not None else 5.0
+        return max(1, math.ceil(avg * (len(state.waiting) + 1) / state.limit))
+
+    def _reject(self, state: _KindState, status: int, reason: str, key: str):
+        state.rejected[key] += 1
+        raise AdmissionRejected(status, self._retry_after(state), reason)
+
+    def _next(self, state: _KindState) -> Optional[_Ticket]:
+        """The waiter a free slot goes to: fewest running jobs for its user, then oldest."""
+        if not state.waiting:
+            return None
+        return min(state.waiting, key=lambda t: (state.running_by_user.get(t.user, 0), t.seq))
+
+    @contextmanager
+    def admit(self, kind: str, user: str):
+        """Hold a `kind` slot for the duration of the block; raises `AdmissionRejected`."""
+        state = self._kinds[kind]
+        with self._cond:
+            mine = state.running_by_user.get(user, 0) + sum(1 for t in state.waiting if t.user == user)
+            if mine >= self.per_user:
+                self._reject(state, 429, f"Too many {kind} uploads in progress for this user", "per_user")
+            if state.running >= state.limit or state.waiting:
+                if len(state.waiting) >= self.queue:
+                    self._reject(state, 503, f"Too many {kind} uploads queued; try again later", "queue_full")
+                self._seq += 1
+                ticket = _Ticket(user, self._seq)
+                state.waiting.append(ticket)
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while not (state.running < state.limit and self._next(state) is ticket):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject(state, 503, f"Timed out waiting to process the {kind} upload; try again later", "timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    state.waiting.remove(ticket)
+                    self._cond.notify_all()  # the next waiter may now be first in line
+            state.running += 1
+            state.running_by_user[user] = state.running_by_user.get(user, 0) + 1
+            state.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._cond:
+                state.running -= 1
+                left = state.running_by_user[user] - 1
+                if left:
+                    state.running_by_user[user] = left
+                else:
+                    del state.running_by_user[user]
+                state.avg_seconds = elapsed if state.avg_seconds is None else 0.8 * state.avg_seconds + 0.2 * elapsed
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._cond:
+            return {
+                kind: {
+                    "limit": s.limit,
+                    "running": s.running,
+                    "queued": len(s.waiting),
+                    "queue_limit": self.queue,
+                    "admitted": s.admitted,
+                    "rejected": dict(s.rejected),
+                    "avg_seconds": round(s.avg_seconds, 3) if s.avg_seconds is not None else None,
+                }
+                for kind, s in self._kinds.items()
+            }
@@ -3,8 +3,9 @@
 from .base import Agent
 from .document_agent import DocumentAgent
 from .fraud_agent import FraudAgent
+from .benford_agent import BenfordAgent
 from .compliance_agent import ComplianceAgent
 from .vendor_agent import VendorAgent
 from .summary_agent import SummaryAgent
 
-__all__ = ["Agent", "DocumentAgent", "FraudAgent", "ComplianceAgent", "VendorAgent", "SummaryAgent"]
+__all__ = ["Agent", "DocumentAgent", "FraudAgent", "BenfordAgent", "ComplianceAgent", "VendorAgent", "SummaryAgent"]
@@ -0,0 +1,164 @@
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from .. import columns
+
+
+# Expected Benford proportions for first digits 1-9 and first-two digits 10-99.
+BENFORD_FIRST = np.log10(1.0 + 1.0 / np.arange(1, 10))
+BENFORD_FIRST_TWO = np.log10(1.0 + 1.0 / np.arange(10, 100))
+
+# Nigrini's MAD conformity bounds: close, acceptable, marginal (else nonconforming).
+MAD_BOUNDS_FIRST = (0.006, 0.012, 0.015)
+MAD_BOUNDS_FIRST_TWO = (0.0012, 0.0018, 0.0022)
+
+# Chi-square critical values at p=0.05 for 8 and 89 degrees of freedom.
+CHI2_CRITICAL_FIRST = 15.507
+CHI2_CRITICAL_FIRST_TWO = 112.022
+
+_CONFORMITY = np.array(["close", "acceptable", "marginal", "nonconforming"])
+INSUFFICIENT = "insufficient data"
+
+
+def first_two_digits(amounts: np.ndarray) -> np.ndarray:
+    """Return the leading two digits (10-99) of each amount, or 0 when the amount is below 10."""
+    x = np.abs(np.asarray(amounts, dtype=np.float64))
+    valid = np.isfinite(x) & (x >= 10)
+    out = np.zeros(x.shape, dtype=np.int64)
+    xv = x[valid]
+    scaled = xv / np.power(10.0, np.floor(np.log10(xv)) - 1)
+    d = np.floor(scaled + 1e-9).astype(np.int64)
+    # log10 rounding can land one decade off right at powers of ten
+    d = np.where(d >= 100, d // 10, d)
+    d = np.where(d < 10, d * 10, d)
+    out[valid] = d
+    return out
+
+
+def _conformity(mad: np.ndarray, bounds) -> np.ndarray:
+    return _CONFORMITY[np.searchsorted(np.asarray(bounds), mad, side="right")]
+
+
+def _digit_stats(counts: np.ndarray, expected: np.ndarray):
+    """Chi-square and MAD per row of a (groups, digits) count matrix."""
+    n = counts.sum(axis=1, keepdims=True)
+    safe_n = np.where(n == 0, 1, n)
+    observed = counts / safe_n
+    exp_counts = safe_n * expected
+    chi2 = ((counts - exp_counts) ** 2 / exp_counts).sum(axis=1)
+    mad = np.abs(observed - expected).mean(axis=1)
+    return observed, chi2, mad
+
+
+def digit_counts(amounts: np.ndarray, codes: Optional[np.ndarray] = None, n_groups: int = 1) -> Dict[str, np.ndarray]:
+    """Vectorized first-digit, first-two-digit and round-number counts per group.
+
+    `codes` assigns each amount to a group in `range(n_groups)`; without it all
+    amounts form a single group. Counts add up, so batch totals are the sum
+    over groups.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if codes is None:
+        codes = np.zeros(len(amounts), dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+
+    d2 = first_two_digits(amounts)
+    valid = d2 > 0
+    vc, vd2 = codes[valid], d2[valid]
+    two = np.bincount(vc * 90 + (vd2 - 10), minlength=n_groups * 90).reshape(n_groups, 90)
+
+    cents = np.round(np.abs(amounts) * 100).astype(np.int64)
+    nonzero = cents > 0
+    return {
+        "first_digit": two.reshape(n_groups, 9, 10).sum(axis=2),
+        "first_two": two,
+        "total": np.bincount(codes[nonzero], minlength=n_groups),
+        "round_100": np.bincount(codes[nonzero & (cents % 10000 == 0)], minlength=n_groups),
+        "round_1000": np.bincount(codes[nonzero & (cents % 100000 == 0)], minlength=n_groups),
+    }
+
+
+def benford_stats(counts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Chi-square, MAD and round-number shares from `digit_counts` output (one row per group)."""
+    obs1, chi1, mad1 = _digit_stats(counts["first_digit"], BENFORD_FIRST)
+    _, chi2, mad2 = _digit_stats(counts["first_two"], BENFORD_FIRST_TWO)
+    safe_total = np.where(counts["total"] == 0, 1, counts["total"])
+    return {
+        "n": counts["first_digit"].sum(axis=1),
+        "first_digit_observed": obs1,
+        "first_digit_chi_square": chi1,
+        "first_digit_mad": mad1,
+        "first_digit_conformity": _conformity(mad1, MAD_BOUNDS_FIRST),
+        "first_two_chi_square": chi2,
+        "first_two_mad": mad2,
+        "first_two_conformity": _conformity(mad2, MAD_BOUNDS_FIRST_TWO),
+        "round_100_share": counts["round_100"] / safe_total,
+        "round_1000_share": counts["round_1000"] / safe_total,
+    }
+
+
+def _stat(value, digits: int, n: int) -> Optional[float]:
+    # with no amounts the chi-square and MAD are artefacts of the empty counts
+    return round(float(value), digits) if n else None
+
+
+def _group_summary(stats: Dict[str, np.ndarray], i: int, min_sample: int, with_observed: bool = False) -> Dict[str, Any]:
+    """Report entry for group `i`; below `min_sample` (or with no amounts) conformity is INSUFFICIENT."""
+    n = int(stats["n"][i])
+    sufficient = n > 0 and n >= min_sample
+    first = {
+        "chi_square": _stat(stats["first_digit_chi_square"][i], 3, n),
+        "chi_square_critical": CHI2_CRITICAL_FIRST,
+        "mad": _stat(stats["first_digit_mad"][i], 5, n),
+        "conformity": str(stats["first_digit_conformity"][i]) if sufficient else INSUFFICIENT,
+    }
+    if with_observed:
+        first["observed"] = [round(float(p), 4) for p in stats["first_digit_observed"][i]] if n else None
+        first["expected"] = [round(float(p), 4) for p in BENFORD_FIRST]
+    return {
+        "n": n,
+        "first_digit": first,
+        "first_two_digits": {
+            "chi_square": _stat(stats["first_two_chi_square"][i], 3, n),
+            "chi_square_critical": CHI2_CRITICAL_FIRST_TWO,
+            "mad": _stat(stats["first_two_mad"][i], 5, n),
+            "conformity": str(stats["first_two_conformity"][i]) if sufficient else INSUFFICIENT,
+        },
+        "round_share": {
+            "100": round(float(stats["round_100_share"][i]), 4),
+            "1000": round(float(stats["round_1000_share"][i]), 4),
+        },
+    }
+
+
+def summarize(amounts: np.ndarray, codes: np.ndarray, labels: Sequence[str], min_sample: int) -> Dict[str, Any]:
+    """Build the report section for a batch and its vendors (groups given by `codes`/`labels`)."""
+    counts = digit_counts(amounts, codes, len(labels))
+    batch = benford_stats({k: v.sum(axis=0, keepdims=True) for k, v in counts.items()})
+    per_vendor = benford_stats(counts)
+    eligible = np.nonzero(per_vendor["n"] >= min_sample)[0]
+
+    by_vendor = {str(labels[i]): _group_summary(per_vendor, i, min_sample) for i in eligible.tolist()}
+    nonconforming = [v for v, s in by_vendor.items() if s["first_digit"]["conformity"] == "nonconforming"]
+    return {
+        "batch": dict(_group_summary(batch, 0, min_sample, with_observed=True),
+                      sufficient=bool(batch["n"][0] > 0 and batch["n"][0] >= min_sample)),
+        "by_vendor": by_vendor,
+        "nonconforming_vendors": nonconforming,
+    }
+
+
+class BenfordAgent:
+    """Benford's-law and round-number tests on invoice amounts.
+
+    Runs per batch and per vendor. Vendors with fewer than `MIN_SAMPLE`
+    amounts of 10 or more are left out of the per-vendor section, since the
+    test means little on small samples.
+    """
+
+    MIN_SAMPLE = 50
+
+    def run(self, records: List[Dict[str, Any]]) -> Dict:
+        keys, codes = columns.encode(columns.vendor_keys(records))
+        return summarize(columns.amounts(records), codes, keys, self.MIN_SAMPLE)
@@ -1,24 +1,32 @@
-from typing import List, Dict
+import os
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from ..rule_engine import load_rules
+
+
+DEFAULT_RULES = Path(__file__).resolve().parent.parent / "rules" / "default.json"
 
 
 class ComplianceAgent:
     """Simple compliance checks against mock government rules.
 
-    Rules here are illustrative: max single payment, required fields, allowed categories.
+    Rules are illustrative (max single payment, required fields, split
+    payments) and live in a rule file rather than in code: `rules_path`, the
+    `COMPLIANCE_RULES` environment variable, or `rules/default.json`. See
+    `rule_engine.py` for the rule format. Edits to the file are picked up on
+    the next run without a restart.
     """
 
-    MAX_SINGLE_PAYMENT = 100000.0
-    REQUIRED_FIELDS = ["invoice_id", "vendor", "amount", "date"]
+    def __init__(self, rules_path: Optional[str] = None):
+        self.rules_path = rules_path or os.environ.get("COMPLIANCE_RULES") or DEFAULT_RULES
 
-    def run(self, records: List[Dict]) -> Dict:
-        violations = []
-        for r in records:
-            missing = [f for f in self.REQUIRED_FIELDS if not r.get(f)]
-            if missing:
-                violations.append({"invoice_id": r.get("invoice_id"), "missing_fields": missing})
+    @property
+    def rules(self):
+        return load_rules(self.rules_path)
 
-            amt = r.get("amount", 0)
-            if amt > self.MAX_SINGLE_PAYMENT:
-                violations.append({"invoice_id": r.get("invoice_id"), "violation": "exceeds_max_single_payment", "amount": amt})
+    def split_invoices(self, records: List[Dict]) -> List[Dict]:
+        return self.rules.evaluate(records, types={"split"})
 
-        return {"violations": violations}
+    def run(self, records: List[Dict]) -> Dict:
+        return {"violations": self.rules.evaluate(records)}
@@ -1,17 +1,75 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .. import columns
+from ..baselines import VendorBaselines
 
 
 class FraudAgent:
     """Detects simple fraud patterns: duplicates, inflated prices, fake vendors.
 
     This is a lightweight rule-based proxy for more advanced ML agents.
+
+    Inflated amounts are judged against each vendor's own baseline (median and
+    MAD of everything the vendor invoiced before this batch, see
+    `baselines.py`); the batch is folded into the baselines only afterwards,
+    so an invoice never counts towards its own threshold. Invoices already
+    counted (same vendor and invoice id, e.g. a re-uploaded file) are not
+    counted again. Vendors with too little history fall back to robust
+    statistics of the current batch.
     """
 
+    INFLATION_RATIO = 4.0  # amount must exceed this multiple of the median...
+    MAD_THRESHOLD = 3.5  # ...and this many (scaled) MADs above it
+    MIN_HISTORY = 5  # invoices needed before a vendor baseline is trusted
+    MIN_BATCH = 3  # invoices needed for the batch-wide fallback
+
+    def __init__(self, baselines: Optional[VendorBaselines] = None):
+        self.baselines = baselines if baselines is not None else VendorBaselines()
+
+    @classmethod
+    def _threshold(cls, median: float, mad: float) -> float:
+        return max(median * cls.INFLATION_RATIO, median + cls.MAD_THRESHOLD * 1.4826 * mad)
+
+    def _inflated(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not records:
+            return []
+        amounts = columns.amounts(records)
+        keys, codes = columns.encode(columns.vendor_keys(records))
+        sketches = self.baselines.lookup(keys)
+
+        batch_threshold = np.inf
+        batch_median = 0.0
+        if len(amounts) >= self.MIN_BATCH:
+            batch_median = float(np.median(amounts))
+            batch_threshold = self._threshold(batch_median, float(np.median(np.abs(amounts - batch_median))))
+
+        medians = np.full(len(keys), batch_median)
+        thresholds = np.full(len(keys), batch_threshold)
+        from_vendor = np.zeros(len(keys), dtype=bool)
+        for i, s in enumerate(sketches):
+            if s.count >= self.MIN_HISTORY:
+                med, mad = s.median_mad()
+                medians[i], thresholds[i], from_vendor[i] = med, self._threshold(med, mad), True
+
+        flagged = np.nonzero(amounts > thresholds[codes])[0]
+        self.baselines.observe(keys, codes, amounts, columns.invoice_ids(records))
+        return [
+            {
+                "invoice_id": records[i].get("invoice_id"),
+                "vendor": records[i].get("vendor"),
+                "amount": float(amounts[i]),
+                "baseline_median": float(medians[codes[i]]),
+                "threshold": float(thresholds[codes[i]]),
+                "basis": "vendor" if from_vendor[codes[i]] else "batch",
+            }
+            for i in flagged.tolist()
+        ]
+
     def run(self, records: List[Dict[str, Any]]) -> Dict:
-        findings = {"duplicates": [], "inflated": [], "fake_vendors": []}
+        findings = {"duplicates": [], "inflated": self._inflated(records), "fake_vendors": []}
         seen_ids = {}
-        amounts = [r.get("amount", 0) for r in records]
-        avg = sum(amounts) / len(amounts) if amounts else 0
 
         for r in records:
             inv = r.get("invoice_id")
@@ -22,11 +80,7 @@ class FraudAgent:
                     # store a copy to avoid keeping references to the original record objects
                     seen_ids[inv] = dict(r)
 
-            amt = r.get("amount", 0)
-            if avg and amt > avg * 4:
-                findings["inflated"].append({"invoice_id": inv, "amount": amt, "avg": avg})
-
-            vendor = (r.get("vendor") or "").lower()
+            vendor = str(r.get("vendor") or "").lower()
             if vendor and ("unknown" in vendor or "test" in vendor or len(vendor) < 3):
                 findings["fake_vendors"].append({"invoice_id": inv, "vendor": r.get("vendor")})
 
@@ -23,6 +23,6 @@ class SummaryAgent:
         vendor_scores = findings.get("vendor", {}).get("vendor_scores", {})
         for v, s in vendor_scores.items():
             if s.get("score", 0) >= 70:
-                summary["high_risk_vendors"].append({"vendor": v, "score": s.get("score")})
+                summary["high_risk_vendors"].append({"vendor": s.get("name", v), "vendor_id": v, "score": s.get("score")})
 
         return summary
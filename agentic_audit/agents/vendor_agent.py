@@ -1,4 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from ..columns import vendor_key
+from ..vendor_history import VendorHistory
 
 
 class VendorAgent:
@@ -6,21 +9,35 @@ class VendorAgent:
 
     This is a placeholder for a system that would use transaction history,
     external data, and ML models to score vendors.
+
+    Scores read the vendor's accumulated history (see `vendor_history.py`),
+    so a long-standing vendor is not penalised for appearing only once in
+    today's batch. `count` and `total_amount` still describe the batch.
+    Vendors are keyed by their resolved `vendor_id` when one is present.
     """
 
+    def __init__(self, history: Optional[VendorHistory] = None):
+        self.history = history if history is not None else VendorHistory()
+
     def run(self, records: List[Dict]) -> Dict:
         by_vendor = {}
         for r in records:
-            v = r.get("vendor") or "<unknown>"
-            entry = by_vendor.setdefault(v, {"count": 0, "total_amount": 0.0})
+            v = vendor_key(r)
+            entry = by_vendor.setdefault(v, {"name": r.get("vendor") or v, "count": 0, "total_amount": 0.0})
             entry["count"] += 1
             entry["total_amount"] += float(r.get("amount", 0))
 
+        history = self.history.update(records)
+
         scores = {}
         for v, s in by_vendor.items():
-            avg = s["total_amount"] / s["count"] if s["count"] else 0
+            h = history.get(v)
+            count = h.count if h else s["count"]
+            avg = h.mean if h else (s["total_amount"] / s["count"] if s["count"] else 0)
             # Simple heuristic: higher average and fewer transactions => higher risk
-            score = min(100, int((avg / 10000.0) * 50 + max(0, 50 - s["count"])))
-            scores[v] = {"score": score, "count": s["count"], "total_amount": s["total_amount"]}
+            score = min(100, int((avg / 10000.0) * 50 + max(0, 50 - count)))
+            scores[v] = {"score": score, "name": s["name"], "count": s["count"], "total_amount": s["total_amount"]}
+            if h:
+                scores[v]["history"] = h.to_dict()
 
         return {"vendor_scores": scores}
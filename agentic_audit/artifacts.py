@@ -0,0 +1,294 @@
+"""Collision-free, atomic writes of report artifacts.
+
+Report files used to be named `report-{int(time.time())}`, so two uploads in
+the same second overwrote each other, and files were written in place where
+readers could see them half-written. `ArtifactWriter`:
+
+1. names each report `report-<ULID>`: unique without coordination, and still
+   sorts by creation time;
+2. exports every file into a private staging directory, fsyncs it and only
+   then `os.replace`s it into the exports directory, so a visible file is
+   always complete;
+3. registers the report and all its files in SQLite in one short
+   transaction, after the files are in place. No lock is held while files
+   are rendered, so concurrent uploads only contend for the few-millisecond
+   insert.
+
+Files are sharded into `YYYY/MM/DD/` subdirectories (UTC, from the ULID
+timestamp) so no directory grows without bound; the database stores paths
+relative to the exports directory, and listings are served from it with
+keyset pagination (`list_reports`) instead of scanning the filesystem.
+"""
+import os
+import secrets
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import exporter, metrics
+from .http_cache import precompress
+
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_ulid(timestamp_ms: Optional[int] = None) -> str:
+    """26-character ULID: 48-bit millisecond timestamp + 80 random bits, Crockford base32."""
+    ts = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+    value = (ts << 80) | int.from_bytes(secrets.token_bytes(10), "big")
+    chars = []
+    for _ in range(26):
+        value, rem = divmod(value, 32)
+        chars.append(_CROCKFORD[rem])
+    return "".join(reversed(chars))
+
+
+def ulid_timestamp_ms(ulid: str) -> int:
+    value = 0
+    for ch in ulid[:10].upper():
+        value = value * 32 + _CROCKFORD.index(ch)
+    return value
+
+
+def shard_for(timestamp: float) -> str:
+    """Relative shard directory (`YYYY/MM/DD`, UTC) for a unix timestamp in seconds."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y/%m/%d")
+
+
+def shard_for_name(filename: str) -> Optional[str]:
+    """Shard of an artifact from its name: `report-<ULID>...` or legacy `report-<unix seconds>...`."""
+    name = Path(filename).name
+    if not name.startswith("report-"):
+        return None
+    ident = name[len("report-"):].split(".", 1)[0]
+    try:
+        if len(ident) == 26:
+            return shard_for(ulid_timestamp_ms(ident) / 1000)
+        if ident.isdigit():
+            return shard_for(int(ident))
+    except ValueError:
+        return None
+    return None
+
+
+def _fsync_file(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path: Path):
+    # directory fsync makes the renames durable; not supported on Windows
+    try:
+        _fsync_file(path)
+    except OSError:
+        pass
+
+
+def atomic_write_text(path, text: str, encoding: str = "utf-8"):
+    """Replace `path` with `text` so readers see either the old or the new content, never a mix."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+    try:
+        with tmp.open("w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def init_db(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at INTEGER,
+                total_invoices INTEGER,
+                fraud_alerts INTEGER,
+                compliance_violations INTEGER,
+                html_path TEXT,
+                json_path TEXT,
+                csv_path TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(reports)")}
+        if "report_id" not in columns:
+            conn.execute("ALTER TABLE reports ADD COLUMN report_id TEXT")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_report_id ON reports(report_id)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS report_artifacts (
+                report_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                PRIMARY KEY (report_id, kind)
+            )
+            """
+        )
+
+
+_reports_version = 0
+_reports_version_lock = threading.Lock()
+
+
+def reports_version() -> int:
+    """Counter bumped whenever this process adds or removes report rows.
+
+    Lets caches of `list_reports` results skip the query until something
+    changed. Changes made by other processes are not seen.
+    """
+    return _reports_version
+
+
+def mark_reports_changed():
+    global _reports_version
+    with _reports_version_lock:
+        _reports_version += 1
+
+
+def report_counts(report: Dict[str, Any]) -> Dict[str, int]:
+    summary = report.get("summary", {})
+    return {
+        "total_invoices": int(report.get("meta", {}).get("total", len(report.get("records", [])))),
+        "fraud_alerts": int(summary.get("fraud_alerts", 0)),
+        "compliance_violations": int(summary.get("compliance_violations", 0)),
+    }
+
+
+class ArtifactWriter:
+    """Writes a report's export files atomically under a unique name and registers them.
+
+    Without `db_path` files are still uniquely named and atomically written,
+    just not registered.
+    """
+
+    def __init__(self, export_dir, db_path=None, shard: bool = True, compress: bool = True):
+        self.export_dir = Path(export_dir)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.shard = shard
+        self.compress = compress  # write .gz variants of HTML/CSV/JSON for precompressed delivery
+        if db_path:
+            init_db(db_path)
+
+    def write(self, report: Dict[str, Any], **export_kwargs) -> Dict[str, Any]:
+        """Export `report` (keyword arguments go to `exporter.export_all`).
+
+        Returns `{"report_id", "base", "paths": {kind: final path},
+        "relpaths": {kind: path relative to the exports directory}}`.
+        """
+        report_id = new_ulid()
+        base = f"report-{report_id}"
+        target = self.export_dir / shard_for(ulid_timestamp_ms(report_id) / 1000) if self.shard else self.export_dir
+        target.mkdir(parents=True, exist_ok=True)
+        # staging lives inside the target dir so os.replace stays on one filesystem
+        staging = target / f".staging-{report_id}"
+        staging.mkdir()
+        try:
+            staged = exporter.export_all(report, str(staging / base), **export_kwargs)
+            if self.compress:
+                for p in list(staging.iterdir()):
+                    precompress(p)
+            primary = set(staged.values())
+            # supporting files (indexes, HTML pages, raw side file) first, so
+            # nothing that links to them becomes visible before they do
+            files = sorted((p for p in staging.iterdir() if p.is_file()), key=lambda p: (p in primary, p.name))
+            for p in files:
+                _fsync_file(p)
+            for p in files:
+                os.replace(p, target / p.name)
+            _fsync_dir(target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        paths = {kind: target / p.name for kind, p in staged.items()}
+        relpaths = {kind: p.relative_to(self.export_dir).as_posix() for kind, p in paths.items()}
+        if self.db_path:
+            try:
+                self._register(report_id, report, paths, relpaths)
+            except Exception:
+                for p in files:
+                    (target / p.name).unlink(missing_ok=True)
+                raise
+        return {"report_id": report_id, "base": base, "paths": paths, "relpaths": relpaths}
+
+    def _register(self, report_id: str, report: Dict[str, Any], paths: Dict[str, Path], relpaths: Dict[str, str]):
+        counts = report_counts(report)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with metrics.timer("sqlite_query_seconds", query="register_report"), conn:
+                conn.execute(
+                    """
+                    INSERT INTO reports (report_id, created_at, total_invoices, fraud_alerts, compliance_violations, html_path, json_path, csv_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        report_id,
+                        int(time.time()),
+                        counts["total_invoices"],
+                        counts["fraud_alerts"],
+                        counts["compliance_violations"],
+                        relpaths.get("html"),
+                        relpaths.get("json"),
+                        relpaths.get("csv"),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO report_artifacts (report_id, kind, path, size) VALUES (?, ?, ?, ?)",
+                    [(report_id, kind, relpaths[kind], p.stat().st_size) for kind, p in paths.items()],
+                )
+        finally:
+            conn.close()
+        mark_reports_changed()
+
+
+REPORT_COLUMNS = ("id", "report_id", "created_at", "total_invoices", "fraud_alerts", "compliance_violations", "html_path", "json_path", "csv_path")
+
+
+def list_reports(db_path, limit: int = 10, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Newest reports first, `limit` at a time.
+
+    Keyset pagination on the primary key: pass the returned cursor as
+    `before` for the next page (None when there are no more). Cost depends on
+    `limit`, not on how many reports exist.
+    """
+    sql = f"SELECT {', '.join(REPORT_COLUMNS)} FROM reports"
+    params: List[Any] = []
+    if before is not None:
+        sql += " WHERE id < ?"
+        params.append(int(before))
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit) + 1)
+    with metrics.timer("sqlite_query_seconds", query="list_reports"), sqlite3.connect(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    reports = [dict(zip(REPORT_COLUMNS, r)) for r in rows[:limit]]
+    cursor = reports[-1]["id"] if len(rows) > limit else None
+    return reports, cursor
+
+
+def resolve_artifact(export_dir, filename: str) -> Optional[Path]:
+    """Path of an artifact given its path relative to `export_dir`, or just its
+    file name (looked up flat, then in the shard its name maps to). Never
+    resolves outside `export_dir`."""
+    root = Path(export_dir).resolve()
+    candidates = [filename]
+    if "/" not in filename:
+        shard = shard_for_name(filename)
+        if shard:
+            candidates.append(f"{shard}/{filename}")
+    for rel in candidates:
+        path = (root / rel).resolve()
+        if path != root and root in path.parents and path.is_file():
+            return path
+    return None
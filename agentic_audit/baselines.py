@@ -0,0 +1,172 @@
+"""Per-vendor amount baselines maintained incrementally across runs.
+
+Each vendor keeps a log-bucketed histogram of the amounts it has invoiced
+(a small quantile sketch with bounded relative error). Adding an invoice is a
+single bucket increment, and the median and MAD used by `FraudAgent` are read
+back from the buckets, so the baseline never needs the raw history.
+
+Baselines are kept in memory by default, or persisted to a SQLite table when
+a database path is given (the dashboard uses `audit.db`). An invoice is
+counted once: re-uploads of the same `(vendor, invoice_id)` are skipped (see
+`invoice_ledger.py`).
+"""
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .invoice_ledger import InvoiceLedger
+
+
+class AmountSketch:
+    """Log-bucketed histogram of positive amounts.
+
+    Bucket `i` covers `(GAMMA**(i-1), GAMMA**i]`, so any quantile read from
+    the sketch is within `ALPHA` relative error of the exact value.
+    """
+
+    ALPHA = 0.01
+    GAMMA = (1 + ALPHA) / (1 - ALPHA)
+    _LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+        self.count = sum(self.buckets.values())
+
+    @classmethod
+    def bucket_index(cls, amounts: np.ndarray) -> np.ndarray:
+        """Vectorized bucket index for an array of positive amounts."""
+        return np.ceil(np.log(amounts) / cls._LOG_GAMMA).astype(np.int64)
+
+    def add(self, index: int, n: int = 1):
+        self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += n
+
+    def _values_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        keys = np.fromiter(sorted(self.buckets), dtype=np.int64, count=len(self.buckets))
+        counts = np.fromiter((self.buckets[k] for k in keys.tolist()), dtype=np.int64, count=len(keys))
+        # midpoint of the bucket in relative terms
+        values = 2.0 * np.power(self.GAMMA, keys.astype(np.float64)) / (self.GAMMA + 1.0)
+        return values, counts
+
+    @staticmethod
+    def _weighted_median(values: np.ndarray, counts: np.ndarray) -> float:
+        order = np.argsort(values, kind="stable")
+        cum = np.cumsum(counts[order])
+        idx = int(np.searchsorted(cum, (cum[-1] + 1) / 2.0))
+        return float(values[order][min(idx, len(order) - 1)])
+
+    def median_mad(self) -> Tuple[float, float]:
+        """Return (median, median absolute deviation) of the observed amounts."""
+        if not self.count:
+            return 0.0, 0.0
+        values, counts = self._values_counts()
+        med = self._weighted_median(values, counts)
+        mad = self._weighted_median(np.abs(values - med), counts)
+        return med, mad
+
+    def to_json(self) -> str:
+        return json.dumps({str(k): v for k, v in self.buckets.items()}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "AmountSketch":
+        return cls({int(k): int(v) for k, v in json.loads(data).items()})
+
+
+class VendorBaselines:
+    """Store of `AmountSketch` objects keyed by vendor.
+
+    `lookup` reads the baselines of a batch's vendors, and `observe` folds a
+    batch into them in one transaction; only those vendors are read from or
+    written to the database.
+    """
+
+    _CHUNK = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path) if db_path else None
+        self._memory: Dict[str, AmountSketch] = {}
+        self.ledger = InvoiceLedger("vendor_baseline_invoices")
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            self.ledger.init_db(conn)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vendor_baselines (
+                    vendor TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    buckets TEXT NOT NULL,
+                    updated_at INTEGER
+                )
+                """
+            )
+
+    def _read(self, conn: sqlite3.Connection, keys: List[str]) -> List[AmountSketch]:
+        stored = {}
+        for i in range(0, len(keys), self._CHUNK):
+            chunk = keys[i:i + self._CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for vendor, buckets in conn.execute(
+                f"SELECT vendor, buckets FROM vendor_baselines WHERE vendor IN ({marks})", chunk
+            ):
+                stored[vendor] = AmountSketch.from_json(buckets)
+        return [stored.get(k) or AmountSketch() for k in keys]
+
+    def lookup(self, keys: List[str]) -> List[AmountSketch]:
+        """Current sketches for `keys` (empty for unknown vendors), without changing them."""
+        if self.db_path is None:
+            return [AmountSketch(self._memory[k].buckets) if k in self._memory else AmountSketch() for k in keys]
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            return self._read(conn, keys)
+
+    def _counted(self, keys: List[str], codes: np.ndarray, amounts: np.ndarray,
+                 invoice_ids: Optional[List[Optional[str]]], conn: Optional[sqlite3.Connection] = None) -> np.ndarray:
+        """Records that go into the sketches: positive amounts not counted before."""
+        counted = amounts > 0
+        if invoice_ids is not None:
+            counted &= self.ledger.claim(keys, codes, invoice_ids, conn)
+        return counted
+
+    @staticmethod
+    def _bucket_counts(codes: np.ndarray, amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Distinct `(vendor code, bucket)` pairs of a batch and how often each occurs."""
+        if not len(amounts):
+            return np.zeros((2, 0), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        idx = AmountSketch.bucket_index(amounts)
+        return np.unique(np.stack([codes.astype(np.int64), idx]), axis=1, return_counts=True)
+
+    def observe(self, keys: List[str], codes: np.ndarray, amounts: np.ndarray,
+                invoice_ids: Optional[List[Optional[str]]] = None) -> List[AmountSketch]:
+        """Add `amounts` (grouped by `codes` into `keys`) and return the sketches for `keys`.
+
+        With `invoice_ids`, invoices already counted are skipped.
+        """
+        if self.db_path is None:
+            counted = self._counted(keys, codes, amounts, invoice_ids)
+            sketches = [self._memory.setdefault(k, AmountSketch()) for k in keys]
+            self._merge(sketches, *self._bucket_counts(codes[counted], amounts[counted]))
+            return sketches
+
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            counted = self._counted(keys, codes, amounts, invoice_ids, conn)
+            sketches = self._read(conn, keys)
+            self._merge(sketches, *self._bucket_counts(codes[counted], amounts[counted]))
+            now = int(time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO vendor_baselines (vendor, count, buckets, updated_at) VALUES (?, ?, ?, ?)",
+                [(k, s.count, s.to_json(), now) for k, s in zip(keys, sketches)],
+            )
+        return sketches
+
+    @staticmethod
+    def _merge(sketches: List[AmountSketch], pairs: np.ndarray, counts: np.ndarray):
+        for code, index, n in zip(pairs[0].tolist(), pairs[1].tolist(), counts.tolist()):
+            sketches[code].add(index, n)
@@ -0,0 +1,72 @@
+"""Columnar views over normalized invoice records.
+
+Agents receive records as a list of dicts. Checks that have to scale to large
+batches convert the columns they need into NumPy arrays once and evaluate
+their rules on those arrays instead of walking the records one by one.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def amounts(records: List[Dict[str, Any]]) -> np.ndarray:
+    """Return the `amount` column as float64; missing or invalid values become 0."""
+    out = np.zeros(len(records), dtype=np.float64)
+    for i, r in enumerate(records):
+        try:
+            out[i] = float(r.get("amount") or 0)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def vendor_key(record: Dict[str, Any]) -> str:
+    """Key a record is grouped under for per-vendor statistics: the resolved vendor ID, else the raw name."""
+    return str(record.get("vendor_id") or record.get("vendor") or "<unknown>")
+
+
+def vendor_keys(records: List[Dict[str, Any]]) -> List[str]:
+    return [vendor_key(r) for r in records]
+
+
+def invoice_ids(records: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """Return the `invoice_id` column as strings; missing ids become None."""
+    return [str(r["invoice_id"]) if r.get("invoice_id") not in (None, "") else None for r in records]
+
+
+def encode(values: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Factorize string values into (uniques, integer codes)."""
+    if not values:
+        return [], np.zeros(0, dtype=np.intp)
+    uniques, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return uniques.tolist(), codes.reshape(-1)
+
+
+_DATE_FORMATS = ("%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y")
+
+
+def _parse_day(value: str) -> np.datetime64:
+    try:
+        return np.datetime64(value[:10], "D")
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(value, fmt).date(), "D")
+        except ValueError:
+            continue
+    return np.datetime64("NaT", "D")
+
+
+def dates(records: List[Dict[str, Any]]) -> np.ndarray:
+    """Return the `date` column as datetime64[D]; unparseable dates become NaT.
+
+    ISO dates are converted in one NumPy call; other layouts produced by the
+    text extractors (e.g. `05/11/2025`) fall back to per-value parsing.
+    """
+    raw = [str(r.get("date") or "").strip() for r in records]
+    try:
+        return np.array(raw, dtype="datetime64[D]")
+    except ValueError:
+        return np.array([_parse_day(v) if v else np.datetime64("NaT", "D") for v in raw], dtype="datetime64[D]")
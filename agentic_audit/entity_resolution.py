@@ -0,0 +1,197 @@
+"""Vendor entity resolution: cluster raw vendor-name variants into canonical IDs.
+
+"Acme Corporation", "ACME Corp." and "Acme Corp" are the same vendor, but
+grouping by the raw string splits its history. Resolution runs in three steps:
+
+1. Normalization: lower-case, strip punctuation and legal-form words
+   (corp, inc, ltd, ...). Names with equal keys are the same vendor.
+2. Blocking: keys are bucketed by their first characters, so fuzzy
+   comparison only happens inside small blocks instead of all pairs.
+3. Fuzzy merging: keys within a block scoring at least `MERGE_THRESHOLD`
+   (`token_sort_ratio`, scored with `cdist`) are merged with union-find.
+
+A cluster's vendor ID is the normalized key of its first member. Raw names
+and keys are persisted with their IDs (SQLite when a database path is given),
+so a name resolved once resolves the same way in later runs, and new names
+can join existing clusters.
+"""
+import math
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_SUPPORT = True
+except Exception:
+    RAPIDFUZZ_SUPPORT = False
+
+
+LEGAL_WORDS = {
+    "the", "and", "co", "company", "corp", "corporation", "inc", "incorporated", "ltd", "limited",
+    "llc", "llp", "plc", "pvt", "private", "gmbh", "ag", "sa", "pty", "bv",
+}
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def vendor_name(value) -> Optional[str]:
+    """A record's vendor as a string, or None if missing (None, NaN from pandas, blank)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value).strip() or None
+
+
+def canonical_key(name) -> str:
+    """Normalized form used as cluster key; falls back to all words if only legal words remain."""
+    words = _NON_WORD.sub(" ", str(name or "").lower()).split()
+    core = [w for w in words if w not in LEGAL_WORDS]
+    return " ".join(core or words)
+
+
+def block_of(key: str) -> str:
+    return key[:3]
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # keep the lower index (earlier / already-known key) as root
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+class VendorResolver:
+    """Maps raw vendor names to canonical vendor IDs, incrementally and persistently."""
+
+    MERGE_THRESHOLD = 92
+    _CHUNK = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path) if db_path else None
+        self._names: Dict[str, str] = {}  # raw name -> vendor id (memory mode / cache)
+        self._keys: Dict[str, str] = {}  # key -> vendor id (memory mode)
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS vendor_entities (raw_name TEXT PRIMARY KEY, vendor_id TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS vendor_entity_keys (key TEXT PRIMARY KEY, block TEXT NOT NULL, vendor_id TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_vendor_entity_keys_block ON vendor_entity_keys(block)")
+
+    def _select(self, conn, sql: str, values: List[str]):
+        for i in range(0, len(values), self._CHUNK):
+            chunk = values[i:i + self._CHUNK]
+            yield from conn.execute(sql.format(marks=",".join("?" * len(chunk))), chunk)
+
+    def _merge_keys(self, known: Dict[str, str], new_keys: List[str]) -> Dict[str, str]:
+        """Assign IDs to `new_keys`, merging with each other and with `known` keys in the same block."""
+        keys = list(known) + new_keys
+        uf = _UnionFind(len(keys))
+        blocks: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            blocks.setdefault(block_of(k), []).append(i)
+
+        n_known = len(known)
+        for members in blocks.values():
+            if len(members) < 2 or not RAPIDFUZZ_SUPPORT or all(i < n_known for i in members):
+                continue
+            # only pairs involving at least one new key can change anything
+            new_members = [i for i in members if i >= n_known]
+            scores = process.cdist(
+                [keys[i] for i in new_members],
+                [keys[i] for i in members],
+                scorer=fuzz.token_sort_ratio,
+                score_cutoff=self.MERGE_THRESHOLD,
+                dtype=np.uint8,
+                workers=-1,
+            )
+            for r, c in zip(*np.nonzero(scores)):
+                uf.union(new_members[r], members[c])
+
+        ids = {}
+        for i in range(n_known, len(keys)):
+            root = uf.find(i)
+            ids[keys[i]] = known[keys[root]] if root < n_known else keys[root]
+        return ids
+
+    def resolve(self, names: Iterable[str]) -> Dict[str, str]:
+        """Return `{raw_name: vendor_id}` for the distinct non-empty names given.
+
+        Names are coerced to strings; names with an empty key (only
+        punctuation) are left unresolved.
+        """
+        names = list(dict.fromkeys(n for n in map(vendor_name, names) if n is not None))
+        resolved = {n: self._names[n] for n in names if n in self._names}
+        pending = [n for n in names if n not in resolved]
+        if not pending:
+            return resolved
+
+        conn = sqlite3.connect(self.db_path, timeout=30) if self.db_path else None
+        try:
+            if conn is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                for raw, vid in self._select(conn, "SELECT raw_name, vendor_id FROM vendor_entities WHERE raw_name IN ({marks})", pending):
+                    resolved[raw] = vid
+                pending = [n for n in pending if n not in resolved]
+
+            key_of = {n: canonical_key(n) for n in pending}
+            pending = [n for n in pending if key_of[n]]  # nothing to block or compare on
+            wanted = list(dict.fromkeys(key_of.values()))
+            if conn is not None:
+                key_ids = dict(self._select(conn, "SELECT key, vendor_id FROM vendor_entity_keys WHERE key IN ({marks})", wanted))
+            else:
+                key_ids = {k: self._keys[k] for k in wanted if k in self._keys}
+
+            new_keys = [k for k in wanted if k not in key_ids]
+            if new_keys:
+                blocks = list({block_of(k) for k in new_keys})
+                if conn is not None:
+                    known = dict(self._select(conn, "SELECT key, vendor_id FROM vendor_entity_keys WHERE block IN ({marks})", blocks))
+                else:
+                    wanted_blocks = set(blocks)
+                    known = {k: v for k, v in self._keys.items() if block_of(k) in wanted_blocks}
+                key_ids.update(self._merge_keys(known, new_keys))
+
+            for n in pending:
+                resolved[n] = key_ids[key_of[n]]
+
+            if conn is not None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO vendor_entity_keys (key, block, vendor_id) VALUES (?, ?, ?)",
+                    [(k, block_of(k), key_ids[k]) for k in new_keys],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO vendor_entities (raw_name, vendor_id) VALUES (?, ?)",
+                    [(n, resolved[n]) for n in pending],
+                )
+                conn.commit()
+            else:
+                self._keys.update((k, key_ids[k]) for k in new_keys)
+        finally:
+            if conn is not None:
+                conn.close()
+
+        self._names.update(resolved)
+        return resolved
+
+    def annotate(self, records: List[Dict]) -> List[Dict]:
+        """Set `vendor_id` on every record whose vendor name resolves."""
+        ids = self.resolve(r.get("vendor") for r in records)
+        for r in records:
+            vid = ids.get(vendor_name(r.get("vendor")))
+            if vid is not None:
+                r["vendor_id"] = vid
+        return records
@@ -0,0 +1,355 @@
+"""Process pools for the CPU-bound part of a request.
+
+The dashboard runs under waitress, whose request threads share one GIL:
+parsing an upload, vendor fuzzy matching, `Pipeline.run` and rendering the
+exports in a request thread stalls every other request. `WorkExecutor`
+sends that work to worker processes started (and warmed up) before the
+first request, so request threads only move bytes and wait, and throughput
+scales with cores.
+
+Work goes to one of two lanes, each its own pool:
+
+- `LIGHT`: small uploads and single invoices, milliseconds of work;
+- `HEAVY`: OCR, PDFs and large uploads, seconds or more.
+
+A burst of heavy jobs queues behind the heavy workers only, so it never
+starves short requests.
+
+The tasks (`audit_upload`, `audit_documents`) run extraction, vendor
+matching, the pipeline and the export in one worker call and return only the
+saved artifact paths, so no report is pickled across processes.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import metrics, progress
+
+
+LIGHT = "light"
+HEAVY = "heavy"
+LANES = (LIGHT, HEAVY)
+
+LIGHT_MAX_BYTES = 1024 * 1024  # larger uploads go to the heavy lane
+
+# imported by each worker up front, so the first job does not pay for it
+_PRELOAD = ["agentic_audit.executor", "agentic_audit.extractors", "agentic_audit.pipeline", "agentic_audit.artifacts"]
+
+
+def _default_heavy_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value and value.strip() else default
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+_events = None  # in a worker: queue of progress events for the server
+_JOB_END = "_job_end"  # sent after a job's last event, so the server knows its relay caught up
+_RELAY_WAIT = 2.0
+
+
+def _queue_event(job_id: str, stage: str, data: Dict[str, Any]):
+    _events.put((job_id, stage, data))
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+    progress.set_sink(_queue_event)
+
+
+_OBSERVATIONS_ATTR = "_metrics_observations"  # on a job's exception: what it recorded before failing
+
+
+def _call_job(fn: Callable, args: tuple, kwargs: dict, progress_id: Optional[str]):
+    """Run `fn` in the worker, returning its result and the metrics it recorded.
+
+    If `fn` raises, the metrics ride along on the exception (its `__dict__`
+    is pickled with it), so failed jobs are counted too.
+    """
+    try:
+        with metrics.capture() as observations, progress.job(progress_id):
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                setattr(e, _OBSERVATIONS_ATTR, observations)
+                raise
+    finally:
+        if progress_id is not None and _events is not None:
+            _events.put((progress_id, _JOB_END, {}))
+    return result, observations
+
+
+class WorkExecutor:
+    """Two process pools (`LIGHT`, `HEAVY`) behind `submit`/`run`.
+
+    With `heavy_workers=0` no processes are started and work runs inline in
+    the calling thread (useful for debugging and on platforms without
+    process pools).
+    """
+
+    def __init__(self, heavy_workers: Optional[int] = None, light_workers: int = 1):
+        self.workers = {
+            HEAVY: _default_heavy_workers() if heavy_workers is None else heavy_workers,
+            LIGHT: light_workers,
+        }
+        self.inline = self.workers[HEAVY] <= 0
+        self._pools: Dict[str, ProcessPoolExecutor] = {}
+        self._events = None  # progress events from the workers, relayed by a drain thread
+        self._relayed: Dict[str, threading.Event] = {}  # progress_id -> set once its events are relayed
+        self._lock = threading.Lock()
+        self._pending = {lane: 0 for lane in LANES}
+        self._completed = {lane: 0 for lane in LANES}
+        self._failed = {lane: 0 for lane in LANES}
+
+    @classmethod
+    def from_env(cls) -> "WorkExecutor":
+        """`EXECUTOR_HEAVY_WORKERS` (default: cores - 1, 0 runs inline) and `EXECUTOR_LIGHT_WORKERS` (default 1)."""
+        return cls(
+            heavy_workers=_env_int("EXECUTOR_HEAVY_WORKERS", _default_heavy_workers()),
+            light_workers=max(1, _env_int("EXECUTOR_LIGHT_WORKERS", 1)),
+        )
+
+    @staticmethod
+    def _context():
+        # forkserver: workers are forked from a clean single-threaded process,
+        # not from the threaded server (fork there can inherit held locks)
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(_PRELOAD)
+            return ctx
+        return multiprocessing.get_context("spawn")
+
+    def _pool(self, lane: str) -> ProcessPoolExecutor:
+        with self._lock:
+            pool = self._pools.get(lane)
+            if pool is None:
+                ctx = self._context()
+                if self._events is None:
+                    # SimpleQueue.put writes before returning, so a job's events
+                    # are in the pipe before its result is
+                    self._events = ctx.SimpleQueue()
+                    threading.Thread(target=self._relay_events, args=(self._events,),
+                                     name="executor-progress", daemon=True).start()
+                pool = ProcessPoolExecutor(max_workers=self.workers[lane], mp_context=ctx,
+                                           initializer=_init_worker, initargs=(self._events,))
+                self._pools[lane] = pool
+            return pool
+
+    def _relay_events(self, events):
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            job_id, stage, data = item
+            if stage == _JOB_END:
+                with self._lock:
+                    relayed = self._relayed.pop(job_id, None)
+                if relayed is not None:
+                    relayed.set()
+                continue
+            try:
+                progress.dispatch(job_id, stage, data)
+            except Exception as e:
+                print(f"[Executor] progress relay failed: {e}")
+
+    def start(self) -> "WorkExecutor":
+        """Start every worker now rather than on the first request."""
+        if self.inline:
+            return self
+        for lane in LANES:
+            pool = self._pool(lane)
+            for f in [pool.submit(_pid) for _ in range(self.workers[lane])]:
+                f.result()
+        return self
+
+    def submit(self, lane: str, fn: Callable, *args, progress_id: Optional[str] = None, **kwargs) -> Future:
+        """Future of `fn(*args, **kwargs)` run in `lane`.
+
+        Metrics the job records land in this process, and so do its
+        `progress.emit` events, attributed to `progress_id`. Those events are
+        relayed on another thread and may trail the result; `run` waits for
+        them.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        with self._lock:
+            self._pending[lane] += 1
+        if self.inline:
+            inner: Future = Future()
+            try:
+                inner.set_result(_call_job(fn, args, kwargs, progress_id))
+            except BaseException as e:
+                inner.set_exception(e)
+        else:
+            if progress_id is not None:
+                with self._lock:
+                    self._relayed[progress_id] = threading.Event()
+            try:
+                inner = self._pool(lane).submit(_call_job, fn, args, kwargs, progress_id)
+            except BrokenProcessPool:
+                self._reset(lane)
+                inner = self._pool(lane).submit(_call_job, fn, args, kwargs, progress_id)
+        future: Future = Future()
+        start = time.perf_counter()
+
+        def _unwrap(f: Future):
+            metrics.observe("executor_job_seconds", time.perf_counter() - start, lane=lane)
+            try:
+                result, observations = f.result()
+            except BaseException as e:
+                metrics.replay(getattr(e, _OBSERVATIONS_ATTR, ()))
+                self._done(lane, failed=True)
+                future.set_exception(e)
+            else:
+                metrics.replay(observations)
+                self._done(lane, failed=False)
+                future.set_result(result)
+
+        inner.add_done_callback(_unwrap)
+        return future
+
+    def run(self, lane: str, fn: Callable, *args, progress_id: Optional[str] = None, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` in `lane` and wait for its result (exceptions are re-raised).
+
+        With `progress_id`, also waits (briefly) until the job's progress
+        events have been dispatched, so the caller's own final event comes
+        after them.
+        """
+        try:
+            return self.submit(lane, fn, *args, progress_id=progress_id, **kwargs).result()
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory); the job is lost but the lane recovers
+            self._reset(lane)
+            if progress_id is not None:
+                with self._lock:  # its end marker will never come
+                    self._relayed.pop(progress_id, None)
+            raise
+        finally:
+            if progress_id is not None:
+                self._await_relay(progress_id)
+
+    def _await_relay(self, progress_id: str):
+        with self._lock:
+            relayed = self._relayed.get(progress_id)  # gone once relayed (or inline)
+        if relayed is not None and not relayed.wait(_RELAY_WAIT):
+            with self._lock:
+                self._relayed.pop(progress_id, None)
+
+    def _done(self, lane: str, failed: bool):
+        with self._lock:
+            self._pending[lane] -= 1
+            if failed:
+                self._failed[lane] += 1
+            else:
+                self._completed[lane] += 1
+
+    def _reset(self, lane: str):
+        with self._lock:
+            pool = self._pools.pop(lane, None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                lane: {
+                    "workers": 0 if self.inline else self.workers[lane],
+                    "pending": self._pending[lane],
+                    "completed": self._completed[lane],
+                    "failed": self._failed[lane],
+                }
+                for lane in LANES
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+            events, self._events = self._events, None
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+        if events is not None:
+            events.put(None)  # stops the relay thread
+
+
+def lane_for_upload(filename: str, size: int) -> str:
+    from .extractors import is_heavy
+    return HEAVY if is_heavy(filename) or size > LIGHT_MAX_BYTES else LIGHT
+
+
+# --- tasks (run in worker processes) ---
+
+_vendor_registry = None
+
+
+def _registry():
+    global _vendor_registry
+    if _vendor_registry is None:
+        from .vendor_registry import VendorRegistry
+        _vendor_registry = VendorRegistry()
+    return _vendor_registry
+
+
+def _attach_vendor_confidence(docs: List[Dict]):
+    try:
+        names = [d.get("vendor") if isinstance(d, dict) else None for d in docs]
+        registry = _registry()
+        before = registry.stats()["cache"]
+        with metrics.timer("vendor_match_seconds"):
+            matches = registry.match_many(names)
+        after = registry.stats()["cache"]
+        metrics.inc("cache_requests_total", after["hits"] - before["hits"], cache="vendor_match", result="hit")
+        metrics.inc("cache_requests_total", after["misses"] - before["misses"], cache="vendor_match", result="miss")
+        for d, conf in zip(docs, matches):
+            # attach fields the pipeline/exporters can include
+            if isinstance(d, dict):
+                d["vendor_confidence_score"] = conf.get("score")
+                d["vendor_confidence_match"] = conf.get("match")
+    except Exception as e:
+        print(f"Vendor matching error: {e}")
+
+
+def vendor_registry_stats() -> Dict[str, Any]:
+    return _registry().stats()
+
+
+def audit_documents(docs: List[Dict], export_dir, db_path, export_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Vendor matching, pipeline and export of `docs`; returns `ArtifactWriter.write`'s result."""
+    from .artifacts import ArtifactWriter
+    from .pipeline import Pipeline
+
+    _attach_vendor_confidence(docs)
+    progress.emit("vendors_matched", documents=len(docs))
+    report = Pipeline(db_path=db_path).run(docs, progress=progress.emit)
+    saved = ArtifactWriter(export_dir, db_path).write(report, **export_kwargs)
+    for kind, path in saved["paths"].items():
+        metrics.observe("export_bytes", path.stat().st_size, format=kind)
+    progress.emit("exported", formats=sorted(saved["relpaths"]))
+    return saved
+
+
+def audit_upload(path, filename: str, export_dir, db_path, export_kwargs: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """`audit_documents` for an upload saved at `path`: `(saved, error)`."""
+    from .admission import kind_for
+    from .extractors import extract_path
+
+    with metrics.timer("extract_seconds", kind=kind_for(filename)):
+        docs, error = extract_path(Path(path), filename, progress=progress.emit)
+    if error:
+        return None, error
+    if not docs:
+        return None, "Could not extract any invoice data from file"
+    progress.emit("extracted", documents=len(docs))
+    print(f"Processed {filename}: Extracted {len(docs)} document(s)")
+    return audit_documents(docs, export_dir, db_path, export_kwargs), None
@@ -1,10 +1,19 @@
 import json
 import csv
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
+from . import report_io, report_store
 
-def _invoice_flags(report: Dict[str, Any]) -> Dict[str, Dict[str, bool]]:
+try:
+    import ijson
+    IJSON_SUPPORT = True
+except Exception:
+    IJSON_SUPPORT = False
+
+
+def invoice_flags(report: Dict[str, Any]) -> Dict[str, Dict[str, bool]]:
     flags = {}
     fraud = report.get("fraud", {})
     # duplicates
@@ -24,73 +33,46 @@ def _invoice_flags(report: Dict[str, Any]) -> Dict[str, Dict[str, bool]]:
 
     # compliance
     for v in report.get("compliance", {}).get("violations", []):
-        iid = v.get("invoice_id")
-        flags.setdefault(iid, {})["compliance_violation"] = True
+        for iid in v.get("invoice_ids") or [v.get("invoice_id")]:
+            flags.setdefault(iid, {})["compliance_violation"] = True
 
     return flags
 
 
-def export_csv(report_path: str, out_path: str):
-    p = Path(report_path)
-    if not p.exists():
-        raise FileNotFoundError(report_path)
-
-    with p.open("r", encoding="utf-8") as f:
-        report = json.load(f)
-
-    flags = _invoice_flags(report)
-    vendor_scores = report.get("vendor", {}).get("vendor_scores", {})
+CSV_FIELDS = ["invoice_id", "vendor", "amount", "currency", "date", "items_count", "items_summary", "duplicate", "inflated", "fake_vendor", "compliance_violation", "vendor_score"]
 
-    out = Path(out_path)
-    out.parent.mkdir(parents=True, exist_ok=True)
-
-    fieldnames = ["invoice_id", "vendor", "amount", "currency", "date", "items_count", "items_summary", "duplicate", "inflated", "fake_vendor", "compliance_violation", "vendor_score"]
-    with out.open("w", newline='', encoding="utf-8") as csvf:
-        writer = csv.DictWriter(csvf, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in report.get("records", []):
-            iid = r.get("invoice_id")
-            items = r.get("items", []) or []
-            items_summary = "; ".join([str(i.get("desc", "")) for i in items])
-            v = r.get("vendor") or ""
-            row = {
-                "invoice_id": iid,
-                "vendor": v,
-                "amount": r.get("amount"),
-                "currency": r.get("currency"),
-                "date": r.get("date"),
-                "items_count": len(items),
-                "items_summary": items_summary,
-                "duplicate": bool(flags.get(iid, {}).get("duplicate", False)),
-                "inflated": bool(flags.get(iid, {}).get("inflated", False)),
-                "fake_vendor": bool(flags.get(iid, {}).get("fake_vendor", False)),
-                "compliance_violation": bool(flags.get(iid, {}).get("compliance_violation", False)),
-                "vendor_score": vendor_scores.get(v, {}).get("score") if v else None,
-            }
-            writer.writerow(row)
-
-
-def export_html(report_path: str, out_path: str):
-    p = Path(report_path)
-    if not p.exists():
-        raise FileNotFoundError(report_path)
 
-    with p.open("r", encoding="utf-8") as f:
-        report = json.load(f)
+def _load_report(report_path: str) -> Dict[str, Any]:
+    return report_io.read_report(report_path)
 
-    out = Path(out_path)
-    out.parent.mkdir(parents=True, exist_ok=True)
 
-    total = report.get("meta", {}).get("total", 0)
-    fraud_alerts = report.get("summary", {}).get("fraud_alerts", 0)
-    compliance_violations = report.get("summary", {}).get("compliance_violations", 0)
+def _csv_row(r: Dict[str, Any], flags: Dict[str, Dict[str, bool]], vendor_scores: Dict[str, Any]) -> Dict[str, Any]:
+    iid = r.get("invoice_id")
+    items = r.get("items", []) or []
+    items_summary = "; ".join([str(i.get("desc", "")) for i in items])
+    v = r.get("vendor") or ""
+    f = flags.get(iid, {})
+    return {
+        "invoice_id": iid,
+        "vendor": v,
+        "amount": r.get("amount"),
+        "currency": r.get("currency"),
+        "date": r.get("date"),
+        "items_count": len(items),
+        "items_summary": items_summary,
+        "duplicate": bool(f.get("duplicate", False)),
+        "inflated": bool(f.get("inflated", False)),
+        "fake_vendor": bool(f.get("fake_vendor", False)),
+        "compliance_violation": bool(f.get("compliance_violation", False)),
+        "vendor_score": vendor_scores.get(r.get("vendor_id") or v, {}).get("score") if v else None,
+    }
 
-    high_risk = report.get("summary", {}).get("high_risk_vendors", [])
 
+def _html_summary(meta: Dict[str, Any], summary: Dict[str, Any]) -> List[str]:
+    total = meta.get("total", 0)
+    fraud_alerts = summary.get("fraud_alerts", 0)
+    compliance_violations = summary.get("compliance_violations", 0)
     html = [
-        "<html>",
-        "<head><meta charset=\"utf-8\"><title>Audit Report Summary</title></head>",
-        "<body>",
         f"<h1>Audit Report Summary</h1>",
         f"<p>Total invoices: {total}</p>",
         f"<p>Fraud alerts: {fraud_alerts}</p>",
@@ -98,43 +80,431 @@ def export_html(report_path: str, out_path: str):
         "<h2>High Risk Vendors</h2>",
         "<ul>",
     ]
-
-    for v in high_risk:
+    for v in summary.get("high_risk_vendors", []):
         html.append(f"<li>{v.get('vendor')} — score: {v.get('score')}</li>")
+    html.append("</ul>")
+    return html
 
+
+def _html_head(meta: Dict[str, Any], summary: Dict[str, Any]) -> str:
+    html = [
+        "<html>",
+        "<head><meta charset=\"utf-8\"><title>Audit Report Summary</title></head>",
+        "<body>",
+    ]
+    html += _html_summary(meta, summary)
     html += [
-        "</ul>",
         "<h2>Invoices: Before & After Detection</h2>",
-        "<table border=1 cellpadding=4 cellspacing=0>",
-        "<tr><th>Field</th><th>Before (Original)</th><th>After Detection</th></tr>"
+        _TABLE_OPEN,
     ]
+    return "\n".join(html)
+
 
-    flags = _invoice_flags(report)
-    for r in report.get("records", []):
-        iid = r.get("invoice_id")
-        v = r.get("vendor") or ""
-        amt = r.get("amount")
-        raw = r.get("raw", {})
-        fflags = flags.get(iid, {})
-        flag_list = ", ".join([k for k, vv in fflags.items() if vv]) if fflags else "-"
-
-        html.append(f"<tr><td colspan=3 style='background:#f7f7f7;font-weight:bold;'>Invoice ID: {iid}</td></tr>")
-        html.append(f"<tr><td>Vendor</td><td>{raw.get('vendor','')}</td><td>{v}</td></tr>")
-        html.append(f"<tr><td>Amount</td><td>{raw.get('amount','')}</td><td>{amt}</td></tr>")
-        html.append(f"<tr><td>Date</td><td>{raw.get('date','')}</td><td>{r.get('date','')}</td></tr>")
-        html.append(f"<tr><td>Description</td><td>{raw.get('description','')}</td><td>{r.get('description','')}</td></tr>")
-        html.append(f"<tr><td>Flags</td><td>-</td><td>{flag_list}</td></tr>")
-        html.append(f"<tr><td colspan=3 style='background:#eee;'></td></tr>")
-
-    html += ["</table>"]
-
-    # Add summary message at the bottom
-    fraud_alerts = report.get("summary", {}).get("fraud_alerts", 0)
+_TABLE_OPEN = "<table border=1 cellpadding=4 cellspacing=0>\n<tr><th>Field</th><th>Before (Original)</th><th>After Detection</th></tr>"
+
+
+def _html_rows(r: Dict[str, Any], flags: Dict[str, Dict[str, bool]]) -> str:
+    iid = r.get("invoice_id")
+    v = r.get("vendor") or ""
+    amt = r.get("amount")
+    raw = r.get("raw", {})
+    fflags = flags.get(iid, {})
+    flag_list = ", ".join([k for k, vv in fflags.items() if vv]) if fflags else "-"
+    return "\n".join([
+        f"<tr><td colspan=3 style='background:#f7f7f7;font-weight:bold;'>Invoice ID: {iid}</td></tr>",
+        f"<tr><td>Vendor</td><td>{raw.get('vendor','')}</td><td>{v}</td></tr>",
+        f"<tr><td>Amount</td><td>{raw.get('amount','')}</td><td>{amt}</td></tr>",
+        f"<tr><td>Date</td><td>{raw.get('date','')}</td><td>{r.get('date','')}</td></tr>",
+        f"<tr><td>Description</td><td>{raw.get('description','')}</td><td>{r.get('description','')}</td></tr>",
+        f"<tr><td>Flags</td><td>-</td><td>{flag_list}</td></tr>",
+        f"<tr><td colspan=3 style='background:#eee;'></td></tr>",
+    ])
+
+
+def _html_banner(summary: Dict[str, Any]) -> str:
+    fraud_alerts = summary.get("fraud_alerts", 0)
     if fraud_alerts == 0:
-        html.append("<div style='margin-top:30px;padding:18px;background:#e6ffed;color:#22543d;font-size:1.2em;border-radius:10px;text-align:center;font-weight:bold;'>✅ No frauds detected. Invoice is perfect!</div>")
+        return "<div style='margin-top:30px;padding:18px;background:#e6ffed;color:#22543d;font-size:1.2em;border-radius:10px;text-align:center;font-weight:bold;'>✅ No frauds detected. Invoice is perfect!</div>"
+    return f"<div style='margin-top:30px;padding:18px;background:#fff5f5;color:#b00020;font-size:1.2em;border-radius:10px;text-align:center;font-weight:bold;'>⚠️ {fraud_alerts} fraud alert(s) detected! Please review the flagged invoices above.</div>"
+
+
+def _html_tail(summary: Dict[str, Any]) -> str:
+    # summary message at the bottom
+    return "\n".join(["</table>", _html_banner(summary), "</body>", "</html>"])
+
+
+def _write_csv_rows(records: Iterable[Dict[str, Any]], out_path: str, flags: Dict[str, Dict[str, bool]], vendor_scores: Dict[str, Any]):
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", newline='', encoding="utf-8") as csvf:
+        writer = csv.DictWriter(csvf, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(_csv_row(r, flags, vendor_scores) for r in records)
+
+
+def _write_html_rows(header: Dict[str, Any], records: Iterable[Dict[str, Any]], out_path: str, flags: Dict[str, Dict[str, bool]]):
+    summary = header.get("summary", {})
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", encoding="utf-8") as f:
+        f.write(_html_head(header.get("meta", {}), summary))
+        for r in records:
+            f.write("\n")
+            f.write(_html_rows(r, flags))
+        f.write("\n")
+        f.write(_html_tail(summary))
+
+
+def write_csv(report: Dict[str, Any], out_path: str, flags: Optional[Dict[str, Dict[str, bool]]] = None):
+    """Write the CSV export of an in-memory report; `flags` may be passed in to avoid recomputing them."""
+    flags = invoice_flags(report) if flags is None else flags
+    _write_csv_rows(report.get("records", []), out_path, flags, report.get("vendor", {}).get("vendor_scores", {}))
+
+
+def write_html(report: Dict[str, Any], out_path: str, flags: Optional[Dict[str, Dict[str, bool]]] = None,
+               page_size: Optional[int] = None):
+    """Write the HTML export of an in-memory report, row by row.
+
+    With `page_size`, reports with more records than that are written as a
+    paginated report instead (see `write_paginated_html`); `out_path` is then
+    its summary page.
+    """
+    flags = invoice_flags(report) if flags is None else flags
+    records = report.get("records", [])
+    if page_size and len(records) > page_size:
+        write_paginated_html(report, records, out_path, flags, page_size)
+    else:
+        _write_html_rows(report, records, out_path, flags)
+
+
+def write_json(report: Dict[str, Any], out_path: str, indent: Optional[int] = 2):
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=indent)
+
+
+def write_ndjson(report: Dict[str, Any], out_path: str, flags: Optional[Dict[str, Dict[str, bool]]] = None,
+                 raw_documents: Optional[str] = None):
+    """Write a report as an indexed NDJSON container (see `report_store`):
+    one header line with every section except `records`, then one line per
+    record, plus an offset index for random access. This is also the
+    streaming-friendly form read by `stream_csv` / `stream_html`.
+
+    `raw_documents` names a side file written by `report_io.write_compact`;
+    records then carry a `raw_ref` instead of their raw document.
+    """
+    flags = invoice_flags(report) if flags is None else flags
+    header = {k: v for k, v in report.items() if k != "records"}
+    records = report.get("records", [])
+    if raw_documents:
+        header["raw_documents"] = raw_documents
+        records = report_io.split_raw(report)[0]["records"]
+    report_store.write_container(header, records, out_path, flags)
+
+
+EXPORT_FORMATS = ("json", "csv", "html")
+
+
+def export_all(report: Dict[str, Any], out_base: str, formats: Iterable[str] = EXPORT_FORMATS,
+               concurrent: bool = False, page_size: Optional[int] = None,
+               compression: Optional[str] = None) -> Dict[str, Path]:
+    """Export an in-memory report to `<out_base>.<fmt>` for each format.
+
+    Flags are computed once and shared by the CSV and HTML writers; nothing is
+    read back from disk. With `concurrent=True` the files are written on a
+    small thread pool (the writers spend much of their time in file I/O).
+    `page_size` paginates the HTML report of large audits (see `write_html`).
+    With `compression` ("gzip" or "zstd") the JSON report is written in the
+    compact form of `report_io.write_compact`, raw documents going to a
+    side file returned as `paths["raw"]`. Returns `{fmt: path}`.
+    """
+    flags = invoice_flags(report)
+    writers = {
+        "json": lambda p: write_json(report, p),
+        "csv": lambda p: write_csv(report, p, flags),
+        "html": lambda p: write_html(report, p, flags, page_size),
+        "ndjson": lambda p: write_ndjson(report, p, flags),
+    }
+    paths = {fmt: Path(f"{out_base}.{fmt}") for fmt in formats}
+    unknown = set(paths) - set(writers)
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(sorted(unknown))}")
+    if compression and "json" in paths:
+        compact_paths = {"json": Path(f"{out_base}.json{report_io.COMPRESSIONS[compression]}")}
+        if any(r.get("raw") is not None for r in report.get("records", [])):
+            compact_paths["raw"] = report_io.raw_path_for(compact_paths["json"])
+        writers["json"] = lambda p: report_io.write_compact(report, out_base, compression)
+        paths["json"] = compact_paths["json"]
+        if "raw" in compact_paths:
+            writers["ndjson"] = lambda p: write_ndjson(report, p, flags, compact_paths["raw"].name)
+
+    jobs = list(paths.items())
+    if compression and "json" in paths:
+        paths.update(compact_paths)
+
+    if concurrent and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = [pool.submit(writers[fmt], path) for fmt, path in jobs]
+            for fut in futures:
+                fut.result()
+    else:
+        for fmt, path in jobs:
+            writers[fmt](path)
+    return paths
+
+
+def export_csv(report_path: str, out_path: str):
+    write_csv(_load_report(report_path), out_path)
+
+
+def export_html(report_path: str, out_path: str, page_size: Optional[int] = None):
+    write_html(_load_report(report_path), out_path, page_size=page_size)
+
+
+# --- streaming exports ---
+# Large audits are exported without ever holding the records in memory:
+# records are read one at a time and each CSV/HTML row is written as soon
+# as it is rendered. Only the header sections (flags, vendor scores) are kept.
+
+def _ndjson_records(path: Path, raw_docs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        f.readline()  # header
+        for line in f:
+            if line.strip():
+                yield report_io.resolve_raw(json.loads(line), raw_docs)
+
+
+def _json_header(path: Path) -> Dict[str, Any]:
+    """Every top-level section of a report JSON except `records`, parsed incrementally."""
+    header: Dict[str, Any] = {}
+    builder, key = None, None
+    with path.open("rb") as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == "" and event == "map_key":
+                if builder is not None:
+                    header[key] = builder.value
+                key = value
+                builder = None if key == "records" else ijson.ObjectBuilder()
+            elif builder is not None and prefix:
+                builder.event(event, value)
+        if builder is not None:
+            header[key] = builder.value
+    return header
+
+
+def _json_records(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("rb") as f:
+        yield from ijson.items(f, "records.item", use_float=True)
+
+
+def open_report_stream(report_path: str) -> Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]:
+    """Return `(header, records)` for a report without loading its records.
+
+    `.ndjson` reports (see `write_ndjson`) are read line by line. Plain JSON
+    reports need `ijson`; they are read twice, once for the header sections
+    (which may come after `records`) and once for the records.
+    """
+    p = Path(report_path)
+    if not p.exists():
+        raise FileNotFoundError(report_path)
+    if p.suffix == ".ndjson":
+        with p.open("r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+        # raw documents live in a side file (see `write_ndjson`); only that map is held in memory
+        raw_docs = report_io.load_raw_documents(p, header)
+        header.pop("raw_documents", None)
+        return header, _ndjson_records(p, raw_docs)
+    if not IJSON_SUPPORT:
+        raise RuntimeError("Streaming a JSON report requires ijson (pip install ijson); use an .ndjson report instead")
+    return _json_header(p), _json_records(p)
+
+
+def stream_csv(report_path: str, out_path: str):
+    """Constant-memory equivalent of `export_csv` (memory grows only with the number of flagged invoices)."""
+    header, records = open_report_stream(report_path)
+    _write_csv_rows(records, out_path, invoice_flags(header), header.get("vendor", {}).get("vendor_scores", {}))
+
+
+def stream_html(report_path: str, out_path: str, page_size: Optional[int] = None):
+    """Constant-memory equivalent of `export_html`; `page_size` writes a paginated report."""
+    header, records = open_report_stream(report_path)
+    if page_size:
+        return write_paginated_html(header, records, out_path, invoice_flags(header), page_size)
     else:
-        html.append(f"<div style='margin-top:30px;padding:18px;background:#fff5f5;color:#b00020;font-size:1.2em;border-radius:10px;text-align:center;font-weight:bold;'>⚠️ {fraud_alerts} fraud alert(s) detected! Please review the flagged invoices above.</div>")
+        _write_html_rows(header, records, out_path, invoice_flags(header))
+
 
-    html += ["</body>", "</html>"]
+# --- paginated HTML ---
+# A single page with seven table rows per invoice stops being usable after a
+# few thousand invoices. The paginated report splits it into flat files next
+# to the summary page `<base>.html`:
+#   <base>.p0001.html ...          all invoices, `page_size` per page
+#   <base>.flagged.p0001.html ...  flagged invoices only
+#   <base>.index.json              compact search index: one
+#                                  [invoice_id, vendor, amount, page, flags]
+#                                  row per invoice, loaded by the summary
+#                                  page only when a search is made
+# Pages are written as soon as they fill, so generation streams like
+# `stream_html` and every file stays bounded in size.
 
+HTML_PAGE_SIZE = 500
+_PAGE_LINKS = 20  # page links shown at each end of the summary's page list
+
+_PAGE_STYLE = "<style>body{font-family:sans-serif} nav a{margin-right:10px}</style>"
+
+_SEARCH_SCRIPT = """<script>
+let rows = null;
+async function search(q) {
+  const out = document.getElementById('results');
+  q = q.trim().toLowerCase();
+  out.innerHTML = '';
+  if (!q) return;
+  if (rows === null) rows = (await (await fetch(INDEX)).json()).invoices;
+  let shown = 0;
+  for (const [id, vendor, amount, page, flags] of rows) {
+    if (String(id).toLowerCase().includes(q) || String(vendor).toLowerCase().includes(q)) {
+      const li = document.createElement('li');
+      const a = document.createElement('a');
+      a.href = PAGE_PREFIX + String(page).padStart(4, '0') + '.html#inv-' + encodeURIComponent(id);
+      a.textContent = id + ' \u2014 ' + vendor + ' \u2014 ' + amount + (flags ? ' [' + flags + ']' : '');
+      li.appendChild(a);
+      out.appendChild(li);
+      if (++shown >= 200) break;
+    }
+  }
+  if (!shown) out.innerHTML = '<li>No matches</li>';
+}
+</script>"""
+
+
+def _page_name(base: str, page: int, flagged: bool = False) -> str:
+    return f"{base}{'.flagged' if flagged else ''}.p{page:04d}.html"
+
+
+def _page_nav(base: str, page: int, pages: Optional[int], flagged: bool) -> str:
+    links = [f"<a href='{base}.html'>Summary</a>"]
+    if page > 1:
+        links.append(f"<a href='{_page_name(base, page - 1, flagged)}'>&laquo; Previous</a>")
+    # the last page does not know yet whether another follows; it is rewritten with `pages` set
+    if pages is None or page < pages:
+        links.append(f"<a href='{_page_name(base, page + 1, flagged)}'>Next &raquo;</a>")
+    return f"<nav>{''.join(links)}<span>Page {page}{f' of {pages}' if pages else ''}</span></nav>"
+
+
+class _PageWriter:
+    """Buffers at most one page of rendered invoice rows and writes it out when full."""
+
+    def __init__(self, directory: Path, base: str, page_size: int, flagged: bool):
+        self.directory = directory
+        self.base = base
+        self.page_size = page_size
+        self.flagged = flagged
+        self.rows: List[str] = []
+        self.page = 0
+        self.count = 0
+
+    @property
+    def current_page(self) -> int:
+        return self.page + 1
+
+    def add(self, row_html: str):
+        self.rows.append(row_html)
+        self.count += 1
+        if len(self.rows) >= self.page_size:
+            self._flush(last=False)
+
+    def _flush(self, last: bool):
+        self.page += 1
+        title = "Flagged invoices" if self.flagged else "Invoices"
+        nav = _page_nav(self.base, self.page, self.page if last else None, self.flagged)
+        html = [
+            "<html>",
+            f"<head><meta charset=\"utf-8\"><title>{title} — page {self.page}</title>{_PAGE_STYLE}</head>",
+            "<body>",
+            nav,
+            f"<h2>{title}</h2>",
+            _TABLE_OPEN,
+        ] + self.rows + ["</table>", nav, "</body>", "</html>"]
+        (self.directory / _page_name(self.base, self.page, self.flagged)).write_text("\n".join(html), encoding="utf-8")
+        self.rows = []
+
+    def close(self) -> int:
+        """Write the final page and return the page count."""
+        if self.rows or self.page == 0:
+            self._flush(last=True)
+        elif self.page:
+            # the previous page filled exactly; rewrite its nav without a Next link
+            path = self.directory / _page_name(self.base, self.page, self.flagged)
+            text = path.read_text(encoding="utf-8")
+            path.write_text(text.replace(_page_nav(self.base, self.page, None, self.flagged),
+                                         _page_nav(self.base, self.page, self.page, self.flagged)), encoding="utf-8")
+        return self.page
+
+
+def write_paginated_html(header: Dict[str, Any], records: Iterable[Dict[str, Any]], out_path: str,
+                         flags: Optional[Dict[str, Dict[str, bool]]] = None, page_size: int = HTML_PAGE_SIZE) -> Dict[str, Any]:
+    """Write a paginated HTML report; `out_path` (e.g. `report-1.html`) becomes the summary page.
+
+    `records` may be any iterable (e.g. from `open_report_stream`). Returns
+    the page counts and the index path.
+    """
+    flags = invoice_flags(header) if flags is None else flags
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    base = out.stem
+    index_path = out.with_name(f"{base}.index.json")
+
+    all_pages = _PageWriter(out.parent, base, page_size, flagged=False)
+    flagged_pages = _PageWriter(out.parent, base, page_size, flagged=True)
+    with index_path.open("w", encoding="utf-8") as idx:
+        idx.write('{"invoices":[')
+        for r in records:
+            iid = r.get("invoice_id")
+            fflags = flags.get(iid, {})
+            flag_list = ",".join(k for k, vv in fflags.items() if vv)
+            page = all_pages.current_page
+            row_html = f"<tbody id='inv-{iid}'>\n{_html_rows(r, flags)}\n</tbody>"
+            all_pages.add(row_html)
+            if flag_list:
+                flagged_pages.add(row_html)
+            if all_pages.count > 1:
+                idx.write(",")
+            idx.write(json.dumps([iid, r.get("vendor") or "", r.get("amount"), page, flag_list], separators=(",", ":")))
+        pages = all_pages.close()
+        flagged_count = flagged_pages.count
+        flagged_total = flagged_pages.close() if flagged_count else 0
+        idx.write(f'],"page_size":{page_size},"pages":{pages},"flagged_pages":{flagged_total}}}')
+
+    summary = header.get("summary", {})
+    shown = list(range(1, pages + 1)) if pages <= 2 * _PAGE_LINKS else list(range(1, _PAGE_LINKS + 1)) + list(range(pages - _PAGE_LINKS + 1, pages + 1))
+    page_links = " ".join(f"<a href='{_page_name(base, p)}'>{p}</a>" + (" …" if p == _PAGE_LINKS and len(shown) < pages else "") for p in shown)
+    html = [
+        "<html>",
+        f"<head><meta charset=\"utf-8\"><title>Audit Report Summary</title>{_PAGE_STYLE}</head>",
+        "<body>",
+    ]
+    html += _html_summary(header.get("meta", {}), summary)
+    html += [
+        "<h2>Invoices</h2>",
+        f"<p>{all_pages.count} invoice(s) in {pages} page(s) of {page_size}.</p>",
+        f"<p>Pages: {page_links}</p>",
+        f"<form onsubmit=\"location.href={json.dumps(base + '.p')}+String(this.page.value).padStart(4,'0')+'.html';return false;\">"
+        f"Go to page <input name='page' type='number' min='1' max='{pages}' value='1'> <button>Go</button></form>",
+    ]
+    if flagged_count:
+        html.append(f"<p><a href='{_page_name(base, 1, flagged=True)}'>Flagged invoices only</a> ({flagged_count} invoice(s) in {flagged_total} page(s))</p>")
+    else:
+        html.append("<p>No flagged invoices.</p>")
+    html += [
+        "<h2>Search</h2>",
+        "<input type='search' placeholder='Invoice ID or vendor' oninput='search(this.value)'>",
+        "<ul id='results'></ul>",
+        f"<script>const INDEX = {json.dumps(index_path.name)}; const PAGE_PREFIX = {json.dumps(base + '.p')};</script>",
+        _SEARCH_SCRIPT,
+        _html_banner(summary),
+        "</body>",
+        "</html>",
+    ]
     out.write_text("\n".join(html), encoding="utf-8")
+    return {"pages": pages, "flagged_pages": flagged_total, "index": index_path}
@@ -0,0 +1,375 @@
+"""Invoice extraction from uploaded files (PDF, JSON, text, CSV, Excel, Word, images).
+
+Kept free of Flask and dashboard state so the executor's worker processes
+can import it cheaply (see `agentic_audit.executor`).
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import metrics
+
+try:
+    import pdfplumber
+    PDF_SUPPORT = True
+except ImportError:
+    PDF_SUPPORT = False
+
+try:
+    import pandas as pd
+    PANDAS_SUPPORT = True
+except ImportError:
+    PANDAS_SUPPORT = False
+
+try:
+    from docx import Document
+    DOCX_SUPPORT = True
+except ImportError:
+    DOCX_SUPPORT = False
+
+# Image / OCR support
+try:
+    from PIL import Image
+    PIL_SUPPORT = True
+except Exception:
+    PIL_SUPPORT = False
+
+try:
+    import pytesseract
+    TESSERACT_SUPPORT = True
+except Exception:
+    TESSERACT_SUPPORT = False
+
+# If user provided a TESSERACT_CMD environment variable, use it (optional)
+if TESSERACT_SUPPORT:
+    t_cmd = os.environ.get("TESSERACT_CMD")
+    if t_cmd:
+        try:
+            pytesseract.pytesseract.tesseract_cmd = t_cmd
+        except Exception:
+            pass
+
+
+def extract_invoice_from_pdf(pdf_path, progress=None):
+    """Extract invoice data from PDF using pdfplumber (`progress("page", ...)` after each page)"""
+    if not PDF_SUPPORT:
+        return None
+    
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            full_text = ""
+            pages = len(pdf.pages)
+            for number, page in enumerate(pdf.pages, 1):
+                full_text += page.extract_text() + "\n"
+                if progress is not None:
+                    progress("page", page=number, pages=pages)
+            
+            # Parse invoice details from text
+            invoice_data = parse_invoice_text(full_text)
+            return invoice_data
+    except Exception as e:
+        print(f"PDF extraction error: {e}")
+        return None
+
+def parse_invoice_text(text):
+    """Extract structured invoice data from unstructured text"""
+    invoice = {
+        "invoice_id": None,
+        "vendor": None,
+        "amount": None,
+        "date": None,
+        "description": "Uploaded invoice"
+    }
+    
+    # Try to find invoice number
+    patterns = [
+        r'Invoice\s*#?:?\s*([A-Z0-9\-]+)',
+        r'Order\s*#?:?\s*([A-Z0-9\-]+)',
+        r'Order ID\s*:?\s*([A-Z0-9\-]+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            invoice["invoice_id"] = match.group(1)
+            break
+    
+    if not invoice["invoice_id"]:
+        invoice["invoice_id"] = f"INV-{int(time.time())}"
+    
+    # Try to find amount/total
+    amount_patterns = [
+        r'(?:Total|Amount|Grand Total|Price)\s*[:\s]*[₹\$]?\s*([\d,]+\.?\d*)',
+        r'([\d,]+\.?\d*)\s*(?:INR|USD|\$|₹)',
+    ]
+    for pattern in amount_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            amount_str = match.group(1).replace(',', '')
+            try:
+                invoice["amount"] = float(amount_str)
+                break
+            except:
+                pass
+    
+    if not invoice["amount"]:
+        invoice["amount"] = 0.0
+    
+    # Try to find vendor/seller
+    vendor_patterns = [
+        r'(?:Seller|Vendor|From|Company|Supplied by)\s*[:\n]\s*([A-Za-z\s&]+)',
+        r'(?:Bill to|Sold by)\s*[:\n]\s*([A-Za-z\s&]+)',
+    ]
+    for pattern in vendor_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            vendor = match.group(1).strip()
+            if len(vendor) > 3 and len(vendor) < 100:
+                invoice["vendor"] = vendor
+                break
+    
+    if not invoice["vendor"]:
+        invoice["vendor"] = "Unknown Vendor"
+    
+    # Try to find date
+    date_pattern = r'(?:Date|Order Date|Invoice Date)\s*[:\n]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})'
+    match = re.search(date_pattern, text, re.IGNORECASE)
+    if match:
+        invoice["date"] = match.group(1)
+    else:
+        from datetime import datetime
+        invoice["date"] = datetime.now().strftime("%Y-%m-%d")
+    
+    return invoice
+
+
+def extract_from_txt(file_content):
+    """Extract invoice data from plain text"""
+    lines = file_content.split('\n')
+    full_text = ' '.join(lines)
+    return parse_invoice_text(full_text)
+
+def extract_from_csv(file_path):
+    """Extract invoice data from CSV"""
+    if not PANDAS_SUPPORT:
+        return None
+    
+    try:
+        df = pd.read_csv(file_path)
+        
+        # Try to find relevant columns
+        invoice_data = {
+            "invoice_id": None,
+            "vendor": None,
+            "amount": None,
+            "date": None,
+            "description": "CSV invoice"
+        }
+        
+        # Map common CSV column names
+        for col in df.columns:
+            col_lower = col.lower()
+            if 'invoice' in col_lower or 'order' in col_lower or 'id' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["invoice_id"] = str(df[col].iloc[0])
+            elif 'vendor' in col_lower or 'seller' in col_lower or 'company' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["vendor"] = str(df[col].iloc[0])
+            elif 'amount' in col_lower or 'total' in col_lower or 'price' in col_lower:
+                if df[col].notna().any():
+                    try:
+                        invoice_data["amount"] = float(df[col].iloc[0])
+                    except:
+                        pass
+            elif 'date' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["date"] = str(df[col].iloc[0])
+        
+        # Set defaults
+        if not invoice_data["invoice_id"]:
+            invoice_data["invoice_id"] = f"INV-{int(time.time())}"
+        if not invoice_data["vendor"]:
+            invoice_data["vendor"] = "Unknown Vendor"
+        if not invoice_data["amount"]:
+            invoice_data["amount"] = 0.0
+        if not invoice_data["date"]:
+            from datetime import datetime
+            invoice_data["date"] = datetime.now().strftime("%Y-%m-%d")
+        
+        return invoice_data
+    except Exception as e:
+        print(f"CSV extraction error: {e}")
+        return None
+
+def extract_from_xlsx(file_path):
+    """Extract invoice data from Excel"""
+    if not PANDAS_SUPPORT:
+        return None
+    
+    try:
+        df = pd.read_excel(file_path)
+        
+        invoice_data = {
+            "invoice_id": None,
+            "vendor": None,
+            "amount": None,
+            "date": None,
+            "description": "Excel invoice"
+        }
+        
+        # Map common Excel column names
+        for col in df.columns:
+            col_lower = col.lower()
+            if 'invoice' in col_lower or 'order' in col_lower or 'id' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["invoice_id"] = str(df[col].iloc[0])
+            elif 'vendor' in col_lower or 'seller' in col_lower or 'company' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["vendor"] = str(df[col].iloc[0])
+            elif 'amount' in col_lower or 'total' in col_lower or 'price' in col_lower:
+                if df[col].notna().any():
+                    try:
+                        invoice_data["amount"] = float(df[col].iloc[0])
+                    except:
+                        pass
+            elif 'date' in col_lower:
+                if df[col].notna().any():
+                    invoice_data["date"] = str(df[col].iloc[0])
+        
+        # Set defaults
+        if not invoice_data["invoice_id"]:
+            invoice_data["invoice_id"] = f"INV-{int(time.time())}"
+        if not invoice_data["vendor"]:
+            invoice_data["vendor"] = "Unknown Vendor"
+        if not invoice_data["amount"]:
+            invoice_data["amount"] = 0.0
+        if not invoice_data["date"]:
+            from datetime import datetime
+            invoice_data["date"] = datetime.now().strftime("%Y-%m-%d")
+        
+        return invoice_data
+    except Exception as e:
+        print(f"Excel extraction error: {e}")
+        return None
+
+def extract_from_docx(file_path):
+    """Extract invoice data from Word document"""
+    if not DOCX_SUPPORT:
+        return None
+    
+    try:
+        doc = Document(file_path)
+        full_text = '\n'.join([para.text for para in doc.paragraphs])
+        return parse_invoice_text(full_text)
+    except Exception as e:
+        print(f"DOCX extraction error: {e}")
+        return None
+
+def extract_from_image(file_path, progress=None):
+    """Extract invoice data from image using OCR (pytesseract + Pillow); `progress("ocr", ...)` when OCR is done"""
+    if not (PIL_SUPPORT and TESSERACT_SUPPORT):
+        return None
+    try:
+        img = Image.open(file_path)
+        # convert to RGB to handle some formats
+        img = img.convert('RGB')
+        with metrics.timer("ocr_seconds", engine="tesseract"):
+            text = pytesseract.image_to_string(img)
+        cleaned = text.strip() if text else ""
+        if progress is not None:
+            progress("ocr", engine="tesseract", chars=len(cleaned))
+        print(f"[OCR] extracted text length={len(cleaned)} from {file_path}")
+        if not cleaned:
+            print(f"[OCR] No text extracted from image: {file_path}")
+            return None
+        invoice_data = parse_invoice_text(cleaned)
+        return invoice_data
+    except Exception as e:
+        print(f"Image OCR error for {file_path}: {e}")
+        return None
+
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.tiff', '.tif', '.bmp', '.gif', '.webp')
+# OCR and PDF text extraction take seconds per file, the other formats milliseconds
+HEAVY_SUFFIXES = ('.pdf',) + IMAGE_SUFFIXES
+
+
+def is_heavy(filename: str) -> bool:
+    return filename.lower().endswith(HEAVY_SUFFIXES)
+
+
+def _single(invoice_data, error):
+    if not invoice_data:
+        return None, error
+    return [invoice_data], None
+
+
+def extract_path(path, filename: str, progress=None) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """Invoice documents from an upload saved at `path`; `filename` (the
+    client's name) selects the parser. Returns `(docs, error)`. `progress`
+    is passed to the PDF and OCR extractors."""
+    path = str(path)
+    name = filename.lower()
+
+    # PDF
+    if name.endswith('.pdf'):
+        if not PDF_SUPPORT:
+            return None, "PDF support not installed. Run: pip install pdfplumber"
+        return _single(extract_invoice_from_pdf(path, progress), "Could not extract invoice data from PDF")
+
+    # JSON
+    if name.endswith('.json'):
+        try:
+            raw_data = Path(path).read_bytes()
+            data = None
+
+            for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']:
+                try:
+                    content = raw_data.decode(encoding)
+                    data = json.loads(content)
+                    break
+                except:
+                    continue
+
+            if data is None:
+                return None, "Failed to parse JSON. Ensure file is valid UTF-8 JSON"
+
+            return (data if isinstance(data, list) else [data]), None
+        except Exception as e:
+            return None, f"JSON parse error: {str(e)}"
+
+    # TXT
+    if name.endswith('.txt'):
+        try:
+            content = Path(path).read_bytes().decode('utf-8', errors='ignore')
+            return _single(extract_from_txt(content), "Could not extract invoice data from text")
+        except Exception as e:
+            return None, f"Text parse error: {str(e)}"
+
+    # CSV
+    if name.endswith('.csv'):
+        if not PANDAS_SUPPORT:
+            return None, "CSV support requires pandas. Run: pip install pandas"
+        return _single(extract_from_csv(path), "Could not extract invoice data from CSV")
+
+    # XLSX/XLS
+    if name.endswith(('.xlsx', '.xls')):
+        if not PANDAS_SUPPORT:
+            return None, "Excel support requires pandas. Run: pip install pandas openpyxl"
+        return _single(extract_from_xlsx(path), "Could not extract invoice data from Excel")
+
+    # DOCX
+    if name.endswith('.docx'):
+        if not DOCX_SUPPORT:
+            return None, "DOCX support requires python-docx. Run: pip install python-docx"
+        return _single(extract_from_docx(path), "Could not extract invoice data from document")
+
+    # Images (JPG, PNG, TIFF, GIF, WEBP, BMP)
+    if name.endswith(IMAGE_SUFFIXES):
+        if not (PIL_SUPPORT and TESSERACT_SUPPORT):
+            return None, "Image OCR requires Pillow and pytesseract and system Tesseract installed. Run: pip install pillow pytesseract and install tesseract-ocr on your system"
+        return _single(extract_from_image(path, progress), "Could not extract invoice data from image")
+
+    return None, f"Unsupported file type: {filename}. Supported: PDF, JSON, TXT, CSV, XLSX, XLS, DOCX"
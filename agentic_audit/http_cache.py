@@ -0,0 +1,128 @@
+"""HTTP delivery helpers for report files: precompression, ETags, ranges.
+
+Report artifacts are written once under a unique name and never modified,
+so they can be cached forever and validated with a strong ETag derived from
+the file's identity (name, size, mtime). Text formats are gzip-compressed at
+write time (`<file>.gz` next to `<file>`) and the compressed variant is sent
+to clients that accept it, so nothing is compressed per request.
+
+Used by the Flask dashboards (`tools/serving.py`) and by the standalone
+static server (`tools/serve_report.py`).
+"""
+import gzip
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+PRECOMPRESS_SUFFIXES = {".html", ".csv", ".json"}
+MIN_PRECOMPRESS_BYTES = 256  # below this gzip headers eat the savings
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# report-<ULID>... names are never rewritten (see artifacts.ArtifactWriter)
+_IMMUTABLE_NAME = re.compile(r"^report-[0-9A-HJKMNP-TV-Z]{26}\.")
+
+
+def precompress(path: Path, level: int = 9) -> Optional[Path]:
+    """Write `<path>.gz` if the file is a compressible text format and gzip makes it smaller."""
+    path = Path(path)
+    if path.suffix not in PRECOMPRESS_SUFFIXES or path.stat().st_size < MIN_PRECOMPRESS_BYTES:
+        return None
+    data = path.read_bytes()
+    packed = gzip.compress(data, compresslevel=level, mtime=0)
+    if len(packed) >= len(data):
+        return None
+    out = Path(str(path) + ".gz")
+    with out.open("wb") as f:
+        f.write(packed)
+        f.flush()
+        os.fsync(f.fileno())
+    return out
+
+
+def etag_for(path: Path, st: Optional[os.stat_result] = None) -> str:
+    """Strong validator (unquoted) for a file that is only ever replaced, never edited in place."""
+    st = st or os.stat(path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def cache_control_for(name: str) -> str:
+    return IMMUTABLE_CACHE_CONTROL if _IMMUTABLE_NAME.match(Path(name).name) else REVALIDATE_CACHE_CONTROL
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """True if an Accept-Encoding header allows `coding` (honours `q=0` and `*`)."""
+    if not accept_encoding:
+        return False
+    wildcard = None
+    for part in accept_encoding.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        name = fields[0].lower()
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return bool(wildcard)
+
+
+def gzip_variant(path: Path, accept_encoding: Optional[str]) -> Optional[Path]:
+    """The precompressed sibling of `path` if it exists and the client accepts gzip."""
+    if Path(path).suffix not in PRECOMPRESS_SUFFIXES:
+        return None
+    gz = Path(str(path) + ".gz")
+    if accepts_encoding(accept_encoding, "gzip") and gz.is_file():
+        return gz
+    return None
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive `(start, end)`.
+
+    Returns None when there is no usable range (absent, malformed or multiple
+    ranges: the full body is sent), and `(length, length)` when the range is
+    not satisfiable (the caller answers 416).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    spec = header[len("bytes="):].strip()
+    start_s, sep, end_s = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if start_s == "":
+            suffix = int(end_s)
+            if suffix <= 0:
+                return (length, length)
+            return (max(0, length - suffix), length - 1)
+        start = int(start_s)
+        end = int(end_s) if end_s else length - 1
+    except ValueError:
+        return None
+    if start >= length or end < start:
+        return (length, length)
+    return (start, min(end, length - 1))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an (unquoted) ETag, per RFC 9110."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
@@ -0,0 +1,76 @@
+"""Which invoices the per-vendor aggregates have already counted.
+
+`VendorBaselines` and `VendorHistory` fold every batch into running
+aggregates. Uploading the same file twice would count its invoices twice and
+pull the aggregates towards whatever that file contains, so each store keeps a
+ledger of the `(vendor, invoice_id)` pairs it has folded in and skips the
+ones it has seen. Records without an invoice id cannot be recognised and
+always count.
+"""
+import sqlite3
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class InvoiceLedger:
+    """`(vendor, invoice_id)` pairs already counted, in memory or in a SQLite table."""
+
+    _CHUNK = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, table: str):
+        self.table = table
+        self._memory: Set[Tuple[str, str]] = set()
+
+    def init_db(self, conn: sqlite3.Connection):
+        # keyed by invoice_id first: a batch is looked up by its invoice ids
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                invoice_id TEXT NOT NULL,
+                vendor TEXT NOT NULL,
+                PRIMARY KEY (invoice_id, vendor)
+            )
+            """
+        )
+
+    def claim(self, keys: List[str], codes: np.ndarray, ids: List[Optional[str]],
+              conn: Optional[sqlite3.Connection] = None) -> np.ndarray:
+        """Mask of the records to count, which are recorded as counted.
+
+        A record is skipped if its pair was counted before or occurs earlier
+        in the batch. With `conn` the ledger is the table, read and written
+        inside the caller's transaction, so it commits with the aggregates.
+        """
+        pairs = [(keys[c], i) if i else None for c, i in zip(codes.tolist(), ids)]
+        wanted = {p for p in pairs if p is not None}
+        if conn is None:
+            seen = self._memory & wanted
+        else:
+            seen = set()
+            batch_ids = sorted({i for _, i in wanted})
+            for n in range(0, len(batch_ids), self._CHUNK):
+                chunk = batch_ids[n:n + self._CHUNK]
+                marks = ",".join("?" * len(chunk))
+                for vendor, invoice_id in conn.execute(
+                    f"SELECT vendor, invoice_id FROM {self.table} WHERE invoice_id IN ({marks})", chunk
+                ):
+                    seen.add((vendor, invoice_id))
+
+        fresh = np.ones(len(pairs), dtype=bool)
+        new: Set[Tuple[str, str]] = set()
+        for n, p in enumerate(pairs):
+            if p is None:
+                continue
+            if p in seen or p in new:
+                fresh[n] = False
+            else:
+                new.add(p)
+        if conn is None:
+            self._memory |= new
+        elif new:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (invoice_id, vendor) VALUES (?, ?)",
+                [(i, v) for v, i in new],
+            )
+        return fresh
@@ -0,0 +1,210 @@
+"""In-process metrics in the Prometheus text format.
+
+Every metric is declared once in `_DEFINITIONS` and recorded with
+`observe`/`inc`/`timer`; recording takes one short lock and a bisect.
+`REGISTRY.render()` produces the `/metrics` page.
+
+Most of the work behind a request runs in executor worker processes, whose
+counters the server never sees. So `executor.WorkExecutor` runs each job
+inside `capture()`, which buffers that job's observations, sends them back
+with the result and `replay`s them into the server's registry. Code that
+records metrics does not need to know which process it runs in.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(float(4 ** i) * 1024 for i in range(0, 10))  # 1 KiB .. 256 GiB
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# name -> (type, help, buckets)
+_DEFINITIONS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    "http_request_duration_seconds": (HISTOGRAM, "Time to produce a response, by route, method and status.", LATENCY_BUCKETS),
+    "pipeline_stage_seconds": (HISTOGRAM, "Duration of each Pipeline.run stage.", LATENCY_BUCKETS),
+    "extract_seconds": (HISTOGRAM, "Time to extract invoices from an upload, by file kind.", LATENCY_BUCKETS),
+    "ocr_seconds": (HISTOGRAM, "OCR engine latency per image.", LATENCY_BUCKETS),
+    "vendor_match_seconds": (HISTOGRAM, "Vendor fuzzy-match latency per batch of names.", LATENCY_BUCKETS),
+    "sqlite_query_seconds": (HISTOGRAM, "SQLite query and transaction times on the request path.", LATENCY_BUCKETS),
+    "executor_job_seconds": (HISTOGRAM, "Executor job time including queueing, by lane.", LATENCY_BUCKETS),
+    "export_bytes": (HISTOGRAM, "Size of exported report files, by format.", SIZE_BUCKETS),
+    "cache_requests_total": (COUNTER, "Cache lookups, by cache and result (hit/miss).", None),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.series: Dict[Tuple, List[float]] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: Tuple, value: float):
+        row = self.series.get(labels)
+        if row is None:
+            row = self.series[labels] = [0.0] * (len(self.buckets) + 2)
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def lines(self, name: str) -> Iterable[str]:
+        for labels, row in sorted(self.series.items()):
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = 'le="%s"' % _format_value(bound)
+                yield f"{name}_bucket{_format_labels(labels, le)} {_format_value(cumulative)}"
+            inf = 'le="+Inf"'
+            yield f"{name}_bucket{_format_labels(labels, inf)} {_format_value(row[-1])}"
+            yield f"{name}_sum{_format_labels(labels)} {_format_value(row[-2])}"
+            yield f"{name}_count{_format_labels(labels)} {_format_value(row[-1])}"
+
+
+class _Counter:
+    def __init__(self):
+        self.series: Dict[Tuple, float] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        self.series[labels] = self.series.get(labels, 0.0) + value
+
+    def lines(self, name: str) -> Iterable[str]:
+        for labels, value in sorted(self.series.items()):
+            yield f"{name}{_format_labels(labels)} {_format_value(value)}"
+
+
+# A collector returns `(name, type, help, [(labels dict, value), ...])` tuples, read at scrape time.
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {
+            name: _Histogram(buckets) if kind == HISTOGRAM else _Counter()
+            for name, (kind, _, buckets) in _DEFINITIONS.items()
+        }
+        self._collectors: List[Collector] = []
+
+    def record(self, name: str, value: float, labels: Tuple):
+        metric = self._metrics[name]
+        with self._lock:
+            metric.observe(labels, value)
+
+    def add_collector(self, collector: Collector):
+        """Register a callback for values that are read when scraped (queue depths, gauges)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                kind, help_text, _ = _DEFINITIONS[name]
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                out.extend(metric.lines(name))
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"[Metrics] collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    out.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+_local = threading.local()
+
+
+def _labels(labels: Dict[str, object]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Record `value` in histogram `name` (or add it to counter `name`)."""
+    key = _labels(labels)
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.append((name, value, key))
+    else:
+        REGISTRY.record(name, value, key)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    observe(name, amount, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the block in histogram `name` (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def capture():
+    """Buffer this thread's observations instead of recording them; yields the buffer for `replay`."""
+    previous = getattr(_local, "buffer", None)
+    buffer: List[Tuple[str, float, Tuple]] = []
+    _local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _local.buffer = previous
+
+
+def replay(observations: Iterable[Tuple[str, float, Tuple]]):
+    for name, value, key in observations:
+        if getattr(_local, "buffer", None) is not None:
+            _local.buffer.append((name, value, key))
+        else:
+            REGISTRY.record(name, value, key)
+
+
+def instrument_app(app):
+    """Time every request of a Flask app into `http_request_duration_seconds`."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            observe("http_request_duration_seconds", time.perf_counter() - start,
+                    route=route, method=request.method, status=response.status_code)
+        return response
+
+    return app
@@ -1,35 +1,71 @@
-from typing import List, Dict
+import time
+from typing import Callable, List, Dict, Optional
+from . import metrics
+from .baselines import VendorBaselines
+from .vendor_history import VendorHistory
+from .entity_resolution import VendorResolver
 from .agents.document_agent import DocumentAgent
 from .agents.fraud_agent import FraudAgent
+from .agents.benford_agent import BenfordAgent
 from .agents.compliance_agent import ComplianceAgent
 from .agents.vendor_agent import VendorAgent
 from .agents.summary_agent import SummaryAgent
 
 
 class Pipeline:
-    """Runs the agent pipeline on provided documents/records."""
+    """Runs the agent pipeline on provided documents/records.
 
-    def __init__(self):
+    When `db_path` is given, per-vendor state (vendor entity clusters, amount
+    baselines and history aggregates) is persisted in that SQLite database and
+    carried across runs.
+
+    After `run`, `timings` holds each stage's duration in seconds; they are
+    also recorded in the `pipeline_stage_seconds` metric.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
         self.document = DocumentAgent()
-        self.fraud = FraudAgent()
+        self.resolver = VendorResolver(db_path)
+        self.fraud = FraudAgent(VendorBaselines(db_path))
+        self.benford = BenfordAgent()
         self.compliance = ComplianceAgent()
-        self.vendor = VendorAgent()
+        self.vendor = VendorAgent(VendorHistory(db_path))
         self.summary = SummaryAgent()
 
-    def run(self, documents: List[Dict]) -> Dict:
-        records = self.document.run(documents)
-        fraud_findings = self.fraud.run(records)
-        compliance_findings = self.compliance.run(records)
-        vendor_findings = self.vendor.run(records)
+    def _stage(self, name: str, progress, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        self.timings[name] = elapsed
+        metrics.observe("pipeline_stage_seconds", elapsed, stage=name)
+        if progress is not None:
+            progress("agent", name=name, seconds=round(elapsed, 3))
+        return result
+
+    def run(self, documents: List[Dict], progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Run every agent over `documents`.
+
+        `progress(stage, **data)`, if given, is called once per finished agent
+        (`stage="agent"`, `name`, `seconds`).
+        """
+        self.timings: Dict[str, float] = {}
+        records = self._stage("document", progress, self.document.run, documents)
+        # group name variants under one canonical vendor_id before any per-vendor agent runs
+        self._stage("entity_resolution", progress, self.resolver.annotate, records)
+        fraud_findings = self._stage("fraud", progress, self.fraud.run, records)
+        benford_findings = self._stage("benford", progress, self.benford.run, records)
+        compliance_findings = self._stage("compliance", progress, self.compliance.run, records)
+        vendor_findings = self._stage("vendor", progress, self.vendor.run, records)
 
         aggregated = {
             "meta": {"total": len(records)},
             "records": records,
             "fraud": fraud_findings,
+            "benford": benford_findings,
             "compliance": compliance_findings,
             "vendor": vendor_findings,
         }
 
-        summary = self.summary.run(aggregated)
+        summary = self._stage("summary", progress, self.summary.run, aggregated)
         aggregated["summary"] = summary
         return aggregated
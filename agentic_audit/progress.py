@@ -0,0 +1,228 @@
+"""Live progress of upload jobs, streamed as server-sent events.
+
+Code doing the work reports stages through a `progress(stage, **data)`
+callback. `Pipeline.run` calls it once per agent and the extractors once per
+PDF page or OCR pass, never per record. `emit` is that callback for the job
+the current thread is working on (`job(job_id)`); with no job it returns at
+once.
+
+Events go to the process's sink. In the server that is `ProgressHub.publish`.
+In executor workers it is a queue that the server drains
+(`executor.WorkExecutor`). The hub keeps each job's events so a client that
+subscribes late, or reconnects with `Last-Event-ID`, still sees all of them.
+
+A stream holds a server thread for as long as its job runs. That is cheap
+enough only because streams are scarce: job ids are issued by `register`
+(random, tied to the requesting user), streams for unknown ids are refused,
+at most `max_streams` are open at once, and a stream with nothing to send
+for `idle_timeout` seconds ends quietly. Ending it does not close the job:
+the browser reconnects with `Last-Event-ID` and resumes, so a job that is
+slow to start (a large upload still being received, a full admission queue)
+never loses its stream. Only a job that never arrives expires, after `ttl`,
+and its id then gets a 404.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+FINAL_STAGES = ("done", "error")
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+Sink = Callable[[str, str, Dict[str, Any]], None]
+
+_sink: Optional[Sink] = None
+_local = threading.local()
+
+
+def valid_job_id(job_id: Optional[str]) -> bool:
+    return bool(job_id) and bool(_JOB_ID.match(job_id))
+
+
+def set_sink(sink: Optional[Sink]):
+    """Where this process sends `(job_id, stage, data)` events."""
+    global _sink
+    _sink = sink
+
+
+def dispatch(job_id: str, stage: str, data: Dict[str, Any]):
+    if _sink is not None:
+        _sink(job_id, stage, data)
+
+
+@contextmanager
+def job(job_id: Optional[str]):
+    """Attribute `emit` calls made by this thread in the block to `job_id`."""
+    previous = getattr(_local, "job_id", None)
+    _local.job_id = job_id
+    try:
+        yield
+    finally:
+        _local.job_id = previous
+
+
+def emit(stage: str, **data):
+    """Progress callback for the current thread's job."""
+    job_id = getattr(_local, "job_id", None)
+    if job_id is not None and _sink is not None:
+        _sink(job_id, stage, data)
+
+
+class ProgressBusy(Exception):
+    """Raised when a user has too many open jobs, or the hub too many open streams."""
+
+
+class _Channel:
+    __slots__ = ("owner", "events", "created", "closed")
+
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.created = time.monotonic()
+        self.closed = False
+
+
+class _Stream:
+    """Iterable SSE body that gives its stream slot back when the server closes it."""
+
+    def __init__(self, hub: "ProgressHub", body: Iterator[str]):
+        self._hub = hub
+        self._body = body
+        self._open = True
+
+    def __iter__(self):
+        try:
+            yield from self._body
+        finally:
+            self.close()  # also when the body is exhausted without the server closing us
+
+    def close(self):
+        if self._open:
+            self._open = False
+            self._body.close()
+            self._hub._release_stream()
+
+
+class ProgressHub:
+    """Per-job event log with blocking, resumable subscriptions.
+
+    Channels are created by `register` and dropped `ttl` seconds later; at
+    most `max_channels` are kept and each owner may have `per_owner` open
+    ones. Events for unregistered ids are ignored.
+    """
+
+    def __init__(self, ttl: float = 900, max_channels: int = 1000, per_owner: int = 8,
+                 max_streams: int = 4, idle_timeout: float = 60):
+        self.ttl = ttl
+        self.max_channels = max_channels
+        self.per_owner = per_owner
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self._channels: Dict[str, _Channel] = {}
+        self._streams = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "ProgressHub":
+        """`PROGRESS_MAX_STREAMS` (default 4) and `PROGRESS_IDLE_TIMEOUT` (seconds, default 60)."""
+        return cls(
+            max_streams=int(os.environ.get("PROGRESS_MAX_STREAMS", 4)),
+            idle_timeout=float(os.environ.get("PROGRESS_IDLE_TIMEOUT", 60)),
+        )
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for job_id in [j for j, c in self._channels.items() if c.created < cutoff]:
+            del self._channels[job_id]
+        while len(self._channels) >= self.max_channels:
+            del self._channels[next(iter(self._channels))]  # oldest first (insertion order)
+
+    def register(self, owner: str) -> str:
+        """A new job id for `owner` to pass with its upload; raises `ProgressBusy`."""
+        with self._cond:
+            self._expire()
+            if sum(1 for c in self._channels.values() if c.owner == owner and not c.closed) >= self.per_owner:
+                raise ProgressBusy(f"Too many uploads in progress for {owner}")
+            job_id = secrets.token_urlsafe(16)
+            self._channels[job_id] = _Channel(owner)
+            return job_id
+
+    def owns(self, job_id: Optional[str], owner: str) -> bool:
+        """Whether `job_id` was registered by `owner` and has not finished."""
+        with self._cond:
+            channel = self._channels.get(job_id) if valid_job_id(job_id) else None
+            return channel is not None and channel.owner == owner and not channel.closed
+
+    def publish(self, job_id: str, stage: str, data: Optional[Dict[str, Any]] = None):
+        with self._cond:
+            channel = self._channels.get(job_id)
+            if channel is None or channel.closed:
+                return
+            channel.events.append((len(channel.events) + 1, stage, data or {}))
+            channel.closed = stage in FINAL_STAGES
+            self._cond.notify_all()
+
+    def events(self, job_id: str, after: int = 0, timeout: float = 15.0) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """Events numbered above `after`, waiting up to `timeout` for one; and whether the job has finished.
+
+        An unknown (or expired) job counts as finished.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                channel = self._channels.get(job_id)
+                if channel is None:
+                    return [], True
+                if len(channel.events) > after or channel.closed:
+                    return channel.events[after:], channel.closed
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], False
+                self._cond.wait(remaining)
+
+    def stream(self, job_id: str, owner: str, last_event_id: int = 0, keepalive: float = 15.0,
+               max_seconds: float = 900) -> _Stream:
+        """Server-sent events for one job, ending after its final event (or `max_seconds`).
+
+        Raises `KeyError` if `owner` has no such job and `ProgressBusy` when
+        `max_streams` streams are open. The result must be closed (WSGI
+        servers do) to free its slot.
+        """
+        with self._cond:
+            channel = self._channels.get(job_id)
+            if channel is None or channel.owner != owner:
+                raise KeyError(job_id)
+            if self._streams >= self.max_streams:
+                raise ProgressBusy("Too many progress streams open")
+            self._streams += 1
+        return _Stream(self, self._stream(job_id, last_event_id, keepalive, max_seconds))
+
+    def _release_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+    def _stream(self, job_id: str, after: int, keepalive: float, max_seconds: float) -> Iterator[str]:
+        started = last_event = time.monotonic()
+        yield "retry: 2000\n\n"
+        while time.monotonic() - started < max_seconds:
+            events, closed = self.events(job_id, after, keepalive)
+            for seq, stage, data in events:
+                after = seq
+                yield f"id: {seq}\nevent: {stage}\ndata: {json.dumps(data)}\n\n"
+            if closed:
+                return
+            if events:
+                last_event = time.monotonic()
+            elif time.monotonic() - last_event >= self.idle_timeout:
+                return  # free the thread; the job stays open and the browser reconnects
+            else:
+                yield ": keepalive\n\n"
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"channels": len(self._channels), "streams": self._streams, "max_streams": self.max_streams}
@@ -0,0 +1,171 @@
+"""Compact on-disk form of audit reports.
+
+Reports used to be written with `json.dump(..., indent=2)`, each record
+carrying a full copy of its input document under `raw`. The compact form:
+
+- is serialized without whitespace, with `orjson` when it is installed;
+- is compressed with gzip, or zstd when `zstandard` is installed
+  (`<base>.json.gz` / `<base>.json.zst`);
+- moves `raw` documents into a side file `<base>.raw.json.<ext>` keyed by
+  content hash, so identical documents (duplicate submissions) are stored
+  once. Records keep a `raw_ref` to their document.
+
+`read_report` loads any of the formats (plain, compressed, compact with a
+side file) back into the usual report dict. Readers that go record by record
+(`exporter.stream_*`, `report_store.ReportContainer`) use
+`load_raw_documents` and `resolve_raw` instead.
+"""
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except Exception:
+    ORJSON_SUPPORT = False
+
+try:
+    import zstandard
+    ZSTD_SUPPORT = True
+except Exception:
+    ZSTD_SUPPORT = False
+
+
+COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+CONTENT_TYPES = {".json": "application/json", ".csv": "text/csv", ".html": "text/html", ".ndjson": "application/x-ndjson"}
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes."""
+    if ORJSON_SUPPORT:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    if ORJSON_SUPPORT:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compress(data: bytes, compression: str = "gzip") -> bytes:
+    if compression == "zstd":
+        if not ZSTD_SUPPORT:
+            raise RuntimeError("zstd compression requires zstandard (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if compression == "gzip":
+        # mtime=0 keeps the output deterministic for identical reports
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def decompress(data: bytes, suffix: str) -> bytes:
+    if suffix == ".gz":
+        return gzip.decompress(data)
+    if suffix == ".zst":
+        if not ZSTD_SUPPORT:
+            raise RuntimeError("Reading .zst reports requires zstandard (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def raw_path_for(path: Path) -> Path:
+    """`report-1.json.gz` -> `report-1.raw.json.gz`."""
+    name = path.name
+    stem = name.split(".", 1)[0]
+    return path.with_name(f"{stem}.raw.{name.split('.', 1)[1]}")
+
+
+def _raw_key(raw: Any) -> str:
+    return hashlib.sha1(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def split_raw(report: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return `(report without raw documents, {raw_ref: document})`; the input is not modified."""
+    docs: Dict[str, Any] = {}
+    records = []
+    for r in report.get("records", []):
+        raw = r.get("raw")
+        if raw is None:
+            records.append(r)
+            continue
+        key = _raw_key(raw)
+        docs.setdefault(key, raw)
+        slim = {k: v for k, v in r.items() if k != "raw"}
+        slim["raw_ref"] = key
+        records.append(slim)
+    compact = dict(report)
+    compact["records"] = records
+    return compact, docs
+
+
+def load_raw_documents(path, header: Dict[str, Any]) -> Dict[str, Any]:
+    """`{raw_ref: document}` from the side file named by `header["raw_documents"]`, next to `path`."""
+    side = header.get("raw_documents")
+    if not side:
+        return {}
+    side_path = Path(path).with_name(side)
+    return loads(decompress(side_path.read_bytes(), side_path.suffix)) if side_path.exists() else {}
+
+
+def resolve_raw(record: Dict[str, Any], docs: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace a record's `raw_ref` with its document, in place."""
+    ref = record.pop("raw_ref", None)
+    if ref is not None:
+        record["raw"] = docs.get(ref, {})
+    return record
+
+
+def join_raw(report: Dict[str, Any], docs: Dict[str, Any]) -> Dict[str, Any]:
+    for r in report.get("records", []):
+        resolve_raw(r, docs)
+    return report
+
+
+def write_compact(report: Dict[str, Any], out_base: str, compression: str = "gzip") -> Dict[str, Path]:
+    """Write `<out_base>.json.<ext>` and, if any record has a raw document, `<out_base>.raw.json.<ext>`."""
+    ext = COMPRESSIONS.get(compression)
+    if ext is None:
+        raise ValueError(f"Unknown compression: {compression}")
+    out = Path(f"{out_base}.json{ext}")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    compact, docs = split_raw(report)
+    paths = {"json": out}
+    if docs:
+        raw_out = raw_path_for(out)
+        raw_out.write_bytes(compress(dumps(docs), compression))
+        compact["raw_documents"] = raw_out.name
+        paths["raw"] = raw_out
+    out.write_bytes(compress(dumps(compact), compression))
+    return paths
+
+
+def read_report(path: str) -> Dict[str, Any]:
+    """Load a report written by `json.dump`, `write_compact` or `exporter.write_ndjson`."""
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(path)
+    data = decompress(p.read_bytes(), p.suffix)
+    inner = Path(p.stem) if p.suffix in (".gz", ".zst") else p
+    if inner.suffix == ".ndjson":
+        lines = [line for line in data.splitlines() if line.strip()]
+        report = loads(lines[0]) if lines else {}
+        report["records"] = [loads(line) for line in lines[1:]]
+    else:
+        report = loads(data)
+    # raw documents split into a side file (write_compact, write_ndjson) are joined back
+    if report.get("raw_documents"):
+        join_raw(report, load_raw_documents(p, report))
+    report.pop("raw_documents", None)
+    return report
+
+
+def served_encoding(path: Path) -> Tuple[Optional[str], str]:
+    """`(Content-Encoding, Content-Type)` to serve a stored file as-is, e.g. `("gzip", "application/json")` for `x.json.gz`."""
+    path = Path(path)
+    encoding = {".gz": "gzip", ".zst": "zstd"}.get(path.suffix)
+    inner = Path(path.stem) if encoding else path
+    return encoding, CONTENT_TYPES.get(inner.suffix, "application/octet-stream")
@@ -0,0 +1,177 @@
+"""Indexed report container with random access to records.
+
+A container is an NDJSON file `<base>.ndjson`:
+
+    line 1     header: every report section except `records`
+    line 2...  one record per line
+
+and a binary index `<base>.ndjson.idx` (a `.npy` array of shape
+`(record_count + 1, 2)` int64): column 0 is the byte offset of each record
+line (the final row holds the end of the last record), column 1 a bitmask of
+the record's flags (see `FLAG_BITS`).
+
+Both files are memory-mapped on open, so fetching a page of records, or a
+page of only the flagged ones, touches just those lines; opening page 1 of a
+multi-million-invoice report costs the same as opening a small one.
+
+Records may carry a `raw_ref` into the raw-documents side file named by the
+header (see `report_io.write_compact`); `ReportContainer` returns them with
+`raw` joined back, loading the side file on first use.
+"""
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from . import report_io
+
+
+FLAG_BITS = {"duplicate": 1, "inflated": 2, "fake_vendor": 4, "compliance_violation": 8}
+PAGE_SIZE = 50
+
+
+def index_path_for(path: Path) -> Path:
+    return Path(str(path) + ".idx")
+
+
+def flag_mask(flags: Dict[str, bool]) -> int:
+    mask = 0
+    for name, on in flags.items():
+        if on:
+            mask |= FLAG_BITS.get(name, 0)
+    return mask
+
+
+def write_container(header: Dict[str, Any], records: Iterable[Dict[str, Any]], out_path: str,
+                    flags: Dict[str, Dict[str, bool]]) -> Path:
+    """Write `records` (any iterable) and their offset/flag index.
+
+    `header` is the report without `records`; `flags` maps invoice_id to its
+    flags (`exporter.invoice_flags`).
+    """
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    header = {k: v for k, v in header.items() if k != "records"}
+    offsets: List[int] = []
+    masks: List[int] = []
+    with out.open("wb") as f:
+        f.write(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+        f.write(b"\n")
+        for r in records:
+            offsets.append(f.tell())
+            masks.append(flag_mask(flags.get(r.get("invoice_id"), {})))
+            f.write(json.dumps(r, separators=(",", ":")).encode("utf-8"))
+            f.write(b"\n")
+        end = f.tell()
+    _save_index(out, offsets, masks, end)
+    return out
+
+
+def _save_index(path: Path, offsets: List[int], masks: List[int], end: int):
+    index = np.zeros((len(offsets) + 1, 2), dtype=np.int64)
+    index[:-1, 0] = offsets
+    index[-1, 0] = end
+    index[:-1, 1] = masks
+    with index_path_for(path).open("wb") as f:
+        np.save(f, index)
+
+
+def build_index(path: str) -> Path:
+    """(Re)build the index of an existing container by scanning it once."""
+    p = Path(path)
+    offsets = []
+    masks = []
+    with p.open("rb") as f:
+        header = json.loads(f.readline() or b"{}")
+        from .exporter import invoice_flags  # local import: exporter imports this module
+        flags = invoice_flags(header)
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            offsets.append(pos)
+            masks.append(flag_mask(flags.get(json.loads(line).get("invoice_id"), {})))
+        end = f.tell()
+    _save_index(p, offsets, masks, end)
+    return index_path_for(p)
+
+
+class ReportContainer:
+    """Read-only random access to a container written by `write_container`."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(path)
+        if not index_path_for(self.path).exists():
+            build_index(self.path)
+        with self.path.open("rb") as f:
+            self.header = json.loads(f.readline() or b"{}")
+            self._raw_header = {"raw_documents": self.header.pop("raw_documents", None)}
+            self._raw_docs: Optional[Dict[str, Any]] = None
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.path.stat().st_size else None
+        self.index = np.load(index_path_for(self.path), mmap_mode="r").view(np.ndarray)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.index) - 1
+
+    def record(self, i: int) -> Dict[str, Any]:
+        start, end = int(self.index[i, 0]), int(self.index[i + 1, 0])
+        rec = json.loads(self._map[start:end])
+        if "raw_ref" in rec:
+            if self._raw_docs is None:
+                self._raw_docs = report_io.load_raw_documents(self.path, self._raw_header)
+            report_io.resolve_raw(rec, self._raw_docs)
+        return rec
+
+    def rows(self, flagged: bool = False, flag: Optional[str] = None) -> Optional[np.ndarray]:
+        """Numbers of the flagged records (any flag, or only `flag`); None when unfiltered."""
+        masks = self.index[:-1, 1]
+        if flag:
+            if flag not in FLAG_BITS:
+                raise ValueError(f"Unknown flag: {flag}")
+            return np.flatnonzero(masks & FLAG_BITS[flag])
+        if flagged:
+            return np.flatnonzero(masks)
+        return None
+
+    def page(self, page: int = 1, page_size: int = PAGE_SIZE, flagged: bool = False, flag: Optional[str] = None) -> Dict[str, Any]:
+        """One page of records: `{"page", "pages", "page_size", "total", "records"}`."""
+        page = max(1, int(page))
+        page_size = max(1, int(page_size))
+        rows = self.rows(flagged, flag)
+        total = len(self) if rows is None else len(rows)
+        start = (page - 1) * page_size
+        stop = min(start + page_size, total)
+        wanted = range(start, stop) if rows is None else rows[start:stop].tolist()
+        records = []
+        for i in wanted:
+            rec = self.record(i)
+            rec["_row"] = i
+            records.append(rec)
+        return {
+            "page": page,
+            "pages": (total + page_size - 1) // page_size,
+            "page_size": page_size,
+            "total": total,
+            "records": records,
+        }
+
+    def flagged_count(self) -> int:
+        return int(np.count_nonzero(self.index[:-1, 1]))
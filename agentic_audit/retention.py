@@ -0,0 +1,297 @@
+"""Retention and compaction of old report artifacts.
+
+Every upload leaves a handful of files in `exports/YYYY/MM/DD/`. Retention
+works on whole day shards, oldest first:
+
+- **archive**: a day older than `archive_after_days` (or the oldest days,
+  while `exports/` is larger than `max_bytes`) is packed into one archive
+  segment `exports/archive/<YYYY-MM-DD>-<ULID>.seg`: the files concatenated,
+  each gzip-compressed unless it already is. The offset, length and encoding
+  of every file go into the `archived_artifacts` table, then the loose files
+  are removed. One day of reports becomes one file, except for the indexed
+  record containers (`.ndjson`, its `.idx` and the raw-documents side file
+  it names), which stay loose: `/reports/<name>/records` memory-maps them.
+- **delete**: segments, index rows and report rows older than
+  `delete_after_days` are dropped.
+
+`read_archived` fetches a single file back by seeking into its segment, so
+`/download` keeps working for archived reports. The current UTC day is never
+touched, nor is any day with an upload still staging or a file written in the
+last `QUIET_SECONDS` (an upload that began before midnight). Archiving
+removes only the files it indexed, so retention never races uploads;
+`RetentionWorker` runs it on a background thread.
+"""
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .artifacts import init_db as init_report_db, mark_reports_changed, new_ulid, shard_for, shard_for_name
+from .report_store import index_path_for
+
+
+ARCHIVE_DIR = "archive"
+QUIET_SECONDS = 15 * 60  # a shard written to more recently than this may still receive files
+_DAY_GLOB = "[0-9][0-9][0-9][0-9]/[0-9][0-9]/[0-9][0-9]"
+
+
+class RetentionPolicy:
+    """Age and size limits; None disables a limit."""
+
+    def __init__(self, archive_after_days: Optional[int] = 30, delete_after_days: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.archive_after_days = archive_after_days
+        self.delete_after_days = delete_after_days
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        def num(name, default):
+            value = os.environ.get(name)
+            if value is None:
+                return default
+            return int(value) if value.strip() else None
+        return cls(
+            archive_after_days=num("RETENTION_ARCHIVE_DAYS", 30),
+            delete_after_days=num("RETENTION_DELETE_DAYS", None),
+            max_bytes=num("RETENTION_MAX_BYTES", None),
+        )
+
+
+def init_db(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archived_artifacts (
+                path TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                encoding TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                day TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archived_artifacts_day ON archived_artifacts(day)")
+
+
+def _day_of(shard: Path, export_dir: Path) -> str:
+    return shard.relative_to(export_dir).as_posix().replace("/", "-")
+
+
+def _containers(files: List[Path]) -> Set[Path]:
+    """Files of the record containers among `files`, which need random access and so are never archived."""
+    kept = set()
+    for f in files:
+        if f.name.endswith(".ndjson"):
+            kept.update((f, index_path_for(f), Path(str(f) + ".gz")))
+            try:
+                with f.open("rb") as fh:
+                    side = json.loads(fh.readline() or b"{}").get("raw_documents")
+            except (OSError, ValueError):
+                side = None
+            if side:
+                kept.add(f.with_name(side))
+    return kept
+
+
+class Retention:
+    """Applies a `RetentionPolicy` to an exports directory and its report database."""
+
+    def __init__(self, export_dir, db_path, policy: Optional[RetentionPolicy] = None):
+        self.export_dir = Path(export_dir)
+        self.db_path = db_path
+        self.policy = policy or RetentionPolicy()
+        self.archive_dir = self.export_dir / ARCHIVE_DIR
+        init_report_db(db_path)
+        init_db(db_path)
+
+    def _day_shards(self) -> List[Path]:
+        """Loose day shards, oldest first, excluding today's and any still being written to."""
+        today = shard_for(time.time())
+        shards = sorted(p for p in self.export_dir.glob(_DAY_GLOB) if p.is_dir())
+        return [p for p in shards if p.relative_to(self.export_dir).as_posix() != today and not self._in_use(p)]
+
+    @staticmethod
+    def _in_use(shard: Path) -> bool:
+        """Whether an upload may still be writing to `shard`: a staging directory, or a recent write."""
+        quiet_since = time.time() - QUIET_SECONDS
+        for p in [shard, *shard.rglob("*")]:
+            try:
+                if p.name.startswith(".staging-") or p.stat().st_mtime > quiet_since:
+                    return True
+            except FileNotFoundError:
+                return True  # changing under us
+        return False
+
+    # --- archive ---
+    def archive_day(self, shard: Path) -> int:
+        """Pack one day shard into a segment; returns the number of files archived."""
+        files = self._archivable(shard)
+        # precompressed `<file>.gz` variants are redundant: the archive stores `<file>` gzipped
+        names = {f.name for f in files}
+        files = [f for f in files if not (f.suffix == ".gz" and f.name[:-3] in names)]
+        day = _day_of(shard, self.export_dir)
+        with sqlite3.connect(self.db_path) as conn:
+            done = {row[0] for row in conn.execute("SELECT path FROM archived_artifacts WHERE day = ?", (day,))}
+        rel = {f: f.relative_to(self.export_dir).as_posix() for f in files}
+        pending = [f for f in files if rel[f] not in done]  # left over from an interrupted run otherwise
+
+        rows: List[Tuple] = []
+        if pending:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            segment = f"{day}-{new_ulid()}.seg"
+            tmp = self.archive_dir / f".{segment}.tmp"
+            with tmp.open("wb") as out:
+                for f in pending:
+                    data = f.read_bytes()
+                    if f.suffix in (".gz", ".zst"):
+                        encoding, body = "identity", data
+                    else:
+                        encoding, body = "gzip", gzip.compress(data, compresslevel=6, mtime=0)
+                    rows.append((rel[f], segment, out.tell(), len(body), encoding, len(data), day))
+                    out.write(body)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.archive_dir / segment)
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO archived_artifacts (path, segment, offset, length, encoding, size, day) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        # only files whose index rows are committed are removed (with their .gz
+        # variants); anything else stays, and so do the directories holding it
+        archived = done | {row[0] for row in rows}
+        for f in files:
+            if rel[f] in archived:
+                f.unlink(missing_ok=True)
+                Path(str(f) + ".gz").unlink(missing_ok=True)
+        dirs = sorted((p for p in shard.rglob("*") if p.is_dir()), key=lambda p: len(p.parts), reverse=True)
+        for d in [*dirs, shard, shard.parent, shard.parent.parent]:
+            try:
+                d.rmdir()
+            except OSError:
+                pass  # not empty
+        return len(rows)
+
+    @staticmethod
+    def _archivable(shard: Path) -> List[Path]:
+        files = sorted(f for f in shard.rglob("*") if f.is_file() and not f.name.startswith("."))
+        kept = _containers(files)
+        return [f for f in files if f not in kept]
+
+    def _archivable_size(self, shard: Path) -> int:
+        return sum(f.stat().st_size for f in self._archivable(shard))
+
+    def _archive_candidates(self) -> List[Path]:
+        shards = [p for p in self._day_shards() if self._archivable(p)]
+        chosen = []
+        if self.policy.archive_after_days is not None:
+            cutoff = shard_for(time.time() - self.policy.archive_after_days * 86400)
+            chosen = [p for p in shards if p.relative_to(self.export_dir).as_posix() < cutoff]
+        if self.policy.max_bytes is not None:
+            remaining = [p for p in shards if p not in chosen]
+            # containers stay loose whatever happens, so only what archiving can shrink counts
+            total = sum(self._archivable_size(p) for p in remaining)
+            for p in remaining:  # oldest first
+                if total <= self.policy.max_bytes:
+                    break
+                total -= self._archivable_size(p)
+                chosen.append(p)
+        return chosen
+
+    # --- delete ---
+    def delete_expired(self) -> int:
+        if self.policy.delete_after_days is None:
+            return 0
+        cutoff_ts = time.time() - self.policy.delete_after_days * 86400
+        cutoff_day = datetime.fromtimestamp(cutoff_ts, tz=timezone.utc).strftime("%Y-%m-%d")
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            segments = [r[0] for r in conn.execute("SELECT DISTINCT segment FROM archived_artifacts WHERE day < ?", (cutoff_day,))]
+            conn.execute("DELETE FROM archived_artifacts WHERE day < ?", (cutoff_day,))
+            conn.execute("DELETE FROM report_artifacts WHERE report_id IN (SELECT report_id FROM reports WHERE created_at < ?)", (int(cutoff_ts),))
+            deleted_reports = conn.execute("DELETE FROM reports WHERE created_at < ?", (int(cutoff_ts),)).rowcount
+        if deleted_reports:
+            mark_reports_changed()
+        for seg in segments:
+            (self.archive_dir / seg).unlink(missing_ok=True)
+        # loose days that were never archived (archiving disabled, or not due yet)
+        cutoff_shard = shard_for(cutoff_ts)
+        for shard in self._day_shards():
+            if shard.relative_to(self.export_dir).as_posix() < cutoff_shard:
+                shutil.rmtree(shard, ignore_errors=True)
+        return len(segments)
+
+    def run_once(self) -> Dict[str, int]:
+        archived_days = archived_files = 0
+        for shard in self._archive_candidates():
+            try:
+                archived_files += self.archive_day(shard)
+                archived_days += 1
+            except Exception as e:
+                print(f"[Retention] Failed to archive {shard}: {e}")
+        deleted = self.delete_expired()
+        return {"archived_days": archived_days, "archived_files": archived_files, "deleted_segments": deleted}
+
+
+def find_archived(export_dir, db_path, filename: str) -> Optional[Tuple]:
+    """Index row `(path, segment, offset, length, encoding, size)` of an archived file, by relative path or bare name."""
+    candidates = [filename]
+    if "/" not in filename:
+        shard = shard_for_name(filename)
+        if shard:
+            candidates.append(f"{shard}/{filename}")
+    try:
+        with sqlite3.connect(db_path) as conn:
+            for rel in candidates:
+                row = conn.execute(
+                    "SELECT path, segment, offset, length, encoding, size FROM archived_artifacts WHERE path = ?", (rel,)
+                ).fetchone()
+                if row:
+                    return row
+    except sqlite3.OperationalError:
+        return None  # no archive table yet
+    return None
+
+
+def read_archived(export_dir, row: Tuple) -> Tuple[bytes, str]:
+    """`(stored bytes, encoding)` of an archived file: one seek and one read in its segment."""
+    _, segment, offset, length, encoding, _ = row
+    with (Path(export_dir) / ARCHIVE_DIR / segment).open("rb") as f:
+        f.seek(offset)
+        return f.read(length), encoding
+
+
+class RetentionWorker:
+    """Runs `Retention.run_once` every `interval` seconds on a daemon thread."""
+
+    def __init__(self, retention: Retention, interval: float = 3600):
+        self.retention = retention
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict[str, int]] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="report-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.last_result = self.retention.run_once()
+            except Exception as e:
+                print(f"[Retention] {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,319 @@
+"""Declarative compliance rules compiled into vectorized batch predicates.
+
+A rule file (JSON, or YAML when PyYAML is installed) holds a list of rules:
+
+    {"rules": [
+        {"id": "missing_fields", "type": "required", "fields": ["invoice_id", "vendor"]},
+        {"id": "exceeds_max_single_payment", "type": "max", "field": "amount", "value": 100000},
+        {"id": "inr_limit", "type": "max", "field": "amount", "value": 5000000, "when": {"currency": "INR"}},
+        {"id": "currency_not_allowed", "type": "allowed", "field": "currency", "values": ["USD", "INR"]},
+        {"id": "future_dated", "type": "date_range", "field": "date", "max": "today"},
+        {"id": "split_below_max_single_payment", "type": "split", "value": 100000, "window_days": 7}
+    ]}
+
+Every rule may carry a `when` scope (`{field: value or [values]}`) that
+limits it to matching invoices, e.g. one jurisdiction or currency.
+`vendor` matches the vendor name ignoring case, punctuation and legal
+suffixes (`"Acme"` matches `"ACME, Inc."`); `vendor_id` matches the vendor ID
+assigned by entity resolution exactly.
+
+Rules are compiled once per distinct file content. Each compiled rule turns
+the batch columns it needs into a boolean mask with NumPy, and columns are
+built once per batch and shared by all rules, so adding rules adds array
+operations rather than per-record Python work. `load_rules` caches rule sets
+by file hash and re-reads the file only when its mtime or size changes.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import columns
+from .entity_resolution import canonical_key
+
+try:
+    import yaml
+    YAML_SUPPORT = True
+except Exception:
+    YAML_SUPPORT = False
+
+# how `when`/`allowed` values are compared per field; other fields compare as strings
+MATCH_KEYS: Dict[str, Callable[[Any], str]] = {"vendor": canonical_key}
+
+
+def find_split_clusters(codes: np.ndarray, days: np.ndarray, amounts: np.ndarray, threshold: float, window_days: int) -> List[np.ndarray]:
+    """Find groups of same-vendor invoices that together cross `threshold` within `window_days`.
+
+    Only invoices that individually stay below the threshold take part. Rows
+    are sorted by (vendor, day) and a sliding window is evaluated for every row
+    at once with `searchsorted` over a combined key, so the cost is
+    O(n log n). Overlapping windows are merged; each cluster is returned as an
+    array of row indices into the inputs.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    eligible = np.nonzero(~np.isnat(days) & (amounts > 0) & (amounts < threshold))[0]
+    if len(eligible) < 2:
+        return []
+
+    d = days[eligible].astype(np.int64)
+    c = np.asarray(codes, dtype=np.int64)[eligible]
+    order = np.lexsort((d, c))
+    rows, d, c = eligible[order], d[order], c[order]
+    a = amounts[rows]
+
+    # one monotonic key per row; the stride keeps vendors from sharing a window
+    stride = int(d.max() - d.min()) + window_days + 1
+    key = c * stride + (d - d.min())
+    left = np.searchsorted(key, key - (window_days - 1), side="left")
+    csum = np.concatenate(([0.0], np.cumsum(a)))
+    end = np.arange(len(key))
+    window_sum = csum[end + 1] - csum[left]
+    hit = np.nonzero((window_sum > threshold) & (end > left))[0]
+    if not len(hit):
+        return []
+
+    starts, ends = left[hit], hit
+    # windows only move forward, so a new cluster begins wherever a window starts past the previous end
+    new = np.concatenate(([True], starts[1:] > ends[:-1]))
+    first = np.nonzero(new)[0]
+    last = np.concatenate((first[1:] - 1, [len(hit) - 1]))
+    return [rows[starts[i]:ends[j] + 1] for i, j in zip(first.tolist(), last.tolist())]
+
+
+class Batch:
+    """Column cache over one batch of records, shared by all rules."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self._cache: Dict[Tuple[str, str], Any] = {}
+
+    def _cached(self, kind: str, field: str, build: Callable[[], Any]):
+        key = (kind, field)
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def values(self, field: str) -> np.ndarray:
+        def build():
+            out = np.empty(len(self.records), dtype=object)
+            out[:] = [r.get(field) for r in self.records]
+            return out
+        return self._cached("values", field, build)
+
+    def present(self, field: str) -> np.ndarray:
+        # same truthiness test as `not r.get(field)`: None, "" and 0 count as missing
+        return self._cached("present", field, lambda: self.values(field).astype(bool))
+
+    def numeric(self, field: str) -> np.ndarray:
+        if field == "amount":
+            return self._cached("numeric", field, lambda: columns.amounts(self.records))
+
+        def build():
+            out = np.full(len(self.records), np.nan)
+            for i, v in enumerate(self.values(field).tolist()):
+                try:
+                    out[i] = float(v)
+                except (TypeError, ValueError):
+                    pass
+            return out
+        return self._cached("numeric", field, build)
+
+    def days(self, field: str) -> np.ndarray:
+        return self._cached("days", field, lambda: columns.dates([{"date": v} for v in self.values(field).tolist()]))
+
+    def vendor_groups(self) -> Tuple[List[str], np.ndarray]:
+        """Codes of the per-vendor grouping key (`columns.vendor_key`)."""
+        return self._cached("codes", "<vendor_key>", lambda: columns.encode(columns.vendor_keys(self.records)))
+
+    def codes(self, field: str) -> Tuple[List[str], np.ndarray]:
+        return self._cached("codes", field, lambda: columns.encode(["" if v is None else str(v) for v in self.values(field).tolist()]))
+
+    def isin(self, field: str, allowed) -> np.ndarray:
+        """Membership test evaluated on the distinct values, then gathered per row."""
+        uniques, codes = self.codes(field)
+        key = MATCH_KEYS.get(field, str)
+        allowed = {key(a) for a in allowed}
+        hit = np.fromiter((key(u) in allowed for u in uniques), dtype=bool, count=len(uniques))
+        return hit[codes] if len(codes) else np.zeros(0, dtype=bool)
+
+
+def _as_day(value: str) -> np.datetime64:
+    if value == "today":
+        return np.datetime64(date.today(), "D")
+    return np.datetime64(value, "D")
+
+
+class Rule:
+    """A compiled rule: `evaluate(batch)` returns (row, violation) pairs."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.id = spec.get("id") or spec["type"]
+        self.field = spec.get("field", "amount")
+        self.when = {k: v if isinstance(v, list) else [v] for k, v in (spec.get("when") or {}).items()}
+
+    def scope(self, batch: Batch) -> np.ndarray:
+        mask = np.ones(len(batch.records), dtype=bool)
+        for field, allowed in self.when.items():
+            mask &= batch.isin(field, allowed)
+        return mask
+
+    def mask(self, batch: Batch) -> np.ndarray:
+        """Rows that violate the rule (before `when` scoping). Rules that override `evaluate` match nothing here."""
+        return np.zeros(len(batch.records), dtype=bool)
+
+    def describe(self, batch: Batch, i: int) -> Dict[str, Any]:
+        return {"invoice_id": batch.records[i].get("invoice_id"), "violation": self.id, self.field: batch.records[i].get(self.field)}
+
+    def evaluate(self, batch: Batch) -> List[Tuple[int, Dict[str, Any]]]:
+        rows = np.nonzero(self.mask(batch) & self.scope(batch))[0]
+        return [(i, self.describe(batch, i)) for i in rows.tolist()]
+
+
+class RequiredRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = list(spec["fields"])
+
+    def evaluate(self, batch):
+        missing = np.stack([~batch.present(f) for f in self.fields], axis=1)
+        rows = np.nonzero(missing.any(axis=1) & self.scope(batch))[0]
+        return [
+            (i, {"invoice_id": batch.records[i].get("invoice_id"), "missing_fields": [f for f, m in zip(self.fields, missing[i]) if m]})
+            for i in rows.tolist()
+        ]
+
+
+class MaxRule(Rule):
+    def mask(self, batch):
+        return batch.numeric(self.field) > float(self.spec["value"])
+
+    def describe(self, batch, i):
+        return dict(super().describe(batch, i), limit=self.spec["value"])
+
+
+class MinRule(MaxRule):
+    def mask(self, batch):
+        return batch.numeric(self.field) < float(self.spec["value"])
+
+
+class AllowedRule(Rule):
+    def mask(self, batch):
+        return ~batch.isin(self.field, self.spec["values"])
+
+
+class DateRangeRule(Rule):
+    def __init__(self, spec):
+        spec = dict(spec, field=spec.get("field", "date"))
+        super().__init__(spec)
+
+    def mask(self, batch):
+        days = batch.days(self.field)
+        bad = np.isnat(days) if self.spec.get("require_valid") else np.zeros(len(days), dtype=bool)
+        valid = ~np.isnat(days)
+        if self.spec.get("min"):
+            bad |= valid & (days < _as_day(self.spec["min"]))
+        if self.spec.get("max"):
+            bad |= valid & (days > _as_day(self.spec["max"]))
+        return bad
+
+
+class SplitRule(Rule):
+    def evaluate(self, batch):
+        amounts = np.where(self.scope(batch), batch.numeric(self.field), 0.0)
+        keys, codes = batch.vendor_groups()
+        days = batch.days("date")
+        out = []
+        for rows in find_split_clusters(codes, days, amounts, float(self.spec["value"]), int(self.spec.get("window_days", 7))):
+            ids = [batch.records[i].get("invoice_id") for i in rows.tolist()]
+            out.append((int(rows[-1]), {
+                "invoice_id": ids[-1],
+                "violation": self.id,
+                "vendor": keys[codes[rows[0]]],
+                "invoice_ids": ids,
+                "total": float(amounts[rows].sum()),
+                "start_date": str(days[rows[0]]),
+                "end_date": str(days[rows[-1]]),
+            }))
+        return out
+
+
+RULE_TYPES = {
+    "required": RequiredRule,
+    "max": MaxRule,
+    "min": MinRule,
+    "allowed": AllowedRule,
+    "date_range": DateRangeRule,
+    "split": SplitRule,
+}
+
+
+class RuleSet:
+    """Compiled rules from one rule file."""
+
+    def __init__(self, specs: List[Dict[str, Any]], name: str = "", digest: str = ""):
+        self.name = name
+        self.digest = digest
+        self.rules = []
+        for spec in specs:
+            if spec.get("type") not in RULE_TYPES:
+                raise ValueError(f"Unknown rule type {spec.get('type')!r} in rule {spec.get('id')!r}")
+            self.rules.append(RULE_TYPES[spec["type"]](spec))
+
+    def evaluate(self, records: List[Dict[str, Any]], types: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Run every rule (or only those whose type is in `types`); violations come back in record order."""
+        if not records:
+            return []
+        batch = Batch(records)
+        found = []
+        for order, rule in enumerate(self.rules):
+            if types is None or rule.spec["type"] in types:
+                found.extend((i, order, v) for i, v in rule.evaluate(batch))
+        found.sort(key=lambda t: (t[0], t[1]))
+        return [v for _, _, v in found]
+
+
+def parse_rules(data: bytes, suffix: str) -> Dict[str, Any]:
+    if suffix in (".yaml", ".yml"):
+        if not YAML_SUPPORT:
+            raise RuntimeError("YAML rule files require PyYAML. Run: pip install pyyaml")
+        return yaml.safe_load(data) or {}
+    return json.loads(data.decode("utf-8"))
+
+
+_lock = threading.Lock()
+_by_path: Dict[str, Tuple[Tuple[int, int], RuleSet]] = {}
+_by_digest: "OrderedDict[str, RuleSet]" = OrderedDict()  # most recently used last
+_MAX_DIGESTS = 8  # hot reload compiles a new digest per edit; keep only the recent ones
+
+
+def load_rules(path) -> RuleSet:
+    """Return the compiled rule set for `path`, recompiling only when the file content changes."""
+    path = Path(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = str(path.resolve())
+    cached = _by_path.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with _lock:
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        ruleset = _by_digest.get(digest)
+        if ruleset is None:
+            doc = parse_rules(data, path.suffix.lower())
+            ruleset = RuleSet(doc.get("rules", []), name=doc.get("name", path.stem), digest=digest)
+            _by_digest[digest] = ruleset
+            while len(_by_digest) > _MAX_DIGESTS:
+                _by_digest.popitem(last=False)
+        else:
+            _by_digest.move_to_end(digest)
+        _by_path[key] = (stamp, ruleset)
+        return ruleset
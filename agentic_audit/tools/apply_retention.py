@@ -0,0 +1,23 @@
+"""CLI to apply the report retention policy once (archive old day shards, delete expired ones)."""
+import argparse
+import json
+
+from agentic_audit.retention import Retention, RetentionPolicy
+
+
+def main():
+    defaults = RetentionPolicy.from_env()
+    p = argparse.ArgumentParser(description="Archive and expire old report artifacts")
+    p.add_argument("--exports", default="exports", help="Exports directory")
+    p.add_argument("--db", default="audit.db", help="Report database")
+    p.add_argument("--archive-after-days", type=int, default=defaults.archive_after_days)
+    p.add_argument("--delete-after-days", type=int, default=defaults.delete_after_days)
+    p.add_argument("--max-bytes", type=int, default=defaults.max_bytes, help="Archive oldest days while loose files exceed this size")
+    args = p.parse_args()
+
+    policy = RetentionPolicy(args.archive_after_days, args.delete_after_days, args.max_bytes)
+    print(json.dumps(Retention(args.exports, args.db, policy).run_once()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""CLI to run the Benford's-law and round-number tests over exported CSV reports."""
+import argparse
+import glob
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from agentic_audit.agents.benford_agent import summarize, BenfordAgent
+
+
+def load_amounts(paths):
+    frames = [pd.read_csv(p, usecols=["vendor", "amount"]) for p in paths]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"vendor": [], "amount": []})
+    amounts = pd.to_numeric(df["amount"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    codes, labels = pd.factorize(df["vendor"].fillna("<unknown>").astype(str))
+    return amounts, codes, list(labels)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benford / round-number analysis of exported report CSVs")
+    p.add_argument("csv", nargs="*", default=["exports/*.csv"], help="CSV files or glob patterns")
+    p.add_argument("--min-sample", type=int, default=BenfordAgent.MIN_SAMPLE, help="Minimum amounts per vendor")
+    p.add_argument("--out", help="Write the JSON result to this file instead of stdout")
+    args = p.parse_args()
+
+    paths = sorted({f for pattern in args.csv for f in glob.glob(pattern)})
+    start = time.perf_counter()
+    amounts, codes, labels = load_amounts(paths)
+    result = summarize(amounts, codes, labels, args.min_sample)
+    result["files"] = len(paths)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Benford report written to: {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
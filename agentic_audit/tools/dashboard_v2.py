@@ -1,17 +1,21 @@
 """Simple Flask dashboard to upload invoices and view audit reports."""
 import json
-import time
 import traceback
 from pathlib import Path
-from flask import Flask, request, redirect, url_for, send_from_directory
+from flask import Flask, request, redirect, url_for
 from flask import render_template_string
+from werkzeug.exceptions import HTTPException
 
 from agentic_audit.pipeline import Pipeline
 from agentic_audit import exporter
+from agentic_audit.artifacts import ArtifactWriter, atomic_write_text, list_reports
+from agentic_audit.tools.serving import send_export
 
 
 APP = Flask(__name__)
 EXPORT_DIR = Path("exports")
+DB_PATH = Path("audit.db")
+ARTIFACTS = ArtifactWriter(EXPORT_DIR, DB_PATH)
 EXPORT_DIR.mkdir(exist_ok=True)
 
 INDEX_HTML = """<!doctype html>
@@ -49,9 +53,10 @@ li a:hover{text-decoration:underline;}
 {% if files %}
 <ul>
 {% for f in files %}
-  <li><a href="/reports/{{ f }}">{{ f }}</a></li>
+  <li><a href="/reports/{{ f }}">{{ f.split('/')[-1] }}</a></li>
 {% endfor %}
 </ul>
+{% if next_cursor %}<p><a href="/?before={{ next_cursor }}">Older reports &raquo;</a></p>{% endif %}
 {% else %}
 <p><em>No reports yet. Upload an invoice to get started.</em></p>
 {% endif %}
@@ -60,13 +65,20 @@ li a:hover{text-decoration:underline;}
 </html>
 """
 
+def recent_files(before=None, limit=20):
+    """Files of the most recent reports, from the report index (the exports directory is not scanned)."""
+    rows, next_cursor = list_reports(DB_PATH, limit, before)
+    files = [r[k] for r in rows for k in ("html_path", "csv_path", "json_path") if r[k]]
+    return files, next_cursor
+
+
 @APP.route("/")
 def index():
     try:
-        files = sorted([p.name for p in EXPORT_DIR.iterdir() if p.is_file() and p.suffix in ('.html', '.csv', '.json')], reverse=True)
+        files, next_cursor = recent_files(request.args.get("before", type=int))
     except:
-        files = []
-    return render_template_string(INDEX_HTML, files=files)
+        files, next_cursor = [], None
+    return render_template_string(INDEX_HTML, files=files, next_cursor=next_cursor)
 
 @APP.route("/test")
 def test():
@@ -106,27 +118,14 @@ def upload():
         pipe = Pipeline()
         report = pipe.run(docs)
 
-        # create report files
-        ts = int(time.time())
-        base = f"report-{ts}"
-        json_path = EXPORT_DIR / f"{base}.json"
-        csv_path = EXPORT_DIR / f"{base}.csv"
-        html_path = EXPORT_DIR / f"{base}.html"
-
-        # write json report
-        with json_path.open("w", encoding="utf-8") as jf:
-            json.dump(report, jf, indent=2)
-
-        # produce exports
-        exporter.export_csv(str(json_path), str(csv_path))
-        exporter.export_html(str(json_path), str(html_path))
+        # write json report and exports in one pass, atomically and under a unique name
+        saved = ARTIFACTS.write(report, page_size=exporter.HTML_PAGE_SIZE, compression="gzip")
 
         # also update last_report.json
         last_path = Path(__file__).resolve().parent.parent / "last_report.json"
-        with last_path.open("w", encoding="utf-8") as lf:
-            json.dump(report, lf, indent=2)
+        atomic_write_text(last_path, json.dumps(report, indent=2))
 
-        return redirect(url_for('report_file', filename=html_path.name))
+        return redirect(url_for('report_file', filename=saved['relpaths']['html']))
         
     except Exception as e:
         tb = traceback.format_exc()
@@ -143,7 +142,15 @@ def upload():
 @APP.route('/reports/<path:filename>')
 def report_file(filename):
     try:
-        return send_from_directory(str(EXPORT_DIR.resolve()), filename)
+        return send_export(EXPORT_DIR, filename, DB_PATH)
+    except HTTPException as e:
+        if e.code != 404:
+            return e  # e.g. 416 for an unsatisfiable Range
+        return render_template_string("""
+            <h1>File Not Found</h1>
+            <p>Could not find: <code>{{ filename }}</code></p>
+            <a href='/'>← Back to Dashboard</a>
+        """, filename=filename), 404
     except Exception as e:
         return render_template_string("""
             <h1>File Not Found</h1>
@@ -10,6 +10,8 @@ def main():
     p.add_argument("--outdir", help="Output directory", default="exports")
     p.add_argument("--csv", help="CSV filename (relative to outdir)", default="report.csv")
     p.add_argument("--html", help="HTML filename (relative to outdir)", default="report.html")
+    p.add_argument("--page-size", type=int, default=None, help="Write a paginated HTML report with this many invoices per page")
+    p.add_argument("--stream", action="store_true", help="Stream records instead of loading the whole report (for .ndjson reports, or JSON with ijson installed)")
     args = p.parse_args()
 
     report = Path(args.report)
@@ -20,8 +22,12 @@ def main():
     html_path = outdir / args.html
 
     print(f"Exporting {report} -> {csv_path}, {html_path}")
-    exporter.export_csv(str(report), str(csv_path))
-    exporter.export_html(str(report), str(html_path))
+    if args.stream or report.suffix == ".ndjson":
+        exporter.stream_csv(str(report), str(csv_path))
+        exporter.stream_html(str(report), str(html_path), page_size=args.page_size)
+    else:
+        exporter.export_csv(str(report), str(csv_path))
+        exporter.export_html(str(report), str(html_path), page_size=args.page_size)
     print("Export complete.")
 
 
@@ -1,33 +1,257 @@
-"""Serve the exports directory over HTTP for quick preview of the HTML report."""
+"""Serve the exports directory over HTTP for quick preview of the HTML report.
+
+The server is threaded (one thread per connection, so a slow client does not
+hold up the rest of the review team), speaks HTTP/1.1 with keep-alive, and
+serves `--outdir` directly without changing the process's working directory.
+Files get the same caching rules as the dashboards' downloads (see
+`agentic_audit.http_cache`); text files without a precompressed `.gz` variant
+are gzipped on the fly and kept in a small in-memory cache, as are directory
+listings.
+"""
+import functools
+import gzip
+import html
 import http.server
-import socketserver
-import webbrowser
+import io
 import os
+import threading
+import urllib.parse
+import webbrowser
+from collections import OrderedDict
 from pathlib import Path
 import argparse
+from typing import Optional
+
+from agentic_audit import http_cache
+
+
+COMPRESSIBLE_SUFFIXES = http_cache.PRECOMPRESS_SUFFIXES | {".txt", ".css", ".js", ".svg", ".ndjson"}
+MAX_DYNAMIC_GZIP_BYTES = 16 * 1024 * 1024  # larger files are sent uncompressed rather than gzipped per request
+CACHE_BYTES = 64 * 1024 * 1024
+KEEPALIVE_TIMEOUT = 30  # seconds an idle keep-alive connection holds its thread
+
+
+class _ByteCache:
+    """Thread-safe LRU of byte strings, bounded by their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class ReportServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler, cache_bytes: int = CACHE_BYTES):
+        super().__init__(server_address, handler)
+        self.cache = _ByteCache(cache_bytes)  # gzipped bodies and directory listings
+
+
+class ReportRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static handler with the same caching rules as the dashboards' downloads:
+    strong ETags and 304s, precompressed `.gz` variants, byte ranges, and
+    long-lived `Cache-Control` for immutable `report-<ULID>` files."""
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True  # headers and body are separate writes on a kept-alive connection
+    _remaining = None  # bytes left to copy for a range response
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urllib.parse.urlsplit(self.path).path.endswith("/"):
+                return super().send_head()  # redirect to the trailing-slash URL
+            for index in ("index.html", "index.htm"):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return self.list_directory(path)
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return None
+        ctype = self.guess_type(path)
+        accept = self.headers.get("Accept-Encoding")
+        variant = http_cache.gzip_variant(Path(path), accept)
+        sent = str(variant) if variant else path
+        try:
+            f = open(sent, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            etag = http_cache.etag_for(sent, st) + ("-gzip" if variant else "")
+            encoding = "gzip" if variant else None
+            if (variant is None and "Range" not in self.headers and http_cache.accepts_encoding(accept, "gzip")
+                    and Path(path).suffix in COMPRESSIBLE_SUFFIXES and st.st_size <= MAX_DYNAMIC_GZIP_BYTES):
+                body = self._gzipped(f, path, etag)
+                f.close()
+                f = io.BytesIO(body)
+                etag, encoding = etag + "-gzip", "gzip"
+                length = len(body)
+            else:
+                length = st.st_size
+            if http_cache.etag_matches(self.headers.get("If-None-Match"), etag):
+                f.close()
+                self.send_response(304)
+                self._send_cache_headers(path, etag)
+                self.end_headers()
+                return None
+            byte_range = http_cache.parse_range(self.headers.get("Range"), length)
+            if byte_range is not None and byte_range[0] >= length:
+                f.close()
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{length}")
+                self._send_cache_headers(path, etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            if byte_range is not None:
+                start, end = byte_range
+                f.seek(start)
+                self._remaining = end - start + 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{length}")
+            else:
+                self._remaining = None
+                self.send_response(200)
+            self.send_header("Content-type", ctype)
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(self._remaining if self._remaining is not None else length))
+            self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+            self._send_cache_headers(path, etag)
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def _gzipped(self, f, path: str, etag: str) -> bytes:
+        key = ("gzip", path, etag)
+        body = self.server.cache.get(key)
+        if body is None:
+            body = gzip.compress(f.read(), compresslevel=6, mtime=0)
+            self.server.cache.put(key, body)
+        return body
+
+    def _send_cache_headers(self, path: str, etag: str):
+        self.send_header("ETag", f'"{etag}"')
+        self.send_header("Cache-Control", http_cache.cache_control_for(path))
+        self.send_header("Accept-Ranges", "bytes")
+        if Path(path).suffix in COMPRESSIBLE_SUFFIXES:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def list_directory(self, path):
+        """Directory listing, rendered once per directory modification."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.send_error(404, "No permission to list directory")
+            return None
+        display = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path, errors="surrogatepass")
+        key = ("listing", path, display, st.st_mtime_ns)
+        body = self.server.cache.get(key)
+        if body is None:
+            body = self._render_listing(path, display)
+            self.server.cache.put(key, body)
+        etag = f"{st.st_mtime_ns:x}-{len(body):x}"
+        if http_cache.etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", f'"{etag}"')
+            self.end_headers()
+            return None
+        self._remaining = None
+        self.send_response(200)
+        self.send_header("Content-type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", f'"{etag}"')
+        self.send_header("Cache-Control", http_cache.REVALIDATE_CACHE_CONTROL)
+        self.end_headers()
+        return io.BytesIO(body)
+
+    @staticmethod
+    def _render_listing(path: str, display: str) -> bytes:
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue  # staging directories and temp files
+                name = entry.name + ("/" if entry.is_dir() else "")
+                entries.append(name)
+        entries.sort(key=str.lower)
+        title = html.escape(f"Directory listing for {display}", quote=False)
+        lines = [
+            "<!DOCTYPE HTML>",
+            '<html lang="en"><head><meta charset="utf-8">',
+            f"<title>{title}</title></head><body>",
+            f"<h1>{title}</h1><hr><ul>",
+        ]
+        for name in entries:
+            href = urllib.parse.quote(name, errors="surrogatepass")
+            lines.append(f'<li><a href="{href}">{html.escape(name, quote=False)}</a></li>')
+        lines.append("</ul><hr></body></html>\n")
+        return "\n".join(lines).encode("utf-8", "surrogateescape")
+
+    def copyfile(self, source, outputfile):
+        if self._remaining is None:
+            return super().copyfile(source, outputfile)
+        remaining = self._remaining
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def make_server(dirpath: Path, port: int = 8000, host: str = "", handler_class=ReportRequestHandler) -> ReportServer:
+    """A server for `dirpath` (not started); port 0 picks a free port."""
+    handler = functools.partial(handler_class, directory=str(Path(dirpath).resolve()))
+    return ReportServer((host, port), handler)
 
 
-def serve(dirpath: Path, port: int = 8000, open_browser: bool = True):
-    handler = http.server.SimpleHTTPRequestHandler
-    prev_cwd = Path.cwd()
-    try:
-        server_dir = str(dirpath.resolve())
-        print(f"Serving {server_dir} on http://localhost:{port}")
-        # change cwd so the SimpleHTTPRequestHandler serves from exports
-        os.chdir(server_dir)
-        with socketserver.TCPServer(("", port), handler) as httpd:
-            if open_browser:
-                webbrowser.open(f"http://localhost:{port}/report.html")
+def serve(dirpath: Path, port: int = 8000, open_browser: bool = True, host: str = ""):
+    with make_server(dirpath, port, host) as httpd:
+        print(f"Serving {Path(dirpath).resolve()} on http://localhost:{httpd.server_address[1]}")
+        if open_browser:
+            webbrowser.open(f"http://localhost:{httpd.server_address[1]}/report.html")
+        try:
             httpd.serve_forever()
-    finally:
-        # restore cwd
-        os.chdir(str(prev_cwd))
+        except KeyboardInterrupt:
+            pass
 
 
 def main():
     p = argparse.ArgumentParser(description="Serve exported audit report for preview")
     p.add_argument("--outdir", default="exports", help="Directory containing report.html")
     p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--host", default="", help="Interface to bind (default: all)")
     p.add_argument("--no-open", action="store_true", help="Do not auto-open browser")
     args = p.parse_args()
 
@@ -35,7 +259,7 @@ def main():
     if not out.exists():
         raise SystemExit(f"Directory not found: {out}")
 
-    serve(out, port=args.port, open_browser=not args.no_open)
+    serve(out, port=args.port, open_browser=not args.no_open, host=args.host)
 
 
 if __name__ == '__main__':
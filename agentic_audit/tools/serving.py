@@ -0,0 +1,102 @@
+"""Flask helpers shared by the dashboards for serving files from the exports directory."""
+from pathlib import Path
+
+from flask import Response, abort, jsonify, request, send_file
+
+from agentic_audit import http_cache, report_io
+from agentic_audit.artifacts import resolve_artifact
+from agentic_audit.retention import find_archived, read_archived
+from agentic_audit.report_store import PAGE_SIZE, ReportContainer
+
+
+def _finish(resp, name: str, etag: str, varies: bool):
+    """Validators, cache lifetime and conditional/range handling shared by every response."""
+    if varies:
+        resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = http_cache.cache_control_for(name)
+    if resp.get_etag() == (None, None):
+        resp.set_etag(etag)
+    return resp.make_conditional(request, accept_ranges=True, complete_length=resp.content_length)
+
+
+def _encoded_response(body: bytes, encoding, content_type: str, name: str, etag: str):
+    """Send `body` (stored with `encoding`) as-is if the client accepts it, else decompressed."""
+    if encoding is not None and not http_cache.accepts_encoding(request.headers.get("Accept-Encoding"), encoding):
+        body = report_io.decompress(body, {"gzip": ".gz", "zstd": ".zst"}[encoding])
+        encoding, etag = None, etag + "-identity"
+    resp = Response(body, mimetype=content_type)
+    if encoding is not None:
+        resp.headers["Content-Encoding"] = encoding
+        etag += f"-{encoding}"
+    return _finish(resp, name, etag, varies=True)
+
+
+def send_export(directory, filename: str, db_path=None):
+    """Send a stored export with HTTP caching.
+
+    - Report artifacts are immutable: strong ETags, `Cache-Control: immutable`,
+      304 for matching conditional requests, and byte ranges.
+    - A precompressed `<file>.gz` written next to HTML/CSV/JSON files is sent
+      with `Content-Encoding: gzip` to clients that accept it; compressed
+      files (`.json.gz`, ...) go out as stored and are only decompressed for
+      clients that do not.
+
+    `filename` may be relative to the exports directory (`2024/05/01/report-...html`)
+    or a bare name, which is looked up in its date shard. With `db_path`,
+    files that retention has packed into archive segments are served from
+    there.
+    """
+    path = resolve_artifact(directory, filename)
+    if path is None:
+        row = find_archived(directory, db_path, filename) if db_path else None
+        if row is None:
+            abort(404)
+        body, stored = read_archived(directory, row)
+        file_encoding, content_type = report_io.served_encoding(Path(row[0]))
+        # archived files are stored gzip-compressed unless they already were compressed
+        etag = f"{row[1]}-{row[2]:x}"
+        return _encoded_response(body, "gzip" if stored == "gzip" else file_encoding, content_type, row[0], etag)
+
+    encoding, content_type = report_io.served_encoding(path)
+    accept = request.headers.get("Accept-Encoding")
+    if encoding is None:
+        variant = http_cache.gzip_variant(path, accept)
+        sent = variant or path
+        resp = send_file(sent, mimetype=content_type, conditional=False, etag=False)
+        if variant is not None:
+            resp.headers["Content-Encoding"] = "gzip"
+        etag = http_cache.etag_for(sent) + ("-gzip" if variant is not None else "")
+        return _finish(resp, path.name, etag, varies=Path(str(path) + ".gz").is_file())
+    if http_cache.accepts_encoding(accept, encoding):
+        resp = send_file(path, mimetype=content_type, conditional=False, etag=False)
+        resp.headers["Content-Encoding"] = encoding
+        return _finish(resp, path.name, http_cache.etag_for(path), varies=True)
+    return _encoded_response(path.read_bytes(), encoding, content_type, path.name, http_cache.etag_for(path))
+
+
+MAX_PAGE_SIZE = 1000
+
+
+def report_records(directory, name: str):
+    """JSON page of a report's records from its indexed container `<name>.ndjson`.
+
+    Query parameters: `page` (1-based), `size`, `flagged=1` for flagged
+    records only, or `flag=<name>` for one kind of flag.
+    """
+    path = resolve_artifact(directory, f"{name}.ndjson")
+    if path is None:
+        abort(404)
+    try:
+        page = int(request.args.get("page", 1))
+        size = min(int(request.args.get("size", PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400)
+    flagged = request.args.get("flagged", "").lower() in ("1", "true", "yes")
+    with ReportContainer(path) as container:
+        try:
+            result = container.page(page, size, flagged=flagged, flag=request.args.get("flag") or None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        result["report"] = name
+        result["summary"] = container.header.get("summary", {})
+    return jsonify(result)
@@ -1,99 +1,37 @@
 """Minimal Flask dashboard for uploading and scanning invoices."""
-import json
-import time
-import re
+import hashlib
+import multiprocessing
 import os
 import sqlite3
+import tempfile
+import threading
+import time
 from functools import wraps
 from pathlib import Path
-from flask import Flask, request, render_template_string, redirect, send_file, session, url_for
-import csv
-
-from agentic_audit.pipeline import Pipeline
-from agentic_audit import exporter
-
-try:
-    import pdfplumber
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
-
-try:
-    import pandas as pd
-    PANDAS_SUPPORT = True
-except ImportError:
-    PANDAS_SUPPORT = False
-
-try:
-    from docx import Document
-    DOCX_SUPPORT = True
-except ImportError:
-    DOCX_SUPPORT = False
-
-# Image / OCR support
-try:
-    from PIL import Image
-    PIL_SUPPORT = True
-except Exception:
-    PIL_SUPPORT = False
-
-try:
-    import pytesseract
-    TESSERACT_SUPPORT = True
-except Exception:
-    TESSERACT_SUPPORT = False
-
-# If user provided a TESSERACT_CMD environment variable, use it (optional)
-if TESSERACT_SUPPORT:
-    t_cmd = os.environ.get("TESSERACT_CMD")
-    if t_cmd:
-        try:
-            pytesseract.pytesseract.tesseract_cmd = t_cmd
-        except Exception:
-            pass
-
-# RapidFuzz fuzzy matching for vendor verification
-try:
-    from rapidfuzz import fuzz
-    RAPIDFUZZ_SUPPORT = True
-except Exception:
-    RAPIDFUZZ_SUPPORT = False
-
-# Load vendor DB (simple CSV of known/trusted vendor names)
-VENDOR_DB = []
-try:
-    vendor_csv = Path("vendor_db/vendors.csv")
-    if vendor_csv.exists():
-        with open(vendor_csv, newline='', encoding='utf-8') as vf:
-            reader = csv.reader(vf)
-            for row in reader:
-                if row:
-                    VENDOR_DB.append(row[0].strip())
-except Exception:
-    VENDOR_DB = []
+from flask import Flask, Response, make_response, request, render_template, redirect, session, url_for, jsonify
+from markupsafe import Markup
 
-def compute_vendor_confidence(vendor_name):
-    """Return best match and score (0-100) against VENDOR_DB using rapidfuzz."""
-    if not vendor_name:
-        return {"score": 0, "match": None}
-    if not (RAPIDFUZZ_SUPPORT and VENDOR_DB):
-        return {"score": None, "match": None}
-    best_score = -1
-    best_match = None
-    for v in VENDOR_DB:
-        try:
-            s = fuzz.token_sort_ratio(vendor_name, v)
-        except Exception:
-            s = 0
-        if s > best_score:
-            best_score = s
-            best_match = v
-    return {"score": int(best_score), "match": best_match}
+from agentic_audit import exporter, metrics, progress
+from agentic_audit.admission import AdmissionController, AdmissionRejected, kind_for
+from agentic_audit.artifacts import init_db as init_report_db, list_reports, mark_reports_changed, reports_version
+from agentic_audit.executor import LIGHT, WorkExecutor, audit_documents, audit_upload, lane_for_upload, vendor_registry_stats
+from agentic_audit.progress import ProgressBusy, ProgressHub
+from agentic_audit.retention import Retention, RetentionPolicy, RetentionWorker
+from agentic_audit.tools.serving import report_records, send_export
+from werkzeug.exceptions import HTTPException, NotFound, RequestEntityTooLarge
 
 app = Flask(__name__)
+metrics.instrument_app(app)
 EXPORT_DIR = Path("exports").resolve()
 EXPORT_DIR.mkdir(exist_ok=True)
 DB_PATH = Path("audit.db")
+# the .ndjson container gives /reports/<name>/records random access to records
+REPORT_FORMATS = ("json", "csv", "html", "ndjson")
+EXPORT_OPTIONS = {"formats": REPORT_FORMATS, "concurrent": True,
+                  "page_size": exporter.HTML_PAGE_SIZE, "compression": "gzip"}
+# larger request bodies are refused (413) before they are read
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 50))
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
 
 # Simple session-based auth
 app.secret_key = os.environ.get("SECRET_KEY", "change-me-in-prod")
@@ -148,95 +86,6 @@ LOGIN_HTML = """
 </html>
 """
 
-def extract_invoice_from_pdf(pdf_path):
-    """Extract invoice data from PDF using pdfplumber"""
-    if not PDF_SUPPORT:
-        return None
-    
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            for page in pdf.pages:
-                full_text += page.extract_text() + "\n"
-            
-            # Parse invoice details from text
-            invoice_data = parse_invoice_text(full_text)
-            return invoice_data
-    except Exception as e:
-        print(f"PDF extraction error: {e}")
-        return None
-
-def parse_invoice_text(text):
-    """Extract structured invoice data from unstructured text"""
-    invoice = {
-        "invoice_id": None,
-        "vendor": None,
-        "amount": None,
-        "date": None,
-        "description": "Uploaded invoice"
-    }
-    
-    # Try to find invoice number
-    patterns = [
-        r'Invoice\s*#?:?\s*([A-Z0-9\-]+)',
-        r'Order\s*#?:?\s*([A-Z0-9\-]+)',
-        r'Order ID\s*:?\s*([A-Z0-9\-]+)',
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            invoice["invoice_id"] = match.group(1)
-            break
-    
-    if not invoice["invoice_id"]:
-        invoice["invoice_id"] = f"INV-{int(time.time())}"
-    
-    # Try to find amount/total
-    amount_patterns = [
-        r'(?:Total|Amount|Grand Total|Price)\s*[:\s]*[₹\$]?\s*([\d,]+\.?\d*)',
-        r'([\d,]+\.?\d*)\s*(?:INR|USD|\$|₹)',
-    ]
-    for pattern in amount_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            amount_str = match.group(1).replace(',', '')
-            try:
-                invoice["amount"] = float(amount_str)
-                break
-            except:
-                pass
-    
-    if not invoice["amount"]:
-        invoice["amount"] = 0.0
-    
-    # Try to find vendor/seller
-    vendor_patterns = [
-        r'(?:Seller|Vendor|From|Company|Supplied by)\s*[:\n]\s*([A-Za-z\s&]+)',
-        r'(?:Bill to|Sold by)\s*[:\n]\s*([A-Za-z\s&]+)',
-    ]
-    for pattern in vendor_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            vendor = match.group(1).strip()
-            if len(vendor) > 3 and len(vendor) < 100:
-                invoice["vendor"] = vendor
-                break
-    
-    if not invoice["vendor"]:
-        invoice["vendor"] = "Unknown Vendor"
-    
-    # Try to find date
-    date_pattern = r'(?:Date|Order Date|Invoice Date)\s*[:\n]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})'
-    match = re.search(date_pattern, text, re.IGNORECASE)
-    if match:
-        invoice["date"] = match.group(1)
-    else:
-        from datetime import datetime
-        invoice["date"] = datetime.now().strftime("%Y-%m-%d")
-    
-    return invoice
-
-
 # --- Simple SQLite helpers ---
 def init_db():
     with sqlite3.connect(DB_PATH) as conn:
@@ -323,335 +172,49 @@ def signup():
                 error = "Username already exists. Please choose another."
             except Exception as e:
                 error = f"Error: {e}"
-    return render_template_string(SIGNUP_HTML, error=error, success=success)
+    return render_template(SIGNUP_TEMPLATE, error=error, success=success)
 
 
-def record_report(report, html_file, json_file, csv_file):
-    total_invoices = len(report.get("invoices", [])) if isinstance(report, dict) else 0
-    fraud_alerts = len(report.get("fraud_alerts", [])) if isinstance(report, dict) else 0
-    compliance_violations = len(report.get("compliance_violations", [])) if isinstance(report, dict) else 0
-    # Store only the filenames in the DB for privacy/security
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """
-            INSERT INTO reports (created_at, total_invoices, fraud_alerts, compliance_violations, html_path, json_path, csv_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                int(time.time()),
-                total_invoices,
-                fraud_alerts,
-                compliance_violations,
-                os.path.basename(str(html_file)),
-                os.path.basename(str(json_file)),
-                os.path.basename(str(csv_file)),
-            ),
-        )
-
-
-def fetch_reports(limit=10):
-    with sqlite3.connect(DB_PATH) as conn:
-        rows = conn.execute(
-            "SELECT html_path FROM reports ORDER BY created_at DESC LIMIT ?",
-            (limit,),
-        ).fetchall()
-    # Only return the filename, not the full path, for security
-    basenames = []
-    for r in rows:
-        if not r:
-            continue
-        val = r[0] or ""
-        # Handle any path separators (Windows or POSIX)
-        basenames.append(os.path.basename(val))
-    return basenames
+def fetch_reports(limit=10, before=None):
+    """Recent reports' HTML paths (relative to EXPORT_DIR) and the cursor for the next page."""
+    rows, cursor = list_reports(DB_PATH, limit, before)
+    return [r["html_path"] for r in rows if r["html_path"]], cursor
 
 # Initialize DB at import time (Flask 3+ removed before_first_request)
 init_db()
+init_report_db(DB_PATH)
+# parsing, vendor matching, the pipeline and the export run in worker
+# processes; request threads only save uploads and wait
+EXECUTOR = WorkExecutor.from_env()
+# worker processes re-import the main module; only the server process starts background work
+IS_SERVER_PROCESS = multiprocessing.current_process().name == "MainProcess"
+# upload progress events, from request threads and (via the executor) workers.
+# Each open stream holds a request thread, so PROGRESS_MAX_STREAMS must stay
+# well below waitress' --threads (16 in the Dockerfile): uploads need the rest.
+PROGRESS = ProgressHub.from_env()
+if IS_SERVER_PROCESS:
+    progress.set_sink(PROGRESS.publish)
+    EXECUTOR.start()
+# archive/expire old reports in the background; never touches the current day's uploads
+RETENTION = RetentionWorker(Retention(EXPORT_DIR, DB_PATH, RetentionPolicy.from_env()),
+                            interval=float(os.environ.get("RETENTION_INTERVAL", 3600)))
+if IS_SERVER_PROCESS and os.environ.get("RETENTION_ENABLED", "1") == "1":
+    RETENTION.start()
 
-# --- Multi-format file parsers ---
-def extract_from_txt(file_content):
-    """Extract invoice data from plain text"""
-    lines = file_content.split('\n')
-    full_text = ' '.join(lines)
-    return parse_invoice_text(full_text)
-
-def extract_from_csv(file_path):
-    """Extract invoice data from CSV"""
-    if not PANDAS_SUPPORT:
-        return None
-    
-    try:
-        df = pd.read_csv(file_path)
-        
-        # Try to find relevant columns
-        invoice_data = {
-            "invoice_id": None,
-            "vendor": None,
-            "amount": None,
-            "date": None,
-            "description": "CSV invoice"
-        }
-        
-        # Map common CSV column names
-        for col in df.columns:
-            col_lower = col.lower()
-            if 'invoice' in col_lower or 'order' in col_lower or 'id' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["invoice_id"] = str(df[col].iloc[0])
-            elif 'vendor' in col_lower or 'seller' in col_lower or 'company' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["vendor"] = str(df[col].iloc[0])
-            elif 'amount' in col_lower or 'total' in col_lower or 'price' in col_lower:
-                if df[col].notna().any():
-                    try:
-                        invoice_data["amount"] = float(df[col].iloc[0])
-                    except:
-                        pass
-            elif 'date' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["date"] = str(df[col].iloc[0])
-        
-        # Set defaults
-        if not invoice_data["invoice_id"]:
-            invoice_data["invoice_id"] = f"INV-{int(time.time())}"
-        if not invoice_data["vendor"]:
-            invoice_data["vendor"] = "Unknown Vendor"
-        if not invoice_data["amount"]:
-            invoice_data["amount"] = 0.0
-        if not invoice_data["date"]:
-            from datetime import datetime
-            invoice_data["date"] = datetime.now().strftime("%Y-%m-%d")
-        
-        return invoice_data
-    except Exception as e:
-        print(f"CSV extraction error: {e}")
-        return None
-
-def extract_from_xlsx(file_path):
-    """Extract invoice data from Excel"""
-    if not PANDAS_SUPPORT:
-        return None
-    
-    try:
-        df = pd.read_excel(file_path)
-        
-        invoice_data = {
-            "invoice_id": None,
-            "vendor": None,
-            "amount": None,
-            "date": None,
-            "description": "Excel invoice"
-        }
-        
-        # Map common Excel column names
-        for col in df.columns:
-            col_lower = col.lower()
-            if 'invoice' in col_lower or 'order' in col_lower or 'id' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["invoice_id"] = str(df[col].iloc[0])
-            elif 'vendor' in col_lower or 'seller' in col_lower or 'company' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["vendor"] = str(df[col].iloc[0])
-            elif 'amount' in col_lower or 'total' in col_lower or 'price' in col_lower:
-                if df[col].notna().any():
-                    try:
-                        invoice_data["amount"] = float(df[col].iloc[0])
-                    except:
-                        pass
-            elif 'date' in col_lower:
-                if df[col].notna().any():
-                    invoice_data["date"] = str(df[col].iloc[0])
-        
-        # Set defaults
-        if not invoice_data["invoice_id"]:
-            invoice_data["invoice_id"] = f"INV-{int(time.time())}"
-        if not invoice_data["vendor"]:
-            invoice_data["vendor"] = "Unknown Vendor"
-        if not invoice_data["amount"]:
-            invoice_data["amount"] = 0.0
-        if not invoice_data["date"]:
-            from datetime import datetime
-            invoice_data["date"] = datetime.now().strftime("%Y-%m-%d")
-        
-        return invoice_data
-    except Exception as e:
-        print(f"Excel extraction error: {e}")
-        return None
+ADMISSION = AdmissionController.from_env()
 
-def extract_from_docx(file_path):
-    """Extract invoice data from Word document"""
-    if not DOCX_SUPPORT:
-        return None
-    
-    try:
-        doc = Document(file_path)
-        full_text = '\n'.join([para.text for para in doc.paragraphs])
-        return parse_invoice_text(full_text)
-    except Exception as e:
-        print(f"DOCX extraction error: {e}")
-        return None
-
-def extract_from_image(file_path):
-    """Extract invoice data from image using OCR (pytesseract + Pillow)"""
-    if not (PIL_SUPPORT and TESSERACT_SUPPORT):
-        return None
-    try:
-        img = Image.open(file_path)
-        # convert to RGB to handle some formats
-        img = img.convert('RGB')
-        text = pytesseract.image_to_string(img)
-        cleaned = text.strip() if text else ""
-        print(f"[OCR] extracted text length={len(cleaned)} from {file_path}")
-        if not cleaned:
-            print(f"[OCR] No text extracted from image: {file_path}")
-            return None
-        invoice_data = parse_invoice_text(cleaned)
-        return invoice_data
-    except Exception as e:
-        print(f"Image OCR error for {file_path}: {e}")
-        return None
 
-def process_file(file, filename):
-    """Process any file type and extract invoice data"""
-    docs = []
-    
-    # PDF
-    if filename.lower().endswith('.pdf'):
-        if not PDF_SUPPORT:
-            return None, "PDF support not installed. Run: pip install pdfplumber"
-        
-        temp_file = Path("/tmp") / filename if Path("/tmp").exists() else Path("exports") / filename
-        file.save(str(temp_file))
-        invoice_data = extract_invoice_from_pdf(str(temp_file))
-        try:
-            temp_file.unlink()
-        except:
-            pass
-        
-        if not invoice_data:
-            return None, "Could not extract invoice data from PDF"
-        docs = [invoice_data]
-    
-    # JSON
-    elif filename.lower().endswith('.json'):
-        try:
-            raw_data = file.read()
-            data = None
-            
-            for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    content = raw_data.decode(encoding)
-                    data = json.loads(content)
-                    break
-                except:
-                    continue
-            
-            if data is None:
-                return None, "Failed to parse JSON. Ensure file is valid UTF-8 JSON"
-            
-            docs = data if isinstance(data, list) else [data]
-        except Exception as e:
-            return None, f"JSON parse error: {str(e)}"
-    
-    # TXT
-    elif filename.lower().endswith('.txt'):
-        try:
-            content = file.read().decode('utf-8', errors='ignore')
-            invoice_data = extract_from_txt(content)
-            if invoice_data:
-                docs = [invoice_data]
-            else:
-                return None, "Could not extract invoice data from text"
-        except Exception as e:
-            return None, f"Text parse error: {str(e)}"
-    
-    # CSV
-    elif filename.lower().endswith('.csv'):
-        if not PANDAS_SUPPORT:
-            return None, "CSV support requires pandas. Run: pip install pandas"
-        
-        try:
-            temp_file = Path("exports") / filename
-            file.save(str(temp_file))
-            invoice_data = extract_from_csv(str(temp_file))
-            try:
-                temp_file.unlink()
-            except:
-                pass
-            
-            if invoice_data:
-                docs = [invoice_data]
-            else:
-                return None, "Could not extract invoice data from CSV"
-        except Exception as e:
-            return None, f"CSV parse error: {str(e)}"
-    
-    # XLSX/XLS
-    elif filename.lower().endswith(('.xlsx', '.xls')):
-        if not PANDAS_SUPPORT:
-            return None, "Excel support requires pandas. Run: pip install pandas openpyxl"
-        
-        try:
-            temp_file = Path("exports") / filename
-            file.save(str(temp_file))
-            invoice_data = extract_from_xlsx(str(temp_file))
-            try:
-                temp_file.unlink()
-            except:
-                pass
-            
-            if invoice_data:
-                docs = [invoice_data]
-            else:
-                return None, "Could not extract invoice data from Excel"
-        except Exception as e:
-            return None, f"Excel parse error: {str(e)}"
-    
-    # DOCX
-    elif filename.lower().endswith('.docx'):
-        if not DOCX_SUPPORT:
-            return None, "DOCX support requires python-docx. Run: pip install python-docx"
-        
-        try:
-            temp_file = Path("exports") / filename
-            file.save(str(temp_file))
-            invoice_data = extract_from_docx(str(temp_file))
-            try:
-                temp_file.unlink()
-            except:
-                pass
-            
-            if invoice_data:
-                docs = [invoice_data]
-            else:
-                return None, "Could not extract invoice data from document"
-        except Exception as e:
-            return None, f"DOCX parse error: {str(e)}"
+def upload_user() -> str:
+    """Who an upload counts against for fair scheduling: the signed-in user, else the client address."""
+    return session.get("user") or request.remote_addr or "anonymous"
 
-    # Images (JPG, PNG, TIFF, GIF, WEBP, BMP)
-    elif filename.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif', '.bmp', '.gif', '.webp')):
-        if not (PIL_SUPPORT and TESSERACT_SUPPORT):
-            return None, "Image OCR requires Pillow and pytesseract and system Tesseract installed. Run: pip install pillow pytesseract and install tesseract-ocr on your system"
-        try:
-            temp_file = Path("exports") / filename
-            file.save(str(temp_file))
-            invoice_data = extract_from_image(str(temp_file))
-            try:
-                temp_file.unlink()
-            except:
-                pass
 
-            if invoice_data:
-                docs = [invoice_data]
-            else:
-                return None, "Could not extract invoice data from image"
-        except Exception as e:
-            return None, f"Image parse error: {str(e)}"
-    
-    else:
-        return None, f"Unsupported file type: {filename}. Supported: PDF, JSON, TXT, CSV, XLSX, XLS, DOCX"
-    
-    return docs, None
+def save_upload(file) -> Path:
+    """Save an uploaded file to a private temporary path (keeping its extension) for a worker to read."""
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=Path(file.filename or "").suffix.lower())
+    with os.fdopen(fd, "wb") as out:
+        file.save(out)
+    return Path(name)
 
 HTML = """
 <!DOCTYPE html>
@@ -884,6 +447,35 @@ HTML = """
             font-weight: 600;
         }
         
+        .upload-progress {
+            margin-top: 16px;
+            padding: 12px;
+            background: #f3f4ff;
+            border-radius: 8px;
+            color: #334;
+        }
+        
+        .upload-progress .bar {
+            height: 6px;
+            background: #e0e3ff;
+            border-radius: 3px;
+            overflow: hidden;
+            margin-bottom: 8px;
+        }
+        
+        .upload-progress .bar div {
+            height: 100%;
+            width: 0;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            transition: width 0.2s;
+        }
+        
+        .upload-progress ul {
+            margin: 0;
+            padding-left: 18px;
+            font-size: 0.9rem;
+        }
+        
         button {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
@@ -1194,7 +786,12 @@ HTML = """
                     <input type="file" name="file" id="fileInput" accept="image/*,.pdf,.json,.txt,.csv,.xlsx,.xls,.docx" required>
                     <div id="fileName" class="selected-file" style="display:none;"></div>
                 </div>
+                <input type="hidden" name="progress_id" id="progressId">
                 <button type="submit" id="submitBtn" disabled>🚀 Analyze Invoice</button>
+                <div id="uploadProgress" class="upload-progress" style="display:none;">
+                    <div class="bar"><div id="progressBar"></div></div>
+                    <ul id="progressLog"></ul>
+                </div>
             </form>
         </div>
         
@@ -1228,22 +825,7 @@ HTML = """
         
         <div class="card" id="reportsCard" style="display:none;">
             <h2><span class="icon">📊</span> Recent Audit Reports</h2>
-            {% if reports %}
-            <div class="reports-grid">
-            {% for report in reports %}
-                <div class="report-item">
-                    <span style="font-weight:bold; margin-right:10px;">{{ loop.index }}.</span>
-                    <span style="flex:1;">{{ report }}</span>
-                    <a href="/download/{{ report }}" class="view-btn" style="text-decoration:none;">View</a>
-                </div>
-            {% endfor %}
-            </div>
-            {% else %}
-            <div class="empty-state">
-                <div class="empty-state-icon">📋</div>
-                <p>No reports yet. Upload an invoice to get started!</p>
-            </div>
-            {% endif %}
+            {{ recent_reports }}
         </div>
     </div>
     
@@ -1363,12 +945,156 @@ HTML = """
                 submitBtn.disabled = false;
             }
         });
+        
+        // Live progress: register a job id, post the form in the background, then follow /progress/<id>
+        const uploadForm = document.getElementById('uploadForm');
+        const uploadProgress = document.getElementById('uploadProgress');
+        const progressBar = document.getElementById('progressBar');
+        const progressLog = document.getElementById('progressLog');
+        
+        function progressLine(text) {
+            const li = document.createElement('li');
+            li.textContent = text;
+            progressLog.appendChild(li);
+        }
+        
+        function subscribe(id) {
+            const events = new EventSource('/progress/' + id);
+            const data = ev => JSON.parse(ev.data || '{}');
+            events.addEventListener('received', () => progressLine('Upload received, waiting for a free slot…'));
+            events.addEventListener('started', () => progressLine('Processing started'));
+            events.addEventListener('page', ev => { const d = data(ev); progressLine('Text extracted from page ' + d.page + ' of ' + d.pages); });
+            events.addEventListener('ocr', () => progressLine('OCR done'));
+            events.addEventListener('extracted', ev => progressLine(data(ev).documents + ' invoice(s) extracted'));
+            events.addEventListener('vendors_matched', () => progressLine('Vendors matched'));
+            events.addEventListener('agent', ev => { const d = data(ev); progressLine('✓ ' + d.name + ' (' + d.seconds + 's)'); });
+            events.addEventListener('exported', () => progressLine('Reports written'));
+            events.addEventListener('done', () => { progressLine('Done, opening the report…'); events.close(); });
+            events.addEventListener('error', ev => {
+                if (ev.data) { progressLine('Error: ' + data(ev).message); events.close(); }
+            });
+            return events;
+        }
+        
+        function send(id) {
+            // without an id (registration refused) the upload still goes through, just without stage updates
+            document.getElementById('progressId').value = id || '';
+            let events = null;
+            const stop = () => { if (events) events.close(); };
+            const xhr = new XMLHttpRequest();
+            xhr.open('POST', uploadForm.action);
+            xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+            xhr.upload.onprogress = ev => {
+                if (ev.lengthComputable) progressBar.style.width = Math.round(100 * ev.loaded / ev.total) + '%';
+            };
+            // the server sees the upload only once its body is complete, so subscribe then;
+            // events published before that are replayed to the new stream
+            xhr.upload.onload = () => {
+                if (id && xhr.readyState !== XMLHttpRequest.DONE) events = subscribe(id);
+            };
+            xhr.onload = () => {
+                stop();
+                if (xhr.status === 200) {
+                    window.location = JSON.parse(xhr.responseText).url;
+                    return;
+                }
+                const retry = xhr.getResponseHeader('Retry-After');
+                progressLine('Upload failed (HTTP ' + xhr.status + ')' + (retry ? ', try again in ' + retry + 's' : ''));
+                submitBtn.disabled = false;
+            };
+            xhr.onerror = () => {
+                stop();
+                progressLine('Upload failed: connection error');
+                submitBtn.disabled = false;
+            };
+            xhr.send(new FormData(uploadForm));
+        }
+        
+        if (uploadForm && window.EventSource && window.XMLHttpRequest && window.fetch) {
+            uploadForm.addEventListener('submit', function(e) {
+                e.preventDefault();
+                progressLog.innerHTML = '';
+                progressBar.style.width = '0';
+                uploadProgress.style.display = 'block';
+                submitBtn.disabled = true;
+                fetch('/progress', {method: 'POST'})
+                    .then(r => r.ok ? r.json() : {})
+                    .catch(() => ({}))
+                    .then(reg => send(reg.id));
+            });
+        }
     </script>
 </body>
 </html>
 """
 
-    # ...existing code...
+RECENT_REPORTS_HTML = """
+            {% if reports %}
+            <div class="reports-grid">
+            {% for report in reports %}
+                <div class="report-item">
+                    <span style="font-weight:bold; margin-right:10px;">{{ loop.index }}.</span>
+                    <span style="flex:1;">{{ report.split('/')[-1] }}</span>
+                    <a href="/download/{{ report }}" class="view-btn" style="text-decoration:none;">View</a>
+                </div>
+            {% endfor %}
+            </div>
+            {% if next_cursor %}
+            <p><a href="/?before={{ next_cursor }}">Older reports &raquo;</a></p>
+            {% endif %}
+            {% else %}
+            <div class="empty-state">
+                <div class="empty-state-icon">📋</div>
+                <p>No reports yet. Upload an invoice to get started!</p>
+            </div>
+            {% endif %}
+"""
+
+# Templates are compiled once per process instead of on every request.
+LOGIN_TEMPLATE = app.jinja_env.from_string(LOGIN_HTML)
+SIGNUP_TEMPLATE = app.jinja_env.from_string(SIGNUP_HTML)
+INDEX_TEMPLATE = app.jinja_env.from_string(HTML)
+RECENT_REPORTS_TEMPLATE = app.jinja_env.from_string(RECENT_REPORTS_HTML)
+# part of the home page ETag, so a changed template invalidates cached pages
+_INDEX_TAG = hashlib.sha1((HTML + RECENT_REPORTS_HTML).encode("utf-8")).hexdigest()[:12]
+
+
+class RecentReportsCache:
+    """Rendered recent-reports fragment of the home page, per `before` cursor.
+
+    Entries are reused until this process registers or expires a report
+    (`artifacts.reports_version`). `max_age` bounds how long a page can miss
+    reports added by another process (a second worker, the retention CLI).
+    """
+
+    def __init__(self, max_age: float = 30.0, max_entries: int = 256):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, before=None):
+        """`(html, etag)` of the fragment for one page of reports."""
+        version = reports_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(before)
+        if entry and entry[0] == version and now - entry[1] < self.max_age:
+            metrics.inc("cache_requests_total", cache="recent_reports", result="hit")
+            return entry[2], entry[3]
+        metrics.inc("cache_requests_total", cache="recent_reports", result="miss")
+        reports, next_cursor = fetch_reports(10, before)
+        html = Markup(RECENT_REPORTS_TEMPLATE.render(reports=reports, next_cursor=next_cursor))
+        etag = hashlib.sha1(f"{_INDEX_TAG}:{html}".encode("utf-8")).hexdigest()[:20]
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[before] = (version, now, html, etag)
+        return html, etag
+
+
+RECENT_REPORTS = RecentReportsCache(max_age=float(os.environ.get("RECENT_REPORTS_MAX_AGE", 30)))
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     error = None
@@ -1388,7 +1114,7 @@ def login():
             return redirect(nxt)
         else:
             error = "Invalid username or password"
-    return render_template_string(LOGIN_HTML, error=error)
+    return render_template(LOGIN_TEMPLATE, error=error)
 
 @app.route("/logout")
 def logout():
@@ -1397,93 +1123,171 @@ def logout():
 
 @app.route("/")
 def index():
+    before = request.args.get("before", type=int)
     try:
-        reports = fetch_reports(10)
-        # If fewer than 10 in DB, fill with recent files from exports folder
-        if len(reports) < 10:
-            existing = set([Path(r).name for r in reports])
-            files = [f.name for f in sorted(EXPORT_DIR.glob("report-*.html"), reverse=True)]
-            for f in files:
-                if f not in existing:
-                    reports.append(f)
-                if len(reports) >= 10:
-                    break
-        # Always ensure only filenames (no paths)
-        reports = [Path(r).name for r in reports]
+        # cached until a report is added; on a miss, one indexed query
+        recent_reports, etag = RECENT_REPORTS.get(before)
     except Exception as e:
         print(f"Error fetching reports: {e}")
-        reports = []
-    return render_template_string(HTML, reports=reports)
+        recent_reports, etag = Markup(RECENT_REPORTS_TEMPLATE.render(reports=[], next_cursor=None)), None
+    if etag and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = make_response(render_template(INDEX_TEMPLATE, recent_reports=recent_reports))
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"  # revalidate every time; a match costs no rendering
+    return resp
 
 @app.route("/upload", methods=["POST"])
 def upload():
+    progress_id = None
+
+    def notify(stage, **data):
+        if progress_id:
+            PROGRESS.publish(progress_id, stage, data)
+
     try:
+        # the upload form registers a job with POST /progress and subscribes to it before posting;
+        # reading the form inside the try lets an oversized body reach the 413 handler below
+        progress_id = request.form.get("progress_id")
+        if not PROGRESS.owns(progress_id, upload_user()):
+            progress_id = None
         if "file" not in request.files:
+            notify("error", message="No file in request")
             return "<h1>Error</h1><p>No file in request</p><a href='/'>Back</a>", 400
         
         file = request.files["file"]
         if file.filename == "":
+            notify("error", message="No file selected")
             return "<h1>Error</h1><p>No file selected</p><a href='/'>Back</a>", 400
+        notify("received", filename=file.filename)
         
-        # Process file using multi-format handler
-        docs, error = process_file(file, file.filename)
+        # Parse, match, audit and export in a worker process; this thread only saves the upload.
+        # Each kind of upload has its own concurrency limit and bounded queue.
+        with ADMISSION.admit(kind_for(file.filename), upload_user()):
+            notify("started")
+            upload_path = save_upload(file)
+            try:
+                lane = lane_for_upload(file.filename, upload_path.stat().st_size)
+                saved, error = EXECUTOR.run(lane, audit_upload, str(upload_path), file.filename,
+                                            str(EXPORT_DIR), str(DB_PATH), EXPORT_OPTIONS,
+                                            progress_id=progress_id)
+            finally:
+                upload_path.unlink(missing_ok=True)
         
         if error:
+            notify("error", message=error)
             return f"<h1>Error</h1><p>{error}</p><a href='/'>Back</a>", 400
-        
-        if not docs:
-            return "<h1>Error</h1><p>Could not extract any invoice data from file</p><a href='/'>Back</a>", 400
-        
-        print(f"Processed {file.filename}: Extracted {len(docs)} document(s)")
-        
-        # Attach vendor fuzzy-match confidence to each extracted invoice (if available)
-        for d in docs:
-            try:
-                v = d.get("vendor") if isinstance(d, dict) else None
-                conf = compute_vendor_confidence(v)
-                # attach fields the pipeline/exporters can include
-                if isinstance(d, dict):
-                    d["vendor_confidence_score"] = conf.get("score")
-                    d["vendor_confidence_match"] = conf.get("match")
-            except Exception:
-                pass
-
-        # Run pipeline
-        pipe = Pipeline()
-        report = pipe.run(docs)
-        
-        # Save reports
-        ts = int(time.time())
-        base = f"report-{ts}"
-        
-        json_file = EXPORT_DIR / f"{base}.json"
-        csv_file = EXPORT_DIR / f"{base}.csv"
-        html_file = EXPORT_DIR / f"{base}.html"
-        
-        with open(json_file, "w") as f:
-            json.dump(report, f, indent=2)
-        
-        exporter.export_csv(str(json_file), str(csv_file))
-        exporter.export_html(str(json_file), str(html_file))
-        record_report(report, html_file, json_file, csv_file)
+        # the worker registered the report; drop this process's cached listings
+        mark_reports_changed()
         
         # Redirect to report
-        return redirect(f"/download/{html_file.name}")
+        url = f"/download/{saved['relpaths']['html']}"
+        notify("done", url=url)
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            return jsonify({"url": url})  # the page navigates itself; no need to send the report twice
+        return redirect(url)
     
+    except AdmissionRejected as e:
+        notify("error", message=e.reason, retry_after=e.retry_after)
+        resp = make_response(f"<h1>Busy</h1><p>{e.reason}</p><a href='/'>Back</a>", e.status)
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+    except RequestEntityTooLarge:
+        # the form (and so progress_id) cannot be read once the body is refused
+        return f"<h1>Error</h1><p>File too large (limit {MAX_UPLOAD_MB} MB)</p><a href='/'>Back</a>", 413
     except Exception as e:
         print(f"Upload error: {e}")
+        notify("error", message=str(e))
         return f"<h1>Error</h1><p>{str(e)}</p><a href='/'>Back</a>", 500
 
-@app.route("/download/<filename>")
+@app.route("/progress", methods=["POST"])
+def register_progress():
+    """A job id for the next upload's progress stream."""
+    try:
+        return jsonify({"id": PROGRESS.register(upload_user())})
+    except ProgressBusy as e:
+        return jsonify({"error": str(e)}), 429
+
+@app.route("/progress/<job_id>")
+def upload_progress(job_id):
+    """Server-sent events for one upload: received, started, page, ocr, extracted, agent, exported, done/error."""
+    last_event_id = request.headers.get("Last-Event-ID", "0")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    try:
+        body = PROGRESS.stream(job_id, upload_user(), after)
+    except KeyError:
+        return "Unknown progress id", 404  # EventSource does not reconnect after an error status
+    except ProgressBusy as e:
+        resp = make_response(str(e), 503)
+        resp.headers["Retry-After"] = "5"
+        return resp
+    resp = Response(body, mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # let proxies pass events through unbuffered
+    return resp
+
+@app.route("/download/<path:filename>")
 def download(filename):
     try:
-        file_path = EXPORT_DIR / filename
-        if not file_path.exists():
-            return "File not found", 404
-        return send_file(file_path, as_attachment=False)
+        return send_export(EXPORT_DIR, filename, DB_PATH)
+    except NotFound:
+        return "File not found", 404
+    except HTTPException as e:
+        return e  # e.g. 416 for an unsatisfiable Range
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+@app.route("/reports/<path:name>/records")
+def report_records_page(name):
+    """One page of a report's records (optionally flagged only) without loading the whole report."""
+    return report_records(EXPORT_DIR, name)
+
+@app.route("/vendor-registry")
+def vendor_registry_status():
+    """Size, version and load time of the vendor master (as loaded by a worker), for monitoring."""
+    return jsonify(EXECUTOR.run(LIGHT, vendor_registry_stats))
+
+@app.route("/executor")
+def executor_status():
+    """Workers, queued and finished jobs per executor lane."""
+    return jsonify(EXECUTOR.stats())
+
+@app.route("/admission")
+def admission_status():
+    """Running and queued uploads, limits and rejection counts per upload kind."""
+    return jsonify(ADMISSION.stats())
+
+def _queue_metrics():
+    """Executor, admission and progress stream state, read when /metrics is scraped."""
+    lanes = EXECUTOR.stats()
+    kinds = ADMISSION.stats()
+    yield ("executor_workers", "gauge", "Worker processes per executor lane.",
+           [({"lane": lane}, s["workers"]) for lane, s in lanes.items()])
+    yield ("executor_jobs_pending", "gauge", "Executor jobs queued or running, by lane.",
+           [({"lane": lane}, s["pending"]) for lane, s in lanes.items()])
+    yield ("executor_jobs_total", "counter", "Finished executor jobs, by lane and outcome.",
+           [({"lane": lane, "outcome": outcome}, s[outcome]) for lane, s in lanes.items() for outcome in ("completed", "failed")])
+    yield ("admission_running", "gauge", "Uploads being processed, by kind.",
+           [({"kind": kind}, s["running"]) for kind, s in kinds.items()])
+    yield ("admission_queue_depth", "gauge", "Uploads waiting for a slot, by kind.",
+           [({"kind": kind}, s["queued"]) for kind, s in kinds.items()])
+    yield ("admission_limit", "gauge", "Concurrent upload slots, by kind.",
+           [({"kind": kind}, s["limit"]) for kind, s in kinds.items()])
+    yield ("admission_rejected_total", "counter", "Rejected uploads, by kind and reason.",
+           [({"kind": kind, "reason": reason}, n) for kind, s in kinds.items() for reason, n in s["rejected"].items()])
+    streams = PROGRESS.stats()
+    yield ("progress_streams_open", "gauge", "Open /progress event streams (each holds a request thread).",
+           [({}, streams["streams"])])
+
+metrics.REGISTRY.add_collector(_queue_metrics)
+
+@app.route("/metrics")
+def metrics_page():
+    """Prometheus text exposition of request, pipeline, cache and queue metrics."""
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/create-invoice", methods=["POST"])
 def create_invoice():
     """Create invoice from form data and process"""
@@ -1497,38 +1301,12 @@ def create_invoice():
             "description": request.form.get("description")
         }
         
-        # Create document object
-        docs = [invoice_data]
-        # Attach vendor fuzzy-match confidence to created invoice
-        try:
-            v = invoice_data.get("vendor")
-            conf = compute_vendor_confidence(v)
-            invoice_data["vendor_confidence_score"] = conf.get("score")
-            invoice_data["vendor_confidence_match"] = conf.get("match")
-        except Exception:
-            pass
-
-        # Run pipeline
-        pipe = Pipeline()
-        report = pipe.run(docs)
-        
-        # Save reports
-        ts = int(time.time())
-        base = f"report-{ts}"
-        
-        json_file = EXPORT_DIR / f"{base}.json"
-        csv_file = EXPORT_DIR / f"{base}.csv"
-        html_file = EXPORT_DIR / f"{base}.html"
-        
-        with open(json_file, "w") as f:
-            json.dump(report, f, indent=2)
-        
-        exporter.export_csv(str(json_file), str(csv_file))
-        exporter.export_html(str(json_file), str(html_file))
-        record_report(report, html_file, json_file, csv_file)
+        # Vendor matching, pipeline and export run in a worker process
+        saved = EXECUTOR.run(LIGHT, audit_documents, [invoice_data], str(EXPORT_DIR), str(DB_PATH), EXPORT_OPTIONS)
+        mark_reports_changed()
         
         # Redirect to report
-        return redirect(f"/download/{html_file.name}")
+        return redirect(f"/download/{saved['relpaths']['html']}")
     
     except Exception as e:
         return f"<h1>Error</h1><p>Failed to create invoice: {str(e)}</p><a href='/'>Back</a>", 500
@@ -0,0 +1,49 @@
+"""CLI to scan stored audit reports for split invoices across uploads.
+
+A single upload rarely contains every piece of a split payment, so this
+tool pools the records of all report JSON files, plain or compact
+(deduplicated by invoice_id), and runs the `split` rules of the compliance
+rule file.
+"""
+import argparse
+import glob
+
+from agentic_audit.agents.compliance_agent import ComplianceAgent
+from agentic_audit.report_io import read_report
+
+
+def load_records(paths):
+    records = {}
+    for p in paths:
+        try:
+            report = read_report(p)
+        except Exception as e:
+            print(f"Skipping {p}: {e}")
+            continue
+        if not isinstance(report, dict):
+            continue
+        for r in report.get("records", []):
+            iid = r.get("invoice_id")
+            records[iid if iid else (p, id(r))] = r
+    return list(records.values())
+
+
+def main():
+    p = argparse.ArgumentParser(description="Detect split invoices across stored audit reports")
+    p.add_argument("reports", nargs="*", default=["exports/report-*.json", "exports/report-*.json.gz"], help="Report JSON files or glob patterns")
+    p.add_argument("--rules", help="Compliance rule file with the split rule(s) to apply")
+    args = p.parse_args()
+
+    # raw-document side files of compact reports are not reports themselves
+    paths = sorted({f for pattern in args.reports for f in glob.glob(pattern) if ".raw." not in f})
+    records = load_records(paths)
+
+    clusters = ComplianceAgent(args.rules).split_invoices(records)
+
+    print(f"Scanned {len(records)} invoices from {len(paths)} reports: {len(clusters)} split cluster(s)")
+    for c in clusters:
+        print(f"  {c['vendor']}: {', '.join(map(str, c['invoice_ids']))} total={c['total']:.2f} ({c['start_date']} .. {c['end_date']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Persistent per-vendor aggregates used for vendor risk scoring.
+
+For every vendor the store keeps the invoice count, sum and sum of squares of
+amounts, first and last invoice date, and an exponentially weighted moving
+average (EWMA) of the amount. A batch is folded in with one transaction that
+touches only the vendors in that batch, so scoring never reads the full
+history.
+
+Aggregates are kept in memory by default, or persisted to a SQLite table
+when a database path is given (the dashboard uses `audit.db`). An invoice is
+folded in once: re-uploads of the same `(vendor, invoice_id)` leave the
+history unchanged (see `invoice_ledger.py`); records without an invoice id
+always count.
+"""
+import math
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import columns
+from .invoice_ledger import InvoiceLedger
+
+
+class VendorStats:
+    """Running aggregates for one vendor."""
+
+    __slots__ = ("count", "total", "total_sq", "first_seen", "last_seen", "ewma")
+
+    def __init__(self, count=0, total=0.0, total_sq=0.0, first_seen=None, last_seen=None, ewma=None):
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.ewma = ewma
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_amount": self.total,
+            "mean": self.mean,
+            "std": self.std,
+            "ewma": self.ewma,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+
+class VendorHistory:
+    """Store of `VendorStats` keyed by vendor, updated one batch at a time."""
+
+    EWMA_ALPHA = 0.2
+    _CHUNK = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path) if db_path else None
+        self._memory: Dict[str, VendorStats] = {}
+        self.ledger = InvoiceLedger("vendor_history_invoices")
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            self.ledger.init_db(conn)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vendor_history (
+                    vendor TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    total_sq REAL NOT NULL,
+                    first_seen TEXT,
+                    last_seen TEXT,
+                    ewma REAL,
+                    updated_at INTEGER
+                )
+                """
+            )
+
+    def _batch_aggregates(self, keys: List[str], codes: np.ndarray, amounts: np.ndarray, days: np.ndarray) -> Dict[str, np.ndarray]:
+        """Per-vendor aggregates of one batch, computed without a per-record loop."""
+        n = len(keys)
+        a = self.EWMA_ALPHA
+        count = np.bincount(codes, minlength=n)
+        # position of each invoice within its vendor's run (batch order), for the EWMA weights
+        order = np.argsort(codes, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+        rank = np.empty(len(codes), dtype=np.int64)
+        rank[order] = np.arange(len(codes)) - starts[codes[order]]
+        steps_after = count[codes] - 1 - rank
+        weights = a * np.power(1 - a, steps_after)
+
+        d = days.astype("datetime64[D]").astype(np.int64)
+        valid = ~np.isnat(days)
+        first = np.full(n, np.iinfo(np.int64).max)
+        last = np.full(n, np.iinfo(np.int64).min)
+        np.minimum.at(first, codes[valid], d[valid])
+        np.maximum.at(last, codes[valid], d[valid])
+        return {
+            "count": count,
+            "total": np.bincount(codes, weights=amounts, minlength=n),
+            "total_sq": np.bincount(codes, weights=amounts * amounts, minlength=n),
+            "ewma_part": np.bincount(codes, weights=weights * amounts, minlength=n),
+            "decay": np.power(1 - a, count.astype(np.float64)),
+            "first": first,
+            "last": last,
+        }
+
+    @staticmethod
+    def _day(value: int, fallback: str) -> str:
+        if value in (np.iinfo(np.int64).max, np.iinfo(np.int64).min):
+            return fallback
+        return str(np.datetime64(int(value), "D"))
+
+    def _merge(self, keys: List[str], stored: Dict[str, VendorStats], agg: Dict[str, np.ndarray]) -> List[VendorStats]:
+        today = date.today().isoformat()
+        merged = []
+        for i, k in enumerate(keys):
+            s = stored.get(k) or VendorStats()
+            first = self._day(int(agg["first"][i]), today)
+            last = self._day(int(agg["last"][i]), today)
+            batch_mean = agg["total"][i] / agg["count"][i]
+            # EWMA seeded with the first batch mean when the vendor is new
+            prev = s.ewma if s.ewma is not None else batch_mean
+            merged.append(VendorStats(
+                count=s.count + int(agg["count"][i]),
+                total=s.total + float(agg["total"][i]),
+                total_sq=s.total_sq + float(agg["total_sq"][i]),
+                first_seen=min(s.first_seen, first) if s.first_seen else first,
+                last_seen=max(s.last_seen, last) if s.last_seen else last,
+                ewma=float(agg["decay"][i] * prev + agg["ewma_part"][i]),
+            ))
+        return merged
+
+    def _fold(self, keys: List[str], codes: np.ndarray, fresh: np.ndarray, amounts: np.ndarray, days: np.ndarray,
+              stored: Dict[str, VendorStats]) -> Tuple[Dict[str, VendorStats], Dict[str, VendorStats]]:
+        """Add the `fresh` records to `stored`: (stats of every vendor in the batch, the ones that changed)."""
+        result = {k: stored[k] for k in keys if k in stored}
+        if not fresh.any():
+            return result, {}
+        new_keys, new_codes = columns.encode([keys[c] for c in codes[fresh].tolist()])
+        agg = self._batch_aggregates(new_keys, new_codes, amounts[fresh], days[fresh])
+        changed = dict(zip(new_keys, self._merge(new_keys, stored, agg)))
+        result.update(changed)
+        return result, changed
+
+    def update(self, records: List[Dict]) -> Dict[str, VendorStats]:
+        """Fold `records` into the history and return the stats of the vendors in them.
+
+        Invoices already folded in (same vendor and invoice id) are skipped.
+        """
+        if not records:
+            return {}
+        keys, codes = columns.encode(columns.vendor_keys(records))
+        ids = columns.invoice_ids(records)
+        amounts, days = columns.amounts(records), columns.dates(records)
+
+        if self.db_path is None:
+            fresh = self.ledger.claim(keys, codes, ids)
+            result, changed = self._fold(keys, codes, fresh, amounts, days, self._memory)
+            self._memory.update(changed)
+            return result
+
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fresh = self.ledger.claim(keys, codes, ids, conn)
+            stored = {}
+            for i in range(0, len(keys), self._CHUNK):
+                chunk = keys[i:i + self._CHUNK]
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT vendor, count, total, total_sq, first_seen, last_seen, ewma FROM vendor_history WHERE vendor IN ({marks})",
+                    chunk,
+                ):
+                    stored[row[0]] = VendorStats(*row[1:])
+            result, changed = self._fold(keys, codes, fresh, amounts, days, stored)
+            now = int(time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO vendor_history (vendor, count, total, total_sq, first_seen, last_seen, ewma, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(k, s.count, s.total, s.total_sq, s.first_seen, s.last_seen, s.ewma, now) for k, s in changed.items()],
+            )
+        return result
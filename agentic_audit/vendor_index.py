@@ -0,0 +1,215 @@
+"""Character-trigram blocking index for very large vendor masters.
+
+Scoring a name against every entry of a multi-million-row vendor master is
+linear in the size of the master, however fast each comparison is. The index
+maps every trigram of the normalized vendor names to the rows containing it
+(CSR layout: sorted trigram keys, offsets, postings), so a lookup only scores
+the few hundred rows that share the most trigrams with the query.
+
+The index, the vendor names and their normalized forms are saved as `.npy`
+files next to the CSV and memory-mapped on load, so startup does not depend
+on the size of the master.
+"""
+import csv
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from .vendor_match import VendorMatcher, normalize
+
+
+INDEX_MIN_SIZE = 50000  # below this a full cdist scan is fast enough
+
+
+class StringTable:
+    """Immutable list of strings stored as one UTF-8 buffer plus offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_list(cls, strings: List[str]) -> "StringTable":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def take(self, rows) -> List[str]:
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, ends = self.offsets[rows].tolist(), self.offsets[rows + 1].tolist()
+        blob = self.blob
+        return [blob[s:e].tobytes().decode("utf-8") for s, e in zip(starts, ends)]
+
+
+def _trigram_keys(codepoints: np.ndarray) -> np.ndarray:
+    """Pack three consecutive code points (each < 2**21) into one int64 per position."""
+    c = codepoints.astype(np.int64)
+    return (c[..., :-2] << 42) | (c[..., 1:-1] << 21) | c[..., 2:]
+
+
+def _padded(s: str) -> str:
+    return f"  {s} "
+
+
+class TrigramIndex:
+    """Trigram -> rows inverted index over normalized vendor names."""
+
+    MAX_CANDIDATES = 300
+    MAX_POSTING = 20000  # trigrams more common than this say little about a match
+    BUILD_CHUNK = 100000
+
+    def __init__(self, keys, offsets, postings, names: StringTable, choices: StringTable):
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.names = names
+        self.choices = choices
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(cls, names: List[str]) -> "TrigramIndex":
+        choices = [normalize(n) for n in names]
+        all_keys, all_rows = [], []
+        for start in range(0, len(choices), cls.BUILD_CHUNK):
+            chunk = np.array([_padded(c) for c in choices[start:start + cls.BUILD_CHUNK]])
+            cp = chunk.view(np.uint32).reshape(len(chunk), -1)
+            if cp.shape[1] < 3:
+                continue
+            k = _trigram_keys(cp)
+            rows = np.broadcast_to(np.arange(start, start + len(chunk), dtype=np.int32)[:, None], k.shape)
+            valid = cp[:, 2:] != 0
+            k, rows = k[valid], rows[valid]
+            # drop repeated trigrams within a name; keeps rows ascending per key
+            order = np.lexsort((rows, k))
+            k, rows = k[order], rows[order]
+            keep = np.concatenate(([True], (k[1:] != k[:-1]) | (rows[1:] != rows[:-1])))
+            all_keys.append(k[keep])
+            all_rows.append(rows[keep])
+
+        keys = np.concatenate(all_keys) if all_keys else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(all_rows) if all_rows else np.zeros(0, dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        keys, postings = keys[order], rows[order]
+        uniq, starts = np.unique(keys, return_index=True)
+        offsets = np.append(starts, len(keys)).astype(np.int64)
+        return cls(uniq, offsets, postings, StringTable.from_list(list(names)), StringTable.from_list(choices))
+
+    def candidates(self, choice: str, limit: Optional[int] = None) -> np.ndarray:
+        """Rows sharing the most trigrams with an already-normalized query, best first."""
+        limit = limit or self.MAX_CANDIDATES
+        padded = np.array([_padded(choice)])
+        qk = np.unique(_trigram_keys(padded.view(np.uint32)))
+        pos = np.searchsorted(self.keys, qk)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == qk[found]
+        pos = pos[found]
+        if not len(pos):
+            return np.zeros(0, dtype=np.int64)
+
+        lengths = self.offsets[pos + 1] - self.offsets[pos]
+        selective = pos[lengths <= self.MAX_POSTING]
+        if not len(selective):
+            # every trigram is common: fall back to the rarest few
+            selective = pos[np.argsort(lengths)[:3]]
+        hits = np.concatenate([self.postings[self.offsets[p]:self.offsets[p + 1]] for p in selective.tolist()])
+        rows, counts = np.unique(hits, return_counts=True)
+        if len(rows) > limit:
+            top = np.argpartition(-counts, limit)[:limit]
+            rows, counts = rows[top], counts[top]
+        return rows[np.argsort(-counts, kind="stable")]
+
+    # --- persistence ---
+    _ARRAYS = ("keys", "offsets", "postings", "names_blob", "names_offsets", "choices_blob", "choices_offsets")
+
+    def save(self, directory: Path, source: Optional[dict] = None):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "keys": self.keys, "offsets": self.offsets, "postings": self.postings,
+            "names_blob": self.names.blob, "names_offsets": self.names.offsets,
+            "choices_blob": self.choices.blob, "choices_offsets": self.choices.offsets,
+        }
+        for name, arr in arrays.items():
+            np.save(directory / f"{name}.npy", np.ascontiguousarray(arr))
+        # meta is written last and marks the index as complete
+        (directory / "meta.json").write_text(json.dumps({"size": len(self), "source": source or {}}), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "TrigramIndex":
+        directory = Path(directory)
+        # plain ndarray views over the maps: np.memmap slicing is much slower per call
+        a = {name: np.load(directory / f"{name}.npy", mmap_mode="r").view(np.ndarray) for name in cls._ARRAYS}
+        return cls(
+            a["keys"], a["offsets"], a["postings"],
+            StringTable(a["names_blob"], a["names_offsets"]),
+            StringTable(a["choices_blob"], a["choices_offsets"]),
+        )
+
+
+def read_vendor_csv(path: Path) -> List[str]:
+    names = []
+    with open(path, newline='', encoding='utf-8') as vf:
+        for row in csv.reader(vf):
+            if row and row[0].strip():
+                names.append(row[0].strip())
+    return names
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def index_dir_for(csv_path: Path) -> Path:
+    return Path(str(csv_path) + ".idx")
+
+
+def load_matcher(csv_path, index_dir: Optional[Path] = None, min_index_size: int = INDEX_MIN_SIZE,
+                 digest: Optional[str] = None) -> VendorMatcher:
+    """Build a `VendorMatcher` for a vendor CSV, using (and refreshing) the on-disk index for large masters.
+
+    Each version of the CSV gets its own index subdirectory named after its
+    hash, so a rebuild never rewrites files another matcher has mapped.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return VendorMatcher([])
+    index_root = Path(index_dir) if index_dir else index_dir_for(csv_path)
+    digest = digest or file_digest(csv_path)
+    version_dir = index_root / digest[:16]
+
+    if (version_dir / "meta.json").exists():
+        try:
+            return VendorMatcher(index=TrigramIndex.load(version_dir))
+        except Exception as e:
+            print(f"[VendorIndex] Ignoring unreadable index at {version_dir}: {e}")
+
+    names = read_vendor_csv(csv_path)
+    if len(names) < min_index_size:
+        return VendorMatcher(names)
+    index = TrigramIndex.build(names)
+    try:
+        index.save(version_dir, source={"path": str(csv_path), "sha256": digest})
+        # older versions can go; open memory maps keep their data alive until released
+        for old in index_root.iterdir():
+            if old.is_dir() and old != version_dir:
+                shutil.rmtree(old, ignore_errors=True)
+    except OSError as e:
+        print(f"[VendorIndex] Could not persist index to {version_dir}: {e}")
+    return VendorMatcher(index=index)
@@ -0,0 +1,142 @@
+"""Fuzzy matching of invoice vendor names against the trusted vendor master.
+
+The master is preprocessed once (lower-cased, punctuation stripped, tokens
+sorted), which turns `token_sort_ratio` into a plain `fuzz.ratio` between
+prepared strings. Single lookups use `process.extractOne`; batches are scored
+in one `process.cdist` call that runs on all cores.
+
+With a `TrigramIndex` (see `vendor_index.py`) each lookup is first narrowed
+to a few hundred candidate rows, which keeps multi-million-row masters fast.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+try:
+    from rapidfuzz import fuzz, process, utils
+    RAPIDFUZZ_SUPPORT = True
+except Exception:
+    RAPIDFUZZ_SUPPORT = False
+
+
+def normalize(name: str) -> str:
+    """Lower-case, strip punctuation and sort tokens (token_sort_ratio preprocessing)."""
+    if RAPIDFUZZ_SUPPORT:
+        name = utils.default_process(name)
+    else:
+        name = " ".join("".join(ch if ch.isalnum() else " " for ch in name.lower()).split())
+    return " ".join(sorted(name.split()))
+
+
+class VendorMatcher:
+    """Best-match lookup of vendor names against a fixed list of known vendors.
+
+    Results have the same shape as the dashboard's `compute_vendor_confidence`:
+    `{"score": 0-100, "match": name}`. Scores below `score_cutoff` report
+    `{"score": 0, "match": None}`.
+    """
+
+    SCORE_CUTOFF = 50
+    CHUNK = 64  # query rows per cdist call; bounds the score matrix to CHUNK x len(master)
+
+    def __init__(self, names: Optional[List[str]] = None, score_cutoff: int = SCORE_CUTOFF, index=None):
+        self.index = index
+        if index is not None:
+            self.names, self.choices = index.names, index.choices
+        else:
+            self.names = [n for n in (names or []) if n]
+            self.choices = [normalize(n) for n in self.names]
+        self.score_cutoff = score_cutoff
+
+    def __len__(self):
+        return len(self.names)
+
+    def _unavailable(self, name: Optional[str]) -> Optional[Dict]:
+        if not name:
+            return {"score": 0, "match": None}
+        if not (RAPIDFUZZ_SUPPORT and self.names):
+            return {"score": None, "match": None}
+        return None
+
+    def match(self, name: Optional[str]) -> Dict:
+        early = self._unavailable(name)
+        if early is not None:
+            return early
+        query = normalize(name)
+        if self.index is not None:
+            rows = self.index.candidates(query)
+            best = process.extractOne(query, self.choices.take(rows), scorer=fuzz.ratio, processor=None, score_cutoff=self.score_cutoff)
+            if best is None:
+                return {"score": 0, "match": None}
+            return {"score": int(best[1]), "match": self.names[int(rows[best[2]])]}
+        best = process.extractOne(query, self.choices, scorer=fuzz.ratio, processor=None, score_cutoff=self.score_cutoff)
+        if best is None:
+            return {"score": 0, "match": None}
+        return {"score": int(best[1]), "match": self.names[best[2]]}
+
+    def match_many(self, names: List[Optional[str]]) -> List[Dict]:
+        """Match a batch of names with multi-core `cdist` calls; one result per input."""
+        if self.index is not None:
+            return [self.match(n) for n in names]
+        results: List[Optional[Dict]] = [self._unavailable(n) for n in names]
+        pending = [i for i, r in enumerate(results) if r is None]
+        for start in range(0, len(pending), self.CHUNK):
+            rows = pending[start:start + self.CHUNK]
+            scores = process.cdist(
+                [normalize(names[i]) for i in rows],
+                self.choices,
+                scorer=fuzz.ratio,
+                processor=None,
+                score_cutoff=self.score_cutoff,
+                dtype=np.uint8,
+                workers=-1,
+            )
+            best = scores.argmax(axis=1)
+            for i, j, s in zip(rows, best.tolist(), scores[np.arange(len(rows)), best].tolist()):
+                results[i] = {"score": int(s), "match": self.names[j] if s else None}
+        return results
+
+
+class LRUCache:
+    """Thread-safe bounded LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
@@ -0,0 +1,177 @@
+"""Hot-reloadable registry of the trusted vendor master.
+
+The vendor CSV used to be read once at import time from a path relative to
+the working directory. `VendorRegistry` instead resolves the file relative
+to the project (or `VENDOR_DB_PATH`), loads it on first use, and checks its
+mtime at most every `check_interval` seconds. When the file changes (and its
+hash differs) a new matcher is built on a background thread and swapped in
+with a single reference assignment; lookups keep using the previous matcher
+until then and never wait on a rebuild.
+
+Match results are memoized in a bounded LRU keyed on the normalized vendor
+name, since the same vendors recur constantly; the cache is emptied whenever
+a new matcher is swapped in.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .vendor_index import file_digest, load_matcher
+from .vendor_match import LRUCache, VendorMatcher, normalize
+
+
+DEFAULT_VENDOR_CSV = Path(__file__).resolve().parent.parent / "vendor_db" / "vendors.csv"
+
+
+def _stamp(path: Path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class VendorRegistry:
+    """Lazily loaded, atomically swapped `VendorMatcher` for a vendor CSV."""
+
+    CHECK_INTERVAL = 5.0
+    CACHE_SIZE = 10000
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = CHECK_INTERVAL, cache_size: int = CACHE_SIZE):
+        self.path = Path(path or os.environ.get("VENDOR_DB_PATH") or DEFAULT_VENDOR_CSV)
+        self.check_interval = check_interval
+        self._matcher: Optional[VendorMatcher] = None
+        self._stamp = None
+        self._digest = None
+        self._lock = threading.Lock()  # serializes loads
+        self._flag_lock = threading.Lock()  # guards `_reloading` only, never held during a load
+        self._reloading = False
+        self._last_check = 0.0
+        self._listeners: List[Callable[["VendorRegistry"], None]] = []
+        self.cache = LRUCache(cache_size)
+        self.version = 0
+        self.load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def on_reload(self, callback: Callable[["VendorRegistry"], None]):
+        """Register `callback(registry)`, called after every swap of the matcher."""
+        self._listeners.append(callback)
+
+    @property
+    def matcher(self) -> VendorMatcher:
+        current = self._matcher
+        if current is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._load()
+            return self._matcher
+        self._maybe_reload()
+        return current
+
+    def _load(self):
+        start = time.perf_counter()
+        stamp = _stamp(self.path)
+        try:
+            if stamp is None:
+                raise FileNotFoundError(f"Vendor DB not found: {self.path}")
+            digest = file_digest(self.path)
+            if digest == self._digest and self._matcher is not None:
+                self._stamp = stamp  # touched but unchanged
+                return
+            matcher = load_matcher(self.path, digest=digest)
+            self._digest = digest
+            self.last_error = None
+        except Exception as e:
+            print(f"[VendorRegistry] {e}")
+            self.last_error = str(e)
+            if self._matcher is not None:
+                return
+            matcher = VendorMatcher([])
+        self._stamp = stamp
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self._matcher = matcher
+        self.version += 1
+        self.cache.clear()
+        for cb in self._listeners:
+            try:
+                cb(self)
+            except Exception as e:
+                print(f"[VendorRegistry] reload listener failed: {e}")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._reloading or _stamp(self.path) == self._stamp:
+            return
+        self.reload()
+
+    def _reload_in_background(self):
+        try:
+            with self._lock:
+                self._load()
+        finally:
+            self._reloading = False
+
+    def reload(self, wait: bool = False):
+        """Rebuild the matcher from the CSV; in the background unless `wait` is set."""
+        if wait:
+            with self._lock:
+                self._load()
+            return
+        with self._flag_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload_in_background, name="vendor-registry-reload", daemon=True).start()
+
+    def match(self, name: Optional[str]) -> Dict:
+        return self.match_many([name])[0]
+
+    def match_many(self, names: List[Optional[str]]) -> List[Dict]:
+        """Cached lookups; distinct misses are matched together in one batch."""
+        self.matcher  # loads on first use / schedules a reload
+        # read the version before the matcher so results from an older matcher
+        # can never be cached under a newer version
+        version = self.version
+        matcher = self._matcher
+        results: List[Optional[Dict]] = []
+        misses: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            key = normalize(name) if name else ""
+            hit = self.cache.get((version, key)) if key else None
+            results.append(dict(hit) if hit is not None else None)
+            if hit is None:
+                misses.setdefault(key, []).append(i)
+        if misses:
+            keys = list(misses)
+            found = matcher.match_many([names[misses[k][0]] for k in keys])
+            for key, res in zip(keys, found):
+                if key:
+                    self.cache.put((version, key), res)
+                for i in misses[key]:
+                    results[i] = dict(res)
+        return results
+
+    @property
+    def size(self) -> int:
+        return len(self._matcher) if self._matcher is not None else 0
+
+    def stats(self) -> Dict:
+        return {
+            "path": str(self.path),
+            "loaded": self._matcher is not None,
+            "size": self.size,
+            "indexed": bool(self._matcher is not None and self._matcher.index is not None),
+            "version": self.version,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "reloading": self._reloading,
+            "last_error": self.last_error,
+            "cache": self.cache.stats(),
+        }
@@ -2,6 +2,8 @@
 import sqlite3
 from pathlib import Path
 
+from agentic_audit.report_store import ReportContainer
+
 DB_PATH = Path("audit.db")
 
 print("=" * 60)
@@ -46,7 +48,12 @@ try:
         
         print(f"\n   Last 5 reports:")
         for row in rows:
-            print(f"   • ID {row[0]}: {row[2]} invoices, {row[1]} alerts")
+            print(f"   • ID {row[0]}: {row[2]} invoices, {row[3]} alerts")
+            # record counts come from the container index; the report itself is not parsed
+            container = Path("exports") / (str(row[5] or "").split(".", 1)[0] + ".ndjson")
+            if row[5] and container.exists():
+                with ReportContainer(container) as c:
+                    print(f"     {container.name}: {len(c)} records, {c.flagged_count()} flagged")
     else:
         print("   No reports recorded yet (upload an invoice to create one)")
     
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Round-trip test for the NDJSON report container with raw documents.
+- Exports a report the way the dashboard does (compressed JSON, raw side file, .ndjson)
+- Checks that stream_html, stream_csv and ReportContainer.page join the raw documents back
+"""
+import tempfile
+from pathlib import Path
+
+from agentic_audit import exporter
+from agentic_audit.report_store import ReportContainer
+
+raw = {'vendor': 'ACME office supplies', 'amount': '1,234.50', 'date': '20/12/2025'}
+report = {
+    'meta': {'total': 2},
+    'records': [
+        {'invoice_id': 'INV-1', 'vendor': 'Acme Office Supplies', 'amount': 1234.5, 'date': '2025-12-20', 'raw': raw},
+        {'invoice_id': 'INV-2', 'vendor': 'Acme Office Supplies', 'amount': 1234.5, 'date': '2025-12-20', 'raw': raw},
+    ],
+    'fraud': {'duplicates': [], 'inflated': [], 'fake_vendors': []},
+    'compliance': {'violations': []},
+    'vendor': {'vendor_scores': {}},
+    'summary': {'total_invoices': 2, 'fraud_alerts': 0},
+}
+
+with tempfile.TemporaryDirectory() as tmp:
+    base = str(Path(tmp) / 'report-1')
+    paths = exporter.export_all(report, base, formats=('json', 'ndjson'), compression='gzip')
+    assert 'raw' in paths, paths
+    print('Exported:', sorted(p.name for p in paths.values()))
+
+    html_out = Path(tmp) / 'streamed.html'
+    exporter.stream_html(str(paths['ndjson']), str(html_out))
+    html = html_out.read_text(encoding='utf-8')
+    assert "<tr><td>Vendor</td><td>ACME office supplies</td><td>Acme Office Supplies</td></tr>" in html
+    print('stream_html: Before (Original) column filled')
+
+    csv_out = Path(tmp) / 'streamed.csv'
+    exporter.stream_csv(str(paths['ndjson']), str(csv_out))
+    csv_ref = Path(tmp) / 'in_memory.csv'
+    exporter.write_csv(report, str(csv_ref))
+    assert csv_out.read_text(encoding='utf-8') == csv_ref.read_text(encoding='utf-8')
+    print('stream_csv: same as the in-memory export')
+
+    with ReportContainer(paths['ndjson']) as c:
+        assert 'raw_documents' not in c.header
+        page = c.page(1, 10)
+        assert page['total'] == 2
+        for rec in page['records']:
+            assert 'raw_ref' not in rec and rec['raw'] == raw, rec
+    print('ReportContainer.page: raw documents joined back')
+
+print('OK')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Test that archived reports stay readable.
+- Writes a report the way the dashboard does, then moves its shard 40 days back
+- Runs retention and checks the HTML download comes from the archive segment
+  while /reports/<name>/records still pages through the loose container
+"""
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from flask import Flask
+
+from agentic_audit.artifacts import ArtifactWriter, resolve_artifact
+from agentic_audit.retention import Retention, RetentionPolicy, find_archived
+from agentic_audit.tools.serving import report_records
+
+raw = {'vendor': 'ACME office supplies', 'amount': '99.00'}
+report = {
+    'meta': {'total': 1},
+    'records': [{'invoice_id': 'INV-1', 'vendor': 'Acme Office Supplies', 'amount': 99.0, 'raw': raw}],
+    'fraud': {'duplicates': [], 'inflated': [], 'fake_vendors': []},
+    'compliance': {'violations': []},
+    'vendor': {'vendor_scores': {}},
+    'summary': {'total_invoices': 1, 'fraud_alerts': 0},
+}
+
+with tempfile.TemporaryDirectory() as tmp:
+    exports, db = Path(tmp) / 'exports', str(Path(tmp) / 'audit.db')
+    saved = ArtifactWriter(exports, db).write(report, formats=('json', 'html', 'ndjson'), compression='gzip')
+    name = Path(saved['relpaths']['ndjson']).name[:-len('.ndjson')]
+
+    # pretend the upload happened 40 days ago
+    old_shard = exports / '2020' / '01' / '01'
+    old_shard.parent.mkdir(parents=True)
+    shutil.move(str(exports / Path(saved['relpaths']['ndjson']).parent), str(old_shard))
+    old = time.time() - 40 * 86400
+    for p in [old_shard, *old_shard.rglob('*')]:
+        os.utime(p, (old, old))
+
+    result = Retention(exports, db, RetentionPolicy(archive_after_days=30)).run_once()
+    print('Retention:', result)
+    assert result['archived_files'] > 0
+    assert find_archived(exports, db, f'2020/01/01/{name}.html') is not None
+    assert not (old_shard / f'{name}.html').exists()
+    print('HTML archived:', f'{name}.html')
+
+    assert resolve_artifact(exports, f'2020/01/01/{name}.ndjson') is not None
+    app = Flask(__name__)
+    with app.test_request_context('/?page=1'):
+        resp = report_records(exports, f'2020/01/01/{name}')
+    body = resp.get_json()
+    assert resp.status_code == 200 and body['total'] == 1, body
+    assert body['records'][0]['raw'] == raw, body['records'][0]
+    print('Records API after archiving:', body['total'], 'record(s), raw joined')
+
+    again = Retention(exports, db, RetentionPolicy(archive_after_days=30)).run_once()
+    assert again['archived_days'] == 0, again
+    print('Second run is a no-op:', again)
+
+print('OK')
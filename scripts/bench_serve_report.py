@@ -0,0 +1,124 @@
+"""Load benchmark for the report preview server.
+
+Writes a synthetic report into a temporary directory and serves it twice: with
+the old single-threaded `socketserver.TCPServer` + `SimpleHTTPRequestHandler`
+(HTTP/1.0, a new connection per request) and with `serve_report`'s threaded
+keep-alive server. Each run has `--clients` concurrent clients fetching the
+report `--requests` times each, while `--slow-clients` connections send half
+a request and stall, the way a reviewer on a bad link does.
+
+    python scripts/bench_serve_report.py --clients 20 --requests 50 --size-kb 512
+"""
+import argparse
+import functools
+import http.client
+import http.server
+import socket
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from agentic_audit.tools.serve_report import ReportRequestHandler, make_server
+
+
+class QuietLegacyHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class QuietHandler(ReportRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def legacy_server(directory):
+    return socketserver.TCPServer(("127.0.0.1", 0), functools.partial(QuietLegacyHandler, directory=directory))
+
+
+def threaded_server(directory):
+    return make_server(Path(directory), port=0, host="127.0.0.1", handler_class=QuietHandler)
+
+
+def client(port, name, requests, keepalive, timeout, latencies, errors):
+    conn = None
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            conn.request("GET", "/" + name, headers={"Accept-Encoding": "gzip"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                raise RuntimeError(resp.status)
+            if not keepalive or resp.will_close:
+                conn.close()
+                conn = None
+        except Exception:
+            errors.append(1)
+            break  # a client that timed out once gives up rather than stall the run
+        latencies.append(time.perf_counter() - start)
+    if conn is not None:
+        conn.close()
+
+
+def stall(port, stop):
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        s.sendall(b"GET /")  # never finishes the request line
+        stop.wait()
+
+
+def run(label, server, name, args):
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stop = threading.Event()
+    for _ in range(args.slow_clients):
+        threading.Thread(target=stall, args=(port, stop), daemon=True).start()
+    time.sleep(0.1)
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=client, args=(port, name, args.requests, label != "legacy", args.timeout, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    server.shutdown()
+    server.server_close()
+
+    if latencies:
+        q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        print(f"{label:9s} {len(latencies):6d} ok {len(errors):4d} failed  {len(latencies) / elapsed:8.0f} req/s  "
+              f"p50 {q[49] * 1000:7.1f}ms  p99 {q[98] * 1000:7.1f}ms")
+    else:
+        print(f"{label:9s}      0 ok {len(errors):4d} failed  (every client timed out after {args.timeout}s)")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Report preview server load benchmark")
+    p.add_argument("--clients", type=int, default=20)
+    p.add_argument("--requests", type=int, default=50, help="Requests per client")
+    p.add_argument("--size-kb", type=int, default=512, help="Size of the synthetic report")
+    p.add_argument("--slow-clients", type=int, default=1, help="Connections that stall mid-request")
+    p.add_argument("--timeout", type=float, default=5.0, help="Client timeout in seconds")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        name = "report.html"
+        row = "<tr><td>INV-000000</td><td>Acme Ltd</td><td>1234.50</td><td>duplicate</td></tr>\n"
+        (Path(tmp) / name).write_text("<table>\n" + row * (args.size_kb * 1024 // len(row)) + "</table>\n")
+        print(f"clients={args.clients} requests/client={args.requests} size={args.size_kb}KB slow_clients={args.slow_clients}")
+        run("legacy", legacy_server(tmp), name, args)
+        run("threaded", threaded_server(tmp), name, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark vendor-confidence lookups with and without the LRU cache.
+
+Builds a synthetic vendor master, then replays a Zipf-distributed stream of
+vendor names (a few vendors dominate, as in real invoice streams, with
+spelling variants) through `VendorRegistry`, once with caching disabled and
+once with the default cache.
+
+    python scripts/bench_vendor_cache.py --master 200000 --lookups 20000
+"""
+import argparse
+import random
+import string
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from agentic_audit.vendor_registry import VendorRegistry
+
+SUFFIXES = ["Ltd", "Limited", "Inc", "Corp", "Corporation", "LLC", "Pvt Ltd", "& Co"]
+
+
+def synthetic_master(n, rng):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).title() for _ in range(max(n // 4, 50))]
+    names = set()
+    while len(names) < n:
+        names.add(" ".join(rng.sample(words, rng.randint(1, 3))) + " " + rng.choice(SUFFIXES))
+    return sorted(names)
+
+
+def variant(name, rng):
+    roll = rng.random()
+    if roll < 0.3:
+        return name.upper()
+    if roll < 0.5:
+        return name.replace(" ", "  ") + "."
+    return name
+
+
+def run(registry, stream):
+    start = time.perf_counter()
+    for name in stream:
+        registry.match(name)
+    return time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description="Vendor-match LRU cache benchmark")
+    p.add_argument("--master", type=int, default=200000, help="Vendor master size")
+    p.add_argument("--distinct", type=int, default=5000, help="Distinct vendors appearing in the stream")
+    p.add_argument("--lookups", type=int, default=20000, help="Stream length")
+    p.add_argument("--zipf", type=float, default=1.2, help="Zipf exponent of vendor popularity")
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    master = synthetic_master(args.master, rng)
+    popular = rng.sample(master, min(args.distinct, len(master)))
+    ranks = np.random.default_rng(args.seed).zipf(args.zipf, args.lookups)
+    stream = [variant(popular[(r - 1) % len(popular)], rng) for r in ranks.tolist()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "vendors.csv"
+        csv_path.write_text("\n".join(master) + "\n", encoding="utf-8")
+
+        uncached = VendorRegistry(csv_path, cache_size=0)
+        cached = VendorRegistry(csv_path)
+        uncached.matcher, cached.matcher  # load (and build the index) outside the timing
+
+        t_uncached = run(uncached, stream)
+        t_cached = run(cached, stream)
+
+    stats = cached.stats()["cache"]
+    print(f"master={len(master)} lookups={len(stream)} distinct_in_stream={len(set(stream))} zipf={args.zipf}")
+    print(f"uncached: {t_uncached:.3f}s ({len(stream) / t_uncached:,.0f} lookups/s)")
+    print(f"cached:   {t_cached:.3f}s ({len(stream) / t_cached:,.0f} lookups/s), hit rate {stats['hit_rate']:.1%}")
+    print(f"speedup:  {t_uncached / t_cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
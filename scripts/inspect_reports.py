@@ -1,6 +1,34 @@
+import argparse
 import sqlite3
 from pathlib import Path
+
+from agentic_audit.artifacts import resolve_artifact
+from agentic_audit.report_store import ReportContainer
+
 DB='audit.db'
+EXPORTS=Path('exports')
+
+p=argparse.ArgumentParser(description='List recent reports, or show one page of a report\'s records')
+p.add_argument('--show', help='Report name (e.g. report-1700000000) whose records to print')
+p.add_argument('--page', type=int, default=1)
+p.add_argument('--size', type=int, default=20)
+p.add_argument('--flagged', action='store_true', help='Only flagged records')
+args=p.parse_args()
+
+if args.show:
+    # reports live in YYYY/MM/DD shards; resolve the name the way /download does
+    path=resolve_artifact(EXPORTS, f'{args.show}.ndjson')
+    if path is None:
+        print(f'{args.show}: no .ndjson container found under {EXPORTS}/')
+        raise SystemExit(1)
+    # reads only the requested page through the container's offset index
+    with ReportContainer(path) as c:
+        res=c.page(args.page, args.size, flagged=args.flagged)
+        print(f"{args.show}: {len(c)} records, {c.flagged_count()} flagged; page {res['page']}/{res['pages']} ({res['total']} matching)")
+        for r in res['records']:
+            print(f"{r['_row']}\t{r.get('invoice_id')}\t{r.get('vendor')}\t{r.get('amount')}")
+    raise SystemExit(0)
+
 if not Path(DB).exists():
     print('audit.db not found')
     raise SystemExit(1)
@@ -12,4 +40,10 @@ if not rows:
     print('No rows')
 else:
     for r in rows:
-        print(f"{r[0]}\t{r[1]}")
+        counts=''
+        if r[1]:
+            container=resolve_artifact(EXPORTS, r[1].split('.', 1)[0] + '.ndjson')
+            if container is not None:
+                with ReportContainer(container) as c:
+                    counts=f"\t{len(c)} records, {c.flagged_count()} flagged"
+        print(f"{r[0]}\t{r[1]}{counts}")
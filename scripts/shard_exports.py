@@ -0,0 +1,35 @@
+"""Move flat exports/report-* files into the dated shard layout and update their DB paths.
+
+Safe to re-run: files already in a shard are left alone.
+"""
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+from agentic_audit.artifacts import init_db, shard_for, shard_for_name
+
+p = argparse.ArgumentParser(description=__doc__)
+p.add_argument('--exports', default='exports')
+p.add_argument('--db', default='audit.db')
+args = p.parse_args()
+
+exports = Path(args.exports)
+moved = {}
+for f in exports.glob('report-*'):
+    if not f.is_file():
+        continue
+    shard = shard_for_name(f.name) or shard_for(f.stat().st_mtime)
+    target = exports / shard / f.name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(f, target)
+    moved[f.name] = target.relative_to(exports).as_posix()
+
+if Path(args.db).exists() and moved:
+    init_db(args.db)
+    with sqlite3.connect(args.db) as conn:
+        for col in ('html_path', 'json_path', 'csv_path'):
+            conn.executemany(f'UPDATE reports SET {col}=? WHERE {col}=?', [(new, old) for old, new in moved.items()])
+        conn.executemany('UPDATE report_artifacts SET path=? WHERE path=?', [(new, old) for old, new in moved.items()])
+
+print(f'Moved {len(moved)} files')